@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import (
     # ============================
     # USUARIOS Y CLIENTES
@@ -13,7 +14,7 @@ from .models import (
     # ============================
     # INGREDIENTES E INVENTARIO
     # ============================
-    Ingrediente, Inventario,
+    Ingrediente, Inventario, MovimientoInventario,
     
     # ============================
     # PRODUCTOS Y RECETAS
@@ -28,8 +29,21 @@ from .models import (
     # ============================
     # CARRITO Y COMPRAS
     # ============================
-    Carrito, CarritoDetalle, Compra, ItemCompra
+    Carrito, CarritoDetalle, Reserva, Compra, ItemCompra,
+    
+    # ============================
+    # TABLAS DERIVADAS
+    # ============================
+    MargenProducto, VentaDiaria, VentaDiariaProducto,
+    
+    # ============================
+    # COLA DE TAREAS
+    # ============================
+    Tarea
 )
+from .disponibilidad import anotar_disponibilidad
+from .inventario import aplicar_a_inventario, registrar_movimientos
+from .signals import recalculo_agrupado
 
 
 # ============================
@@ -68,6 +82,19 @@ class ItemCompraInline(admin.TabularInline):
     verbose_name_plural = "Productos comprados"
 
 
+# ============================
+# MIXINS
+# ============================
+
+class RecalculoAgrupadoMixin:
+    """Las ediciones en lote del listado (list_editable) recalculan existencias,
+    costos y cachés una sola vez al final, no por cada fila"""
+    
+    def changelist_view(self, request, extra_context=None):
+        with recalculo_agrupado():
+            return super().changelist_view(request, extra_context)
+
+
 # ============================
 # ADMIN CONFIGURATIONS
 # ============================
@@ -92,15 +119,21 @@ class ClienteAdmin(admin.ModelAdmin):
 # REPARTIDORES
 @admin.register(Repartidor)
 class RepartidorAdmin(admin.ModelAdmin):
-    list_display = ['nombre', 'vehiculo', 'estado']
-    list_filter = ['estado']
+    list_display = ['nombre', 'vehiculo', 'zona', 'estado']
+    list_filter = ['estado', 'zona']
     search_fields = ['nombre']
     list_editable = ['estado']
 
+    def save_model(self, request, obj, form, change):
+        # Un estado puesto a mano ya no lo libera el despacho (core/despacho.py)
+        if 'estado' in form.changed_data:
+            obj.ocupado_por_despacho = False
+        super().save_model(request, obj, form, change)
+
 
 # INGREDIENTES E INVENTARIO
 @admin.register(Ingrediente)
-class IngredienteAdmin(admin.ModelAdmin):
+class IngredienteAdmin(RecalculoAgrupadoMixin, admin.ModelAdmin):
     list_display = ['nombre', 'unidad_medida', 'costo_unitario', 'stock_actual', 'activo']
     list_filter = ['activo', 'unidad_medida']
     search_fields = ['nombre']
@@ -109,7 +142,7 @@ class IngredienteAdmin(admin.ModelAdmin):
 
 
 @admin.register(Inventario)
-class InventarioAdmin(admin.ModelAdmin):
+class InventarioAdmin(RecalculoAgrupadoMixin, admin.ModelAdmin):
     list_display = ['ingrediente', 'cantidad_actual', 'stock_minimo', 'necesita_reabastecer', 'fecha_ultima_actualizacion']
     list_filter = []  # CORREGIDO: Removido 'necesita_reabastecer' de list_filter
     search_fields = ['ingrediente__nombre']
@@ -120,22 +153,87 @@ class InventarioAdmin(admin.ModelAdmin):
         return obj.necesita_reabastecer
     necesita_reabastecer.boolean = True
     necesita_reabastecer.short_description = 'Necesita Reabastecer'
+    
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        campo = super().formfield_for_dbfield(db_field, request, **kwargs)
+        if db_field.name == 'cantidad_actual':
+            # El formulario devuelve también el valor que vio el usuario
+            campo.show_hidden_initial = True
+        return campo
+    
+    def save_model(self, request, obj, form, change):
+        if not change or 'cantidad_actual' not in form.changed_data:
+            return super().save_model(request, obj, form, change)
+        # Lo editado entra al libro como diferencia respecto de lo leído:
+        # no pisa las ventas hechas mientras el formulario estaba abierto
+        campo = form.fields['cantidad_actual']
+        leido = campo.to_python(campo.widget.value_from_datadict(
+            form.data, form.files, form.add_initial_prefix('cantidad_actual')
+        ))
+        diferencia = obj.cantidad_actual - (form.initial['cantidad_actual'] if leido is None else leido)
+        registrar_movimientos({obj.ingrediente_id: diferencia}, 'ajuste', f'admin:{request.user.get_username()}')
+        otros = [campo for campo in form.changed_data if campo != 'cantidad_actual']
+        if otros:
+            obj.save(update_fields=otros + ['fecha_ultima_actualizacion'])
+        obj.refresh_from_db(fields=['cantidad_actual'])
+        obj._cantidad_inicial = obj.cantidad_actual
+
+
+@admin.register(MovimientoInventario)
+class MovimientoInventarioAdmin(admin.ModelAdmin):
+    """Libro de inventario: se agregan compras, mermas y ajustes; nada se edita"""
+    list_display = ['fecha', 'ingrediente', 'tipo', 'cantidad', 'referencia']
+    list_filter = ['tipo', 'fecha']
+    search_fields = ['ingrediente__nombre', 'referencia']
+    list_select_related = ['ingrediente']
+    date_hierarchy = 'fecha'
+    ordering = ['-id']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        aplicar_a_inventario({obj.ingrediente_id: obj.cantidad})
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 # PRODUCTOS Y RECETAS
 @admin.register(Producto)
-class ProductoAdmin(admin.ModelAdmin):
-    list_display = ['nombre', 'precio', 'restaurante', 'categoria_menu', 'destacado', 'disponible', 'activo']
+class ProductoAdmin(RecalculoAgrupadoMixin, admin.ModelAdmin):
+    list_display = ['nombre', 'precio', 'costo_produccion', 'margen_bruto', 'restaurante', 'categoria_menu', 'destacado', 'disponible', 'unidades_disponibles', 'activo']
     list_filter = ['restaurante', 'categoria_menu', 'destacado', 'activo']
     search_fields = ['nombre', 'descripcion']
     list_editable = ['precio', 'destacado', 'activo']
     inlines = [RecetaInline]
     ordering = ['restaurante', 'nombre']
     
+    def get_queryset(self, request):
+        # Disponibilidad de toda la página en la misma consulta del listado
+        return anotar_disponibilidad(super().get_queryset(request)).select_related('existencia', 'margen')
+    
     def disponible(self, obj):
         return obj.disponible
     disponible.boolean = True
     disponible.short_description = 'Disponible'
+    
+    def unidades_disponibles(self, obj):
+        unidades = obj.unidades_disponibles
+        return 'Sin límite' if unidades is None else unidades
+    unidades_disponibles.short_description = 'Unidades'
+    unidades_disponibles.admin_order_field = 'existencia__unidades'
+    
+    def costo_produccion(self, obj):
+        return f"${obj.costo_produccion:.2f}"
+    costo_produccion.short_description = 'Costo'
+    costo_produccion.admin_order_field = 'margen__costo_produccion'
+    
+    def margen_bruto(self, obj):
+        return f"${obj.margen.margen:.2f}" if hasattr(obj, 'margen') else '-'
+    margen_bruto.short_description = 'Margen'
+    margen_bruto.admin_order_field = 'margen__margen'
 
 
 @admin.register(Receta)
@@ -188,7 +286,7 @@ class CarritoAdmin(admin.ModelAdmin):
     list_filter = ['activo', 'fecha_creacion']
     search_fields = ['cliente__nombre', 'session_key']
     inlines = [CarritoDetalleInline]
-    readonly_fields = ['fecha_creacion', 'fecha_actualizacion']
+    readonly_fields = ['fecha_creacion', 'fecha_actualizacion', 'cantidad_total', 'total']
     
     def cantidad_total(self, obj):
         return obj.cantidad_total
@@ -210,11 +308,30 @@ class CarritoDetalleAdmin(admin.ModelAdmin):
     subtotal.short_description = 'Subtotal'
 
 
+@admin.register(Reserva)
+class ReservaAdmin(admin.ModelAdmin):
+    """Reservas de ingredientes de los carritos (las mantiene core/reservas.py)"""
+    list_display = ['carrito', 'ingrediente', 'cantidad', 'vence', 'vigente']
+    list_filter = ['ingrediente']
+    search_fields = ['ingrediente__nombre', 'carrito__cliente__nombre']
+    list_select_related = ['carrito__cliente', 'ingrediente']
+    
+    def vigente(self, obj):
+        return obj.vence > timezone.now()
+    vigente.boolean = True
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # PEDIDOS
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
-    list_display = ['id', 'cliente', 'estado', 'canal', 'total', 'fecha_hora', 'repartidor']
-    list_filter = ['estado', 'canal', 'fecha_hora']
+    list_display = ['id', 'cliente', 'estado', 'canal', 'zona', 'total', 'fecha_hora', 'repartidor', 'fecha_asignacion']
+    list_filter = ['estado', 'canal', 'zona', 'fecha_hora']
     search_fields = ['cliente__nombre']
     inlines = [DetallePedidoInline]
     list_editable = ['estado']
@@ -231,11 +348,11 @@ class DetallePedidoAdmin(admin.ModelAdmin):
 # COMPRAS AGRUPADAS
 @admin.register(Compra)
 class CompraAdmin(admin.ModelAdmin):
-    list_display = ['id', 'usuario', 'fecha_compra', 'total', 'estado']
+    list_display = ['id', 'usuario', 'fecha_compra', 'total', 'cantidad_items', 'estado']
     list_filter = ['estado', 'fecha_compra']
     search_fields = ['usuario__nombre_usuario']
     inlines = [ItemCompraInline]
-    readonly_fields = ['fecha_compra']
+    readonly_fields = ['fecha_compra', 'cantidad_items']
     ordering = ['-fecha_compra']
 
 
@@ -246,6 +363,88 @@ class ItemCompraAdmin(admin.ModelAdmin):
     search_fields = ['producto__nombre', 'compra__usuario__nombre_usuario']
 
 
+# REPORTES
+@admin.register(MargenProducto)
+class MargenProductoAdmin(admin.ModelAdmin):
+    """Reporte de márgenes: lee la tabla materializada, sin recorrer recetas"""
+    list_display = ['producto', 'restaurante', 'precio', 'costo_produccion', 'margen', 'porcentaje', 'fecha_actualizacion']
+    list_filter = ['producto__restaurante', 'producto__activo']
+    search_fields = ['producto__nombre']
+    list_select_related = ['producto__restaurante']
+    ordering = ['margen']
+    
+    def restaurante(self, obj):
+        return obj.producto.restaurante
+    restaurante.admin_order_field = 'producto__restaurante'
+    
+    def precio(self, obj):
+        return f"${obj.producto.precio}"
+    precio.admin_order_field = 'producto__precio'
+    
+    def porcentaje(self, obj):
+        porcentaje = obj.porcentaje
+        return '-' if porcentaje is None else f"{porcentaje}%"
+    porcentaje.short_description = 'Margen %'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(VentaDiaria)
+class VentaDiariaAdmin(admin.ModelAdmin):
+    """Ventas por día: lee la tabla resumen, sin recorrer compras ni pedidos"""
+    list_display = ['fecha', 'compras', 'pedidos', 'unidades', 'ingresos', 'ticket_promedio']
+    date_hierarchy = 'fecha'
+    ordering = ['-fecha']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(VentaDiariaProducto)
+class VentaDiariaProductoAdmin(admin.ModelAdmin):
+    """Ventas por día y producto (filtrables por restaurante)"""
+    list_display = ['fecha', 'producto', 'restaurante', 'unidades', 'ingresos']
+    list_filter = ['restaurante']
+    search_fields = ['producto__nombre']
+    list_select_related = ['producto', 'restaurante']
+    date_hierarchy = 'fecha'
+    ordering = ['-fecha', '-ingresos']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# COLA DE TAREAS
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'nombre', 'estado', 'intentos', 'max_intentos', 'disponible_desde', 'trabajador', 'fecha_creacion']
+    list_filter = ['estado', 'nombre']
+    search_fields = ['nombre', 'ultimo_error']
+    readonly_fields = ['intentos', 'trabajador', 'ultimo_error', 'fecha_creacion', 'fecha_fin']
+    ordering = ['-fecha_creacion']
+    actions = ['reintentar']
+    
+    def reintentar(self, request, queryset):
+        actualizadas = queryset.exclude(estado='completada').update(
+            estado='pendiente', disponible_desde=timezone.now(), intentos=0
+        )
+        self.message_user(request, f"{actualizadas} tareas reprogramadas")
+    reintentar.short_description = "Reintentar ahora"
+    
+    def has_add_permission(self, request):
+        return False
+
+
 # ============================
 # CONFIGURACIÓN DEL SITIO ADMIN
 # ============================
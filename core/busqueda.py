@@ -0,0 +1,204 @@
+import re
+
+from django.db import connection
+from django.db.models import Count, Q
+
+from .models import CategoriaMenu, Producto, RestauranteVirtual
+
+# ============================
+# BÚSQUEDA DE PRODUCTOS (SQLITE FTS5)
+# ============================
+# Índice de texto completo sobre nombre y descripción del producto y los
+# nombres de su categoría y restaurante. El rowid de cada fila es el id del
+# producto y solo se indexan productos visibles (activos y de un restaurante
+# activo). Se mantiene por señales (ver core/signals.py); la tabla la crea
+# la migración 0004. En otros motores se usa una búsqueda con icontains.
+
+TABLA_FTS = 'core_producto_fts'
+
+# Peso de cada columna indexada en el ranking bm25 (nombre pesa más)
+PESOS_BM25 = (10.0, 1.0, 3.0, 3.0)
+
+LOTE_IDS = 500
+
+SQL_INSERTAR = f'''
+    INSERT INTO {TABLA_FTS} (
+        rowid, nombre, descripcion, categoria, restaurante, restaurante_id, categoria_id
+    )
+    SELECT p.id, p.nombre, COALESCE(p.descripcion, ''), COALESCE(c.nombre, ''),
+           COALESCE(r.nombre, ''), p.restaurante_id, p.categoria_menu_id
+    FROM core_producto p
+    LEFT JOIN core_categoriamenu c ON c.id = p.categoria_menu_id
+    LEFT JOIN core_restaurantevirtual r ON r.id = p.restaurante_id
+    WHERE p.activo AND COALESCE(r.activo, 1)
+'''
+
+
+def fts_disponible():
+    return connection.vendor == 'sqlite'
+
+
+def _lotes(ids):
+    ids = list(ids)
+    for inicio in range(0, len(ids), LOTE_IDS):
+        yield ids[inicio:inicio + LOTE_IDS]
+
+
+# ============================
+# MANTENIMIENTO DEL ÍNDICE
+# ============================
+
+def eliminar_del_indice(producto_ids):
+    if not fts_disponible():
+        return
+    with connection.cursor() as cursor:
+        for lote in _lotes(producto_ids):
+            marcadores = ', '.join(['%s'] * len(lote))
+            cursor.execute(f'DELETE FROM {TABLA_FTS} WHERE rowid IN ({marcadores})', lote)
+
+
+def indexar_productos(producto_ids):
+    """Reindexa los productos indicados (los que ya no existen se quitan)"""
+    if not fts_disponible():
+        return
+    eliminar_del_indice(producto_ids)
+    with connection.cursor() as cursor:
+        for lote in _lotes(producto_ids):
+            marcadores = ', '.join(['%s'] * len(lote))
+            cursor.execute(f'{SQL_INSERTAR} AND p.id IN ({marcadores})', lote)
+
+
+def indexar_por_categorias(categoria_ids):
+    indexar_productos(
+        Producto.objects.filter(categoria_menu_id__in=categoria_ids).values_list('id', flat=True)
+    )
+
+
+def indexar_por_restaurantes(restaurante_ids):
+    indexar_productos(
+        Producto.objects.filter(restaurante_id__in=restaurante_ids).values_list('id', flat=True)
+    )
+
+
+def reconstruir_indice():
+    """Vacía y vuelve a llenar el índice completo con un solo INSERT ... SELECT"""
+    if not fts_disponible():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA_FTS}')
+        cursor.execute(SQL_INSERTAR)
+        cursor.execute(f"INSERT INTO {TABLA_FTS} ({TABLA_FTS}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {TABLA_FTS}')
+        return cursor.fetchone()[0]
+
+
+# ============================
+# CONSULTAS
+# ============================
+
+def expresion_match(texto):
+    """Convierte el texto del usuario en una consulta FTS5 segura con prefijos.
+
+    'hambur doble' -> '"hambur"* "doble"*' (todas las palabras, por prefijo)
+    """
+    palabras = re.findall(r'\w+', texto.lower())
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def buscar(texto, restaurante_id=None, categoria_id=None, limite=20, desplazamiento=0):
+    """Busca productos visibles y devuelve resultados ordenados y facetas.
+
+    Retorna {'total', 'resultados': [Producto...], 'facetas': {'restaurantes',
+    'categorias'}}; cada faceta es una lista de {'id', 'nombre', 'total'}.
+    """
+    vacio = {'total': 0, 'resultados': [], 'facetas': {'restaurantes': [], 'categorias': []}}
+    match = expresion_match(texto)
+    if not match:
+        return vacio
+    if not fts_disponible():
+        return _buscar_sin_fts(texto, restaurante_id, categoria_id, limite, desplazamiento)
+
+    condiciones = [f'{TABLA_FTS} MATCH %s']
+    parametros = [match]
+    if restaurante_id is not None:
+        condiciones.append('restaurante_id = %s')
+        parametros.append(restaurante_id)
+    if categoria_id is not None:
+        condiciones.append('categoria_id = %s')
+        parametros.append(categoria_id)
+    where = ' AND '.join(condiciones)
+    pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {TABLA_FTS} WHERE {where} '
+            f'ORDER BY bm25({TABLA_FTS}, {pesos}) LIMIT %s OFFSET %s',
+            parametros + [limite, desplazamiento]
+        )
+        ids = [fila[0] for fila in cursor.fetchall()]
+
+        # Facetas en una sola pasada: leer restaurante y categoría desde
+        # core_producto (por clave primaria) es más rápido que desde las
+        # columnas UNINDEXED del índice.
+        cursor.execute(
+            f'SELECT p.restaurante_id, p.categoria_menu_id, count(*) FROM core_producto p '
+            f'WHERE p.id IN (SELECT rowid FROM {TABLA_FTS} WHERE {where}) GROUP BY 1, 2',
+            parametros
+        )
+        conteos = cursor.fetchall()
+
+    productos = Producto.objects.select_related('restaurante', 'categoria_menu').in_bulk(ids)
+    return {
+        'resultados': [productos[producto_id] for producto_id in ids if producto_id in productos],
+        **_totales_y_facetas(conteos),
+    }
+
+
+def _totales_y_facetas(conteos):
+    """Agrupa filas (restaurante_id, categoria_id, total) en total y facetas"""
+    por_restaurante = {}
+    por_categoria = {}
+    for restaurante_id, categoria_id, total in conteos:
+        por_restaurante[restaurante_id] = por_restaurante.get(restaurante_id, 0) + total
+        por_categoria[categoria_id] = por_categoria.get(categoria_id, 0) + total
+    return {
+        'total': sum(por_restaurante.values()),
+        'facetas': {
+            'restaurantes': _faceta(RestauranteVirtual, por_restaurante),
+            'categorias': _faceta(CategoriaMenu, por_categoria),
+        },
+    }
+
+
+def _faceta(modelo, conteos):
+    nombres = dict(
+        modelo.objects.filter(id__in=[i for i in conteos if i is not None]).values_list('id', 'nombre')
+    )
+    faceta = [
+        {'id': objeto_id, 'nombre': nombres.get(objeto_id, 'Sin asignar'), 'total': total}
+        for objeto_id, total in conteos.items()
+    ]
+    return sorted(faceta, key=lambda f: -f['total'])
+
+
+def _buscar_sin_fts(texto, restaurante_id, categoria_id, limite, desplazamiento):
+    """Alternativa para motores sin FTS5: icontains por palabra, sin ranking"""
+    productos = Producto.objects.filter(activo=True).exclude(restaurante__activo=False)
+    for palabra in re.findall(r'\w+', texto):
+        productos = productos.filter(
+            Q(nombre__icontains=palabra) | Q(descripcion__icontains=palabra) |
+            Q(categoria_menu__nombre__icontains=palabra) | Q(restaurante__nombre__icontains=palabra)
+        )
+    if restaurante_id is not None:
+        productos = productos.filter(restaurante_id=restaurante_id)
+    if categoria_id is not None:
+        productos = productos.filter(categoria_menu_id=categoria_id)
+
+    conteos = productos.values_list('restaurante_id', 'categoria_menu_id').annotate(total=Count('id'))
+    return {
+        'resultados': list(
+            productos.select_related('restaurante', 'categoria_menu')
+            .order_by('nombre')[desplazamiento:desplazamiento + limite]
+        ),
+        **_totales_y_facetas(conteos),
+    }
@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+# ============================
+# CACHÉ VERSIONADA DEL CATÁLOGO
+# ============================
+# Cada restaurante tiene un contador de versión propio y el listado de
+# restaurantes uno global. Las entradas cacheadas llevan la versión en la
+# clave, así que invalidar es solo subir el contador: las entradas viejas
+# dejan de leerse y expiran solas. Funciona con LocMemCache y
+# FileBasedCache, sin servidor de caché externo.
+#
+# La versión es un timestamp en nanosegundos que solo crece, de modo que
+# también sirve como fecha de última modificación.
+#
+# Los precios de todos los productos (ingesta de pedidos, core/ingesta.py)
+# llevan una versión global propia, que solo suben los cambios de catálogo
+# (productos, categorías, restaurantes). Los recálculos de existencias
+# invalidan menús en cada venta y no deben tocarla.
+
+CLAVE_VERSION_CATALOGO = 'catalogo:version'
+CLAVE_VERSION_MENU = 'menu:version:{}'
+CLAVE_VERSION_PRECIOS = 'precios:version'
+
+
+def _leer_version(clave):
+    version = cache.get(clave)
+    if version is None:
+        # Si la clave se perdió (reinicio, expulsión), arrancar en "ahora"
+        # garantiza que no se reutilice una versión ya cacheada.
+        cache.add(clave, time.time_ns(), None)
+        version = cache.get(clave) or time.time_ns()
+    return version
+
+
+def _subir_version(clave):
+    actual = cache.get(clave) or 0
+    cache.set(clave, max(time.time_ns(), actual + 1), None)
+
+
+def version_catalogo():
+    return _leer_version(CLAVE_VERSION_CATALOGO)
+
+
+def version_menu(restaurante_id):
+    return _leer_version(CLAVE_VERSION_MENU.format(restaurante_id))
+
+
+def version_precios():
+    return _leer_version(CLAVE_VERSION_PRECIOS)
+
+
+def fecha_version(version):
+    """Fecha (UTC) que representa una versión, para Last-Modified"""
+    return datetime.fromtimestamp(version / 1_000_000_000, tz=timezone.utc)
+
+
+def invalidar_catalogo():
+    """Invalida el listado de restaurantes (página de inicio)"""
+    _subir_version(CLAVE_VERSION_CATALOGO)
+
+
+def invalidar_menus(restaurante_ids):
+    """Invalida solo los menús de los restaurantes indicados"""
+    for restaurante_id in set(restaurante_ids):
+        if restaurante_id is not None:
+            _subir_version(CLAVE_VERSION_MENU.format(restaurante_id))
+
+
+def invalidar_precios():
+    """Invalida la foto global de precios (también la de productos sin restaurante)"""
+    _subir_version(CLAVE_VERSION_PRECIOS)
+
+
+def obtener_cacheado(clave, version, construir):
+    """Devuelve la entrada `clave` de la versión dada o la construye y guarda"""
+    clave_versionada = f'{clave}:{version}'
+    datos = cache.get(clave_versionada)
+    if datos is None:
+        datos = construir()
+        cache.set(clave_versionada, datos, settings.CATALOGO_CACHE_TIMEOUT)
+    return datos
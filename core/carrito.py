@@ -0,0 +1,394 @@
+import uuid
+from abc import ABC, abstractmethod
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    DecimalField, Exists, ExpressionWrapper, F, OuterRef, PositiveIntegerField, Q, Subquery, Sum, Window,
+)
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
+
+from .models import Carrito, CarritoDetalle, Producto
+
+# ============================
+# CARRITO: ALMACENAMIENTO SEGÚN settings.CARRITO_ANONIMO
+# ============================
+# Los clientes con sesión siempre usan un Carrito en la base. Para los
+# visitantes anónimos hay tres modos:
+#
+#   'db'      Carrito + CarritoDetalle por sesión (comportamiento original)
+#   'sesion'  el carrito vive en la sesión; con el motor signed_cookies no
+#             escribe nada en la base
+#   'cache'   el carrito vive en la caché, la sesión solo guarda un token
+#
+# Todos exponen la misma interfaz que Carrito (items, item, agregar,
+# fijar_cantidad, cambiar_cantidad, quitar, vaciar, total, cantidad_total).
+# Al iniciar sesión el carrito anónimo se fusiona con el del cliente (ver
+# signals.py).
+
+CLAVE_SESION = 'carrito'
+CLAVE_SESION_TOKEN = 'carrito_token'
+CLAVE_SESION_ID = 'carrito_id'
+CLAVE_CACHE = 'carrito:{}'
+
+
+class ItemCarrito:
+    """Línea de un carrito anónimo; imita a CarritoDetalle en las plantillas"""
+
+    def __init__(self, producto, cantidad, precio_unitario):
+        # Sin fila en la base, el item se identifica por el producto
+        self.id = producto.id
+        self.producto = producto
+        self.cantidad = cantidad
+        self.precio_unitario = precio_unitario
+
+    @property
+    def subtotal(self):
+        return self.cantidad * self.precio_unitario
+
+
+class CarritoAnonimo(ABC):
+    """Carrito guardado como {producto_id: {'cantidad', 'precio'}} fuera de la base"""
+    id = None
+    cliente = None
+
+    def __init__(self, datos):
+        self._datos = datos
+
+    @abstractmethod
+    def _guardar(self):
+        """Persiste self._datos donde corresponda al modo (sesión, caché)"""
+
+    def items(self):
+        productos = Producto.objects.select_related('categoria_menu').in_bulk(
+            [int(producto_id) for producto_id in self._datos]
+        )
+        return [
+            ItemCarrito(productos[int(producto_id)], linea['cantidad'], Decimal(linea['precio']))
+            for producto_id, linea in self._datos.items()
+            if int(producto_id) in productos
+        ]
+
+    def item(self, item_id):
+        linea = self._datos.get(str(item_id))
+        producto = Producto.objects.filter(id=item_id).first() if linea else None
+        if producto is None:
+            return None
+        return ItemCarrito(producto, linea['cantidad'], Decimal(linea['precio']))
+
+    def agregar(self, producto, cantidad=1):
+        linea = self._datos.setdefault(str(producto.id), {'cantidad': 0, 'precio': str(producto.precio)})
+        linea['cantidad'] += cantidad
+        self._guardar()
+
+    def fijar_cantidad(self, producto, cantidad):
+        if cantidad <= 0:
+            return self.quitar(producto.id)
+        linea = self._datos.setdefault(str(producto.id), {'cantidad': 0, 'precio': str(producto.precio)})
+        linea['cantidad'] = cantidad
+        self._guardar()
+
+    def cambiar_cantidad(self, item_id, cantidad):
+        if cantidad <= 0:
+            return self.quitar(item_id)
+        if str(item_id) in self._datos:
+            self._datos[str(item_id)]['cantidad'] = cantidad
+            self._guardar()
+
+    def quitar(self, item_id):
+        if self._datos.pop(str(item_id), None) is not None:
+            self._guardar()
+
+    def vaciar(self):
+        self._datos.clear()
+        self._guardar()
+
+    @property
+    def total(self):
+        return sum((linea['cantidad'] * Decimal(linea['precio']) for linea in self._datos.values()), Decimal('0'))
+
+    @property
+    def cantidad_total(self):
+        return sum(linea['cantidad'] for linea in self._datos.values())
+
+
+class CarritoEnSesion(CarritoAnonimo):
+
+    def __init__(self, session):
+        self.session = session
+        super().__init__(session.get(CLAVE_SESION, {}))
+
+    def _guardar(self):
+        if self._datos:
+            self.session[CLAVE_SESION] = self._datos
+        else:
+            self.session.pop(CLAVE_SESION, None)
+        self.session.modified = True
+
+
+class CarritoEnCache(CarritoAnonimo):
+
+    def __init__(self, session):
+        self.session = session
+        token = session.get(CLAVE_SESION_TOKEN)
+        super().__init__(cache.get(CLAVE_CACHE.format(token), {}) if token else {})
+
+    def _guardar(self):
+        token = self.session.get(CLAVE_SESION_TOKEN)
+        if not self._datos:
+            if token:
+                cache.delete(CLAVE_CACHE.format(token))
+            return
+        if token is None:
+            token = self.session[CLAVE_SESION_TOKEN] = uuid.uuid4().hex
+        cache.set(CLAVE_CACHE.format(token), self._datos, settings.CARRITO_CACHE_TIMEOUT)
+
+
+# ============================
+# OBTENER Y FUSIONAR CARRITOS
+# ============================
+
+def carrito_de_cliente(cliente_id):
+    """Carrito activo del cliente; lo crea si no tiene.
+
+    La restricción única parcial (un carrito activo por cliente) hace que,
+    si dos peticiones lo crean a la vez, una falle y lea el de la otra.
+    """
+    carrito = Carrito.objects.filter(cliente_id=cliente_id, activo=True).first()
+    if carrito is not None:
+        return carrito
+    try:
+        with transaction.atomic():
+            return Carrito.objects.create(cliente_id=cliente_id, activo=True)
+    except IntegrityError:
+        return Carrito.objects.get(cliente_id=cliente_id, activo=True)
+
+
+def carrito_anonimo(request):
+    modo = settings.CARRITO_ANONIMO
+    if modo == 'sesion':
+        return CarritoEnSesion(request.session)
+    if modo == 'cache':
+        return CarritoEnCache(request.session)
+
+    if not request.session.session_key:
+        request.session.create()
+    session_key = request.session.session_key
+    carrito = Carrito.objects.filter(session_key=session_key, activo=True).first()
+    if carrito is None:
+        carrito = Carrito.objects.create(session_key=session_key, activo=True)
+    # El id sobrevive al cambio de session_key al iniciar sesión
+    request.session[CLAVE_SESION_ID] = carrito.id
+    return carrito
+
+
+def fusionar_carrito_anonimo(request):
+    """Pasa el carrito anónimo de la sesión al Carrito del cliente, sumando cantidades"""
+    cliente_id = request.perfil.cliente_id
+    if cliente_id is None:
+        return
+    if settings.CARRITO_ANONIMO == 'db':
+        anonimo = Carrito.objects.filter(
+            id=request.session.get(CLAVE_SESION_ID), cliente__isnull=True, activo=True
+        ).first()
+    else:
+        anonimo = carrito_anonimo(request)
+    if anonimo is None or not anonimo.cantidad_total:
+        return
+
+    carrito = request.perfil.carrito
+    for item in anonimo.items():
+        carrito.agregar(item.producto, item.cantidad)
+
+    if isinstance(anonimo, Carrito):
+        anonimo.delete()
+        request.session.pop(CLAVE_SESION_ID, None)
+    else:
+        anonimo.vaciar()
+
+
+# ============================
+# CAMBIOS ATÓMICOS EN CARRITOS DE LA BASE
+# ============================
+
+def incrementar_linea(carrito, producto, cantidad):
+    """Suma `cantidad` a la línea del producto, o la crea, sin leer-modificar-escribir.
+
+    El UPDATE con F('cantidad') + n es atómico en la base. Si la línea no
+    existe se inserta; si otra petición la insertó a la vez, unique_together
+    hace fallar el INSERT y se reintenta el UPDATE.
+    """
+    linea = CarritoDetalle.objects.filter(carrito=carrito, producto=producto)
+    with transaction.atomic():
+        if not linea.update(cantidad=F('cantidad') + cantidad):
+            try:
+                with transaction.atomic():
+                    CarritoDetalle.objects.create(
+                        carrito=carrito, producto=producto, cantidad=cantidad, precio_unitario=producto.precio
+                    )
+                return  # post_save ya sumó la línea a los totales
+            except IntegrityError:
+                linea.update(cantidad=F('cantidad') + cantidad)
+
+        # QuerySet.update() no dispara señales: sumar a los totales con el
+        # precio guardado en la línea, también dentro de la base
+        precio = Subquery(linea.values('precio_unitario')[:1])
+        Carrito.objects.filter(pk=carrito.pk).update(
+            cantidad_total=F('cantidad_total') + cantidad,
+            total=ExpressionWrapper(
+                F('total') + precio * cantidad, output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+        )
+
+
+def cambiar_linea(carrito, detalles, cantidad):
+    """Deja en `cantidad` la línea de `detalles` (0 la borra); False si no existe.
+
+    Compara y escribe en la misma sentencia (UPDATE/DELETE ... WHERE
+    cantidad = la leída) y suma a los totales la diferencia real. Si otra
+    petición cambió la línea entre la lectura y la escritura, no se toca
+    nada y se vuelve a leer: dos cambios simultáneos nunca aplican una
+    diferencia calculada sobre el mismo valor viejo.
+    """
+    cantidad = max(cantidad, 0)
+    while True:
+        fila = detalles.values_list('pk', 'cantidad', 'precio_unitario').first()
+        if fila is None:
+            return False
+        pk, anterior, precio = fila
+        if cantidad == anterior:
+            return True
+        linea = CarritoDetalle.objects.filter(pk=pk, cantidad=anterior)
+        with transaction.atomic():
+            # Sin señales: la diferencia se suma a mano, una sola vez
+            cambiadas = linea._raw_delete(linea.db) if cantidad == 0 else linea.update(cantidad=cantidad)
+            if cambiadas:
+                sumar_a_carrito(carrito.pk, cantidad - anterior, (cantidad - anterior) * precio)
+                return True
+
+
+def fijar_linea(carrito, producto, cantidad):
+    """Deja la línea del producto en `cantidad` (0 la elimina), creándola si falta"""
+    detalles = CarritoDetalle.objects.filter(carrito=carrito, producto=producto)
+    while not cambiar_linea(carrito, detalles, cantidad):
+        if cantidad <= 0:
+            return
+        try:
+            with transaction.atomic():
+                CarritoDetalle.objects.create(
+                    carrito=carrito, producto=producto, cantidad=cantidad, precio_unitario=producto.precio
+                )
+            return  # post_save ya sumó la línea a los totales
+        except IntegrityError:
+            pass  # Otra petición la creó a la vez: se fija sobre esa
+
+
+def vaciar_carrito(carrito):
+    """Borra todas las líneas con un DELETE y pone los totales en cero"""
+    with transaction.atomic():
+        # Sin señales por línea: los totales se ponen en cero de una vez
+        CarritoDetalle.objects.filter(carrito=carrito)._raw_delete(CarritoDetalle.objects.db)
+        Carrito.objects.filter(pk=carrito.pk).update(cantidad_total=0, total=0)
+
+
+def aplicar_cantidades(carrito, cantidades):
+    """Aplica {producto: cantidad} al carrito en una sola transacción (0 quita)"""
+    with transaction.atomic():
+        for producto, cantidad in cantidades.items():
+            carrito.fijar_cantidad(producto, cantidad)
+
+
+# ============================
+# TOTALES DESNORMALIZADOS DE CARRITO
+# ============================
+
+def sumar_a_carrito(carrito_id, cantidad, importe):
+    """Suma (o resta) al carrito con un UPDATE atómico, sin leer sus detalles"""
+    if carrito_id is None or (not cantidad and not importe):
+        return
+    Carrito.objects.filter(pk=carrito_id).update(
+        cantidad_total=F('cantidad_total') + cantidad,
+        total=F('total') + importe,
+    )
+
+
+def recalcular_totales(carrito_ids=None):
+    """Repara cantidad_total y total con un único UPDATE agregado"""
+    detalles = CarritoDetalle.objects.filter(carrito=OuterRef('pk')).values('carrito')
+    carritos = Carrito.objects.all()
+    if carrito_ids is not None:
+        carritos = carritos.filter(pk__in=carrito_ids)
+    return carritos.update(
+        cantidad_total=Coalesce(
+            Subquery(detalles.annotate(suma=Sum('cantidad')).values('suma'),
+                     output_field=PositiveIntegerField()),
+            0,
+        ),
+        total=Coalesce(
+            Subquery(detalles.annotate(suma=Sum(F('cantidad') * F('precio_unitario'))).values('suma'),
+                     output_field=DecimalField(max_digits=12, decimal_places=2)),
+            0,
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+# ============================
+# LIMPIEZA DE CARRITOS
+# ============================
+
+def desactivar_duplicados():
+    """Deja un solo carrito activo por cliente y por sesión (el más reciente).
+
+    Devuelve (carritos revisados, carritos desactivados) con una consulta
+    de ventana por cada clave.
+    """
+    revisados = desactivados = 0
+    for clave, filtro in (('cliente', {'cliente__isnull': False}),
+                          ('session_key', {'cliente__isnull': True, 'session_key__isnull': False})):
+        activos = Carrito.objects.filter(activo=True, **filtro)
+        revisados += activos.count()
+        duplicados = list(
+            activos.annotate(posicion=Window(
+                RowNumber(),
+                partition_by=F(clave),
+                order_by=[F('fecha_creacion').desc(), F('id').desc()],
+            )).filter(posicion__gt=1).values_list('id', flat=True)
+        )
+        desactivados += Carrito.objects.filter(id__in=duplicados).update(activo=False)
+    return revisados, desactivados
+
+
+def carritos_anonimos_vencidos(ttl):
+    """Carritos sin cliente sin actividad en `ttl`, o cuya sesión ya expiró"""
+    ahora = timezone.now()
+    vencidos = Q(fecha_actualizacion__lt=ahora - ttl) | Q(session_key__isnull=True)
+    if settings.SESSION_ENGINE in ('django.contrib.sessions.backends.db',
+                                   'django.contrib.sessions.backends.cached_db'):
+        vencidos |= ~Exists(Session.objects.filter(session_key=OuterRef('session_key'), expire_date__gt=ahora))
+    return Carrito.objects.filter(vencidos, cliente__isnull=True)
+
+
+def purgar_carritos_anonimos(ttl, lote=500):
+    """Borra carritos anónimos vencidos en lotes de `lote` (transacciones cortas).
+
+    Los detalles se borran con un DELETE directo: el carrito desaparece con
+    ellos, así que no hace falta ajustar sus totales fila por fila.
+    Devuelve (carritos borrados, detalles borrados).
+    """
+    candidatos = carritos_anonimos_vencidos(ttl).order_by('id')
+    carritos = detalles = 0
+    ultimo_id = 0
+    while True:
+        ids = list(candidatos.filter(id__gt=ultimo_id).values_list('id', flat=True)[:lote])
+        if not ids:
+            break
+        ultimo_id = ids[-1]
+        with transaction.atomic():
+            detalles += CarritoDetalle.objects.filter(carrito_id__in=ids)._raw_delete(CarritoDetalle.objects.db)
+            carritos += Carrito.objects.filter(id__in=ids).delete()[1].get(Carrito._meta.label, 0)
+    return carritos, detalles
@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, OuterRef, Sum, Value, When
+
+from .disponibilidad import recalcular_existencias_por_ingredientes, reservado, reservas_activas
+from .inventario import anotar_movimientos
+from .models import Compra, Ingrediente, Inventario, ItemCompra, Receta, Reserva
+from .signals import al_confirmar
+from .tareas import encolar, tarea
+
+# ============================
+# CHECKOUT TRANSACCIONAL
+# ============================
+# Toda la compra corre en una transacción: la demanda de ingredientes del
+# carrito sale de una consulta agrupada sobre Receta y el inventario se
+# descuenta con un único UPDATE condicional. Si algún ingrediente no
+# alcanza, el UPDATE no toca esa fila, el conteo no coincide y se revierte
+# todo; así dos compras simultáneas nunca se llevan la misma última unidad.
+# Con reservas activas, lo apartado por otros carritos tampoco se puede
+# tomar y las reservas del propio carrito se consumen en la compra.
+
+DECIMAL_INVENTARIO = DecimalField(max_digits=10, decimal_places=2)
+
+
+class CompraRechazada(Exception):
+    pass
+
+
+def demanda_de_ingredientes(carrito):
+    """{ingrediente_id: cantidad total} para preparar todo el carrito (una consulta)"""
+    recetas = (
+        Receta.objects
+        .filter(producto__carritodetalle__carrito=carrito)
+        .values('ingrediente_id')
+        .annotate(total=Sum(ExpressionWrapper(
+            F('cantidad_necesaria') * F('producto__carritodetalle__cantidad'),
+            output_field=DECIMAL_INVENTARIO,
+        )))
+        .values_list('ingrediente_id', 'total')
+    )
+    return dict(recetas)
+
+
+def descontar_inventario(demanda, carrito=None):
+    """Descuenta la demanda de Inventario solo si alcanza para todos los ingredientes.
+
+    Lo reservado por carritos distintos de `carrito` no cuenta como stock.
+    Lanza CompraRechazada con los ingredientes faltantes si no alcanza.
+    """
+    if not demanda:
+        return
+    necesidad = Case(
+        *[When(ingrediente_id=ingrediente_id, then=Value(cantidad)) for ingrediente_id, cantidad in demanda.items()],
+        output_field=DECIMAL_INVENTARIO,
+    )
+    # La condición del UPDATE es la que protege el stock: cada fila se
+    # compara y descuenta en la misma sentencia, sin leerla antes
+    inventarios = Inventario.objects.filter(ingrediente_id__in=demanda)
+    apartado = reservado(OuterRef('ingrediente_id'), carrito)
+    actualizados = inventarios.filter(cantidad_actual__gte=necesidad + apartado).update(
+        cantidad_actual=F('cantidad_actual') - necesidad
+    )
+    if actualizados != len(demanda):
+        stock = dict(
+            inventarios.annotate(libre=F('cantidad_actual') - apartado).values_list('ingrediente_id', 'libre')
+        )
+        faltantes = [i for i, cantidad in demanda.items() if stock.get(i, 0) < cantidad]
+        nombres = Ingrediente.objects.filter(id__in=faltantes).values_list('nombre', flat=True)
+        raise CompraRechazada(f"No hay stock suficiente de: {', '.join(sorted(nombres))}")
+
+
+def realizar_compra(usuario_id, carrito):
+    """Convierte el carrito en una Compra, descontando inventario. Todo o nada."""
+    with transaction.atomic():
+        lineas = list(carrito.detalles.values_list('producto_id', 'cantidad', 'precio_unitario'))
+        if not lineas:
+            raise CompraRechazada("Tu carrito está vacío")
+
+        demanda = demanda_de_ingredientes(carrito)
+        descontar_inventario(demanda, carrito)
+        if reservas_activas():
+            # Las reservas del carrito pasan a ser el descuento que acaba de hacerse
+            Reserva.objects.filter(carrito=carrito).delete()
+
+        compra = Compra.objects.create(
+            usuario_id=usuario_id,
+            total=sum(cantidad * precio for _, cantidad, precio in lineas),
+            cantidad_items=sum(cantidad for _, cantidad, _ in lineas),
+        )
+        ItemCompra.objects.bulk_create([
+            ItemCompra(compra=compra, producto_id=producto_id, cantidad=cantidad, precio_unitario=precio)
+            for producto_id, cantidad, precio in lineas
+        ])
+        # El UPDATE condicional ya descontó; al libro van las salidas
+        anotar_movimientos({i: -cantidad for i, cantidad in demanda.items()}, 'venta', f'compra:{compra.id}')
+        carrito.vaciar()
+        # El comprobante sale por la cola: se encola en esta misma transacción
+        encolar(enviar_comprobante, compra.id)
+
+        # El UPDATE en lote no dispara las señales de Inventario
+        if demanda:
+            al_confirmar(recalcular_existencias_por_ingredientes, list(demanda))
+    return compra
+
+
+# ============================
+# TAREAS POSTERIORES A LA COMPRA
+# ============================
+
+@tarea
+def enviar_comprobante(compra_id):
+    """Envía por correo el comprobante de la compra al usuario"""
+    compra = Compra.objects.select_related('usuario').get(id=compra_id)
+    lineas = [
+        f"{item.cantidad} x {item.producto.nombre}: ${item.subtotal}"
+        for item in compra.items.select_related('producto')
+    ]
+    send_mail(
+        subject=f"Comprobante de tu compra #{compra.id}",
+        message="\n".join([f"Hola {compra.usuario.nombre_usuario},", "", *lineas, "", f"Total: ${compra.total}"]),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[compra.usuario.email],
+    )
@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+from .models import MargenProducto, Producto, Receta
+
+# ============================
+# COSTOS Y MÁRGENES (RECÁLCULO EN LOTE)
+# ============================
+
+
+def calcular_costos(producto_ids):
+    """Costo de producción por producto con una sola consulta sobre Receta"""
+    costos = {producto_id: Decimal('0') for producto_id in producto_ids}
+    recetas = Receta.objects.filter(producto_id__in=costos).values_list(
+        'producto_id', 'cantidad_necesaria', 'ingrediente__costo_unitario'
+    )
+    for producto_id, cantidad, costo_unitario in recetas:
+        costos[producto_id] += cantidad * costo_unitario
+    return costos
+
+
+def recalcular_costos(producto_ids=None):
+    """Actualiza MargenProducto de los productos indicados (todos si None)"""
+    productos = Producto.objects.all()
+    if producto_ids is not None:
+        productos = productos.filter(id__in=producto_ids)
+    precios = dict(productos.values_list('id', 'precio'))
+    if not precios:
+        return 0
+
+    margenes = [
+        MargenProducto(producto_id=producto_id, costo_produccion=costo, margen=precios[producto_id] - costo)
+        for producto_id, costo in calcular_costos(precios).items()
+    ]
+    MargenProducto.objects.bulk_create(
+        margenes,
+        update_conflicts=True,
+        unique_fields=['producto'],
+        update_fields=['costo_produccion', 'margen', 'fecha_actualizacion'],
+    )
+    return len(margenes)
+
+
+def recalcular_costos_por_ingredientes(ingrediente_ids):
+    """Recalcula los productos cuya receta usa alguno de los ingredientes"""
+    producto_ids = set(
+        Receta.objects.filter(ingrediente_id__in=ingrediente_ids)
+        .values_list('producto_id', flat=True)
+    )
+    if producto_ids:
+        recalcular_costos(producto_ids)
@@ -0,0 +1,167 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache_catalogo import invalidar_menus
+from .models import ExistenciaProducto, Producto, Receta, Reserva
+
+# ============================
+# DISPONIBILIDAD DE PRODUCTOS (CONSULTAS AGREGADAS)
+# ============================
+# Un producto está disponible si TODOS los ingredientes de su receta tienen
+# stock suficiente (un ingrediente sin inventario cuenta como stock 0).
+# Los productos sin receta siempre están disponibles.
+#
+# Con settings.RESERVAS_TTL activo, lo que otros carritos tienen reservado
+# (ver core/reservas.py) se descuenta del stock; el carrito propio se pasa
+# como `carrito` para no competir con sus propias reservas.
+
+DECIMAL_STOCK = DecimalField(max_digits=10, decimal_places=2)
+
+
+def reservas_activas():
+    return bool(settings.RESERVAS_TTL)
+
+
+def reservado(ingrediente_ref, carrito=None):
+    """Expresión con la cantidad reservada vigente de un ingrediente.
+
+    `ingrediente_ref` es el id o un OuterRef; la suma sale del índice
+    (ingrediente, vence, cantidad) sin leer la tabla.
+    """
+    if not reservas_activas():
+        return Value(Decimal('0'), output_field=DECIMAL_STOCK)
+    reservas = Reserva.objects.filter(ingrediente_id=ingrediente_ref, vence__gt=timezone.now())
+    if getattr(carrito, 'pk', None) is not None:
+        reservas = reservas.exclude(carrito_id=carrito.pk)
+    suma = reservas.order_by().values('ingrediente_id').annotate(total=Sum('cantidad')).values('total')
+    return Coalesce(Subquery(suma, output_field=DECIMAL_STOCK), Value(Decimal('0')), output_field=DECIMAL_STOCK)
+
+
+def recetas_con_faltante(carrito=None):
+    """Recetas cuyo ingrediente no alcanza para preparar una unidad"""
+    return Receta.objects.annotate(
+        stock_ingrediente=Coalesce(
+            'ingrediente__inventario__cantidad_actual',
+            Value(Decimal('0')),
+            output_field=DECIMAL_STOCK,
+        ) - reservado(OuterRef('ingrediente_id'), carrito)
+    ).filter(stock_ingrediente__lt=F('cantidad_necesaria'))
+
+
+def anotar_disponibilidad(productos, carrito=None):
+    """Anota `hay_stock` en un queryset de productos con una sola subconsulta"""
+    faltantes = recetas_con_faltante(carrito).filter(producto=OuterRef('pk'))
+    return productos.annotate(hay_stock=~Exists(faltantes))
+
+
+def ids_disponibles(productos, carrito=None):
+    """Devuelve el conjunto de ids disponibles de un queryset o lista de ids"""
+    if hasattr(productos, 'values_list'):
+        ids = set(productos.values_list('id', flat=True))
+    else:
+        ids = set(productos)
+    if not ids:
+        return set()
+
+    sin_stock = set(
+        recetas_con_faltante(carrito)
+        .filter(producto_id__in=ids)
+        .values_list('producto_id', flat=True)
+        .distinct()
+    )
+    return ids - sin_stock
+
+
+def disponibles_de_restaurante(restaurante):
+    """Ids de los productos activos de un restaurante que se pueden preparar"""
+    productos = Producto.objects.filter(restaurante=restaurante, activo=True)
+    return set(
+        anotar_disponibilidad(productos)
+        .filter(hay_stock=True)
+        .values_list('id', flat=True)
+    )
+
+
+def producto_disponible(producto, carrito=None):
+    """Disponibilidad de un producto; reutiliza la anotación si ya viene cargada"""
+    hay_stock = getattr(producto, 'hay_stock', None)
+    if hay_stock is not None and carrito is None:
+        return hay_stock
+    return not recetas_con_faltante(carrito).filter(producto_id=producto.pk).exists()
+
+
+# ============================
+# UNIDADES PREPARABLES (TABLA MATERIALIZADA)
+# ============================
+
+def calcular_unidades(producto_ids):
+    """Calcula las unidades preparables por producto con una sola consulta.
+
+    Devuelve {producto_id: unidades}; None significa que no hay receta que
+    limite la producción.
+    """
+    unidades = {producto_id: None for producto_id in producto_ids}
+    recetas = Receta.objects.filter(producto_id__in=unidades).annotate(
+        reservado=reservado(OuterRef('ingrediente_id'))
+    ).values_list(
+        'producto_id',
+        'cantidad_necesaria',
+        'ingrediente__inventario__cantidad_actual',
+        'reservado',
+    )
+    for producto_id, necesaria, stock, apartado in recetas:
+        stock = (stock or Decimal('0')) - (apartado or Decimal('0'))
+        if necesaria > 0:
+            posibles = max(int(stock // necesaria), 0)
+        elif stock < necesaria:
+            posibles = 0
+        else:
+            continue
+        actual = unidades[producto_id]
+        unidades[producto_id] = posibles if actual is None else min(actual, posibles)
+    return unidades
+
+
+def recalcular_existencias(producto_ids=None):
+    """Actualiza ExistenciaProducto solo para los productos indicados (todos si None)"""
+    productos = Producto.objects.all()
+    if producto_ids is not None:
+        productos = productos.filter(id__in=producto_ids)
+    restaurante_por_producto = dict(productos.values_list('id', 'restaurante_id'))
+    if not restaurante_por_producto:
+        return 0
+
+    existencias = [
+        ExistenciaProducto(producto_id=producto_id, unidades=unidades)
+        for producto_id, unidades in calcular_unidades(restaurante_por_producto).items()
+    ]
+    ExistenciaProducto.objects.bulk_create(
+        existencias,
+        update_conflicts=True,
+        unique_fields=['producto'],
+        update_fields=['unidades', 'fecha_actualizacion'],
+    )
+    # Los menús cacheados de esos restaurantes muestran disponibilidad
+    invalidar_menus(restaurante_por_producto.values())
+    return len(existencias)
+
+
+def recalcular_existencias_por_ingredientes(ingrediente_ids):
+    """Recalcula los productos cuya receta usa alguno de los ingredientes"""
+    producto_ids = set(
+        Receta.objects.filter(ingrediente_id__in=ingrediente_ids)
+        .values_list('producto_id', flat=True)
+    )
+    if producto_ids:
+        recalcular_existencias(producto_ids)
+
+
+def con_existencias(productos):
+    """Filtra un queryset a los productos con unidades preparables según la tabla"""
+    return productos.filter(
+        Q(existencia__unidades__isnull=True) | Q(existencia__unidades__gte=1)
+    )
@@ -0,0 +1,206 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from datetime import timedelta
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .models import EventoEstado
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# EVENTOS DE CAMBIO DE ESTADO (SSE)
+# ============================
+# Las señales de Pedido y Compra publican cada cambio de estado al
+# confirmarse la transacción. Un hub en memoria reparte cada evento a las
+# suscripciones de sus canales; cada suscripción es una cola asyncio que
+# consume un stream SSE (vista eventos_estado), así que una conexión
+# inactiva no ocupa un hilo, solo una corrutina esperando.
+#
+# Canales: 'cocina' (todos los cambios, para staff), 'usuario:<id>'
+# (compras del usuario) y 'cliente:<id>' (pedidos del cliente).
+#
+# settings.EVENTOS_BROKER elige cómo llegan los eventos al hub:
+#   'local' el mismo proceso que publica reparte (un solo proceso)
+#   'base'  se guardan en EventoEstado y cada proceso las lee cada
+#           EVENTOS_INTERVALO segundos (varios procesos sin servidor extra)
+#
+# Los eventos vencidos (EVENTOS_RETENCION) los borra quien publica, cada
+# EVENTOS_PURGAR_CADA publicaciones: la tabla no crece aunque ningún
+# proceso tenga suscriptores leyéndola.
+
+
+class Suscripcion:
+
+    def __init__(self, canales, maximo):
+        self.canales = frozenset(canales)
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=maximo)
+
+    def entregar(self, evento):
+        """Encola el evento desde cualquier hilo"""
+        try:
+            self.loop.call_soon_threadsafe(self._poner, evento)
+        except RuntimeError:
+            # El loop ya cerró: la conexión terminó
+            pass
+
+    def _poner(self, evento):
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente que no lee: se descarta el evento, no se bloquea al resto
+            logger.warning("Suscripción saturada, evento %s descartado", evento.get('id'))
+
+
+class Hub:
+    """Reparte eventos a las suscripciones del proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_canal = {}
+
+    def suscribir(self, canales, maximo=100):
+        suscripcion = Suscripcion(canales, maximo)
+        with self._lock:
+            for canal in suscripcion.canales:
+                self._por_canal.setdefault(canal, set()).add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            for canal in suscripcion.canales:
+                suscriptores = self._por_canal.get(canal)
+                if suscriptores is not None:
+                    suscriptores.discard(suscripcion)
+                    if not suscriptores:
+                        del self._por_canal[canal]
+
+    def distribuir(self, canales, evento):
+        with self._lock:
+            destinatarios = set().union(*(self._por_canal.get(canal, ()) for canal in canales))
+        for suscripcion in destinatarios:
+            suscripcion.entregar(evento)
+
+    @property
+    def suscripciones(self):
+        with self._lock:
+            return len(set().union(*self._por_canal.values()))
+
+
+hub = Hub()
+
+
+# ============================
+# BROKERS
+# ============================
+
+class BrokerLocal:
+    """Un solo proceso: publicar es repartir directamente"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def publicar(self, canales, datos):
+        hub.distribuir(canales, {'id': next(self._ids), **datos})
+
+    def iniciar(self):
+        pass
+
+
+class BrokerBase:
+    """Varios procesos: los eventos pasan por la tabla EventoEstado"""
+
+    def __init__(self):
+        self._tareas = {}
+        self._publicados = itertools.count(1)
+
+    def publicar(self, canales, datos):
+        EventoEstado.objects.create(canales=','.join(canales), datos=datos)
+        if next(self._publicados) % settings.EVENTOS_PURGAR_CADA == 0:
+            self._purgar()
+
+    def iniciar(self):
+        """Arranca (una vez por loop) la lectura periódica de eventos nuevos"""
+        loop = asyncio.get_running_loop()
+        tarea = self._tareas.get(loop)
+        if tarea is None or tarea.done():
+            tarea = self._tareas[loop] = loop.create_task(self._leer())
+            tarea.add_done_callback(partial(self._terminada, loop))
+
+    def _terminada(self, loop, tarea):
+        """Olvida la lectura que terminó y la rearranca si alguien se suscribió
+        mientras salía (entre el último control de suscripciones y el fin)"""
+        if self._tareas.get(loop) is tarea:
+            del self._tareas[loop]
+        if tarea.cancelled():
+            return
+        if tarea.exception() is not None:
+            logger.error("Falló la lectura de eventos", exc_info=tarea.exception())
+            return
+        if hub.suscripciones and not loop.is_closed():
+            self.iniciar()
+
+    def _ultimo_id(self):
+        return EventoEstado.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    def _nuevos(self, desde):
+        return list(EventoEstado.objects.filter(id__gt=desde).order_by('id').values_list('id', 'canales', 'datos'))
+
+    def _purgar(self):
+        limite = timezone.now() - timedelta(seconds=settings.EVENTOS_RETENCION)
+        EventoEstado.objects.filter(fecha__lt=limite).delete()
+
+    async def _leer(self):
+        ultimo = await sync_to_async(self._ultimo_id)()
+        while hub.suscripciones:
+            await asyncio.sleep(settings.EVENTOS_INTERVALO)
+            for evento_id, canales, datos in await sync_to_async(self._nuevos)(ultimo):
+                hub.distribuir(canales.split(','), {'id': evento_id, **datos})
+                ultimo = evento_id
+
+
+_brokers = {'local': BrokerLocal(), 'base': BrokerBase()}
+
+
+def broker():
+    return _brokers[settings.EVENTOS_BROKER]
+
+
+def publicar_cambio(tipo, objeto_id, estado, anterior, canales):
+    """Publica un cambio de estado (llamar al confirmar la transacción)"""
+    broker().publicar(canales, {
+        'tipo': tipo,
+        'objeto_id': objeto_id,
+        'estado': estado,
+        'anterior': anterior,
+        'fecha': timezone.now().isoformat(),
+    })
+
+
+def formatear_sse(evento):
+    return f"id: {evento['id']}\nevent: estado\ndata: {json.dumps(evento)}\n\n"
+
+
+async def stream_de_eventos(canales):
+    """Generador asíncrono del cuerpo SSE para los canales dados"""
+    suscripcion = hub.suscribir(canales)
+    broker().iniciar()
+    try:
+        yield f"retry: {settings.EVENTOS_REINTENTO_MS}\n\n"
+        while True:
+            try:
+                evento = await asyncio.wait_for(suscripcion.cola.get(), settings.EVENTOS_LATIDO)
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ": latido\n\n"
+                continue
+            yield formatear_sse(evento)
+    finally:
+        hub.cancelar(suscripcion)
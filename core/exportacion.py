@@ -0,0 +1,79 @@
+import csv
+import json
+
+from .models import Producto
+
+# ============================
+# EXPORTACIÓN DEL CATÁLOGO COMPLETO (STREAMING)
+# ============================
+# Una fila por producto con su restaurante, categoría, precio y
+# disponibilidad. Se recorre con .iterator() para que la memoria no crezca
+# con el tamaño del catálogo; lo usan la vista exportar_catalogo y el
+# comando manage.py exportar_catalogo.
+
+COLUMNAS = [
+    'producto_id', 'producto', 'descripcion', 'precio', 'activo', 'destacado',
+    'disponible', 'unidades_disponibles',
+    'restaurante_id', 'restaurante', 'restaurante_activo',
+    'categoria_id', 'categoria',
+]
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+TAMANO_LOTE = 2000
+
+
+def filas_catalogo(chunk_size=TAMANO_LOTE):
+    productos = (
+        Producto.objects
+        .select_related('restaurante', 'categoria_menu', 'existencia')
+        .order_by('id')
+        .iterator(chunk_size=chunk_size)
+    )
+    for p in productos:
+        restaurante = p.restaurante
+        categoria = p.categoria_menu
+        yield {
+            'producto_id': p.id,
+            'producto': p.nombre,
+            'descripcion': p.descripcion or '',
+            'precio': str(p.precio),
+            'activo': p.activo,
+            'destacado': p.destacado,
+            'disponible': not p.agotado,
+            'unidades_disponibles': p.unidades_disponibles,
+            'restaurante_id': p.restaurante_id,
+            'restaurante': restaurante.nombre if restaurante else None,
+            'restaurante_activo': restaurante.activo if restaurante else None,
+            'categoria_id': p.categoria_menu_id,
+            'categoria': categoria.nombre if categoria else None,
+        }
+
+
+def lineas_ndjson(filas):
+    for fila in filas:
+        yield json.dumps(fila, ensure_ascii=False) + '\n'
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla"""
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(COLUMNAS)
+    for fila in filas:
+        yield escritor.writerow(['' if fila[c] is None else fila[c] for c in COLUMNAS])
+
+
+def exportar(formato, chunk_size=TAMANO_LOTE):
+    """Generador de líneas del catálogo en el formato pedido ('ndjson' o 'csv')"""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    filas = filas_catalogo(chunk_size)
+    return lineas_csv(filas) if formato == 'csv' else lineas_ndjson(filas)
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Compra, ItemCompra
+
+# ============================
+# HISTORIAL DE COMPRAS (PAGINACIÓN POR CURSOR)
+# ============================
+# "Mis compras" se pagina por cursor sobre (fecha_compra, id), de la más
+# nueva a la más vieja: cada página es un rango del índice
+# compra_historial_idx, así que la página mil cuesta lo mismo que la
+# primera (un OFFSET recorrería todas las anteriores). El id desempata
+# compras del mismo instante.
+#
+# El cursor es "<microsegundos desde 1970>_<id>" de la última compra vista.
+
+EPOCA = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSEGUNDO = timedelta(microseconds=1)
+
+
+def cursor_de(compra):
+    return f"{(compra.fecha_compra - EPOCA) // MICROSEGUNDO}_{compra.id}"
+
+
+def leer_cursor(cursor):
+    """(fecha_compra, id) de un cursor; ValueError si está mal formado"""
+    microsegundos, _, compra_id = cursor.partition('_')
+    compra_id = int(compra_id)
+    # Un id que no entra en un entero de 64 bits no llega a la base
+    if not 0 < compra_id < 2 ** 63:
+        raise ValueError("Cursor fuera de rango")
+    try:
+        return EPOCA + timedelta(microseconds=int(microsegundos)), compra_id
+    except OverflowError:
+        raise ValueError("Cursor fuera de rango")
+
+
+def pagina_de_compras(usuario_id, cursor=None, limite=20, con_items=True):
+    """Devuelve (compras, cursor_siguiente) del usuario, de la más nueva a la más vieja.
+
+    Con `con_items` precarga ítems y productos (dos consultas para toda la
+    página); sin ellos basta Compra.cantidad_items para el resumen.
+    """
+    compras = Compra.objects.filter(usuario_id=usuario_id).order_by('-fecha_compra', '-id')
+    if cursor:
+        fecha, compra_id = leer_cursor(cursor)
+        # El `<=` redundante permite al índice saltar directo al cursor; el OR
+        # solo no se usa para acotar el rango
+        compras = compras.filter(fecha_compra__lte=fecha).filter(Q(fecha_compra__lt=fecha) | Q(id__lt=compra_id))
+    if con_items:
+        compras = compras.prefetch_related('items__producto')
+
+    # Se pide una de más para saber si hay otra página sin contar el total
+    pagina = list(compras[:limite + 1])
+    hay_mas = len(pagina) > limite
+    pagina = pagina[:limite]
+    return pagina, cursor_de(pagina[-1]) if hay_mas else None
+
+
+def recontar_items(compra_ids):
+    """Recalcula Compra.cantidad_items de las compras indicadas (un UPDATE)"""
+    unidades = (
+        ItemCompra.objects.filter(compra=OuterRef('pk'))
+        .values('compra').annotate(total=Sum('cantidad')).values('total')
+    )
+    Compra.objects.filter(id__in=compra_ids).update(cantidad_items=Coalesce(Subquery(unidades), Value(0)))
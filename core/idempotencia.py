@@ -0,0 +1,119 @@
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import ClaveIdempotencia
+
+# ============================
+# IDEMPOTENCIA DE PETICIONES POST
+# ============================
+# Si la petición trae la cabecera Idempotency-Key (o el campo de formulario
+# idempotency_key), la primera vez se reserva la clave, se ejecuta la vista
+# y se guarda su respuesta; las repeticiones devuelven esa respuesta sin
+# volver a ejecutar la vista. El camino feliz cuesta un INSERT y un UPDATE
+# por la restricción única (ambito, clave).
+#
+# Una reserva sin respuesta es una petición en curso; si el proceso cae a
+# mitad de camino, pasados IDEMPOTENCIA_EN_CURSO segundos otra petición con
+# la misma clave la retoma en vez de recibir 409 hasta que venza.
+
+CABECERA = 'Idempotency-Key'
+CAMPO_FORMULARIO = 'idempotency_key'
+
+
+def _ambito(request):
+    canal = getattr(request, 'canal_socio', None)
+    if canal:
+        return f'socio:{canal}'
+    if request.user.is_authenticated:
+        return f'usuario:{request.user.pk}'
+    if not request.session.session_key:
+        request.session.create()
+    return f'sesion:{request.session.session_key}'
+
+
+def _vencimiento():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCIA_TTL)
+
+
+def _abandonada(registro):
+    """Reserva sin respuesta más vieja que IDEMPOTENCIA_EN_CURSO"""
+    limite = timezone.now() - timedelta(seconds=settings.IDEMPOTENCIA_EN_CURSO)
+    return registro.estado_http is None and registro.fecha_creacion < limite
+
+
+def _reservar(ambito, clave, ruta):
+    """Crea la reserva de la clave; devuelve (registro, es_nueva)"""
+    try:
+        with transaction.atomic():
+            return ClaveIdempotencia.objects.create(ambito=ambito, clave=clave, ruta=ruta), True
+    except IntegrityError:
+        pass
+    registro = ClaveIdempotencia.objects.filter(ambito=ambito, clave=clave).first()
+    if registro is not None and (
+        registro.fecha_creacion < _vencimiento() or (registro.ruta == ruta and _abandonada(registro))
+    ):
+        # Vencida o abandonada: se trata como una clave nueva. Se borra por
+        # id, así dos reintentos simultáneos no se borran la reserva entre sí
+        ClaveIdempotencia.objects.filter(pk=registro.pk).delete()
+        return _reservar(ambito, clave, ruta)
+    return registro, False
+
+
+def _repetir(registro):
+    respuesta = HttpResponse(bytes(registro.cuerpo), status=registro.estado_http,
+                             content_type=registro.content_type or None)
+    if registro.ubicacion:
+        respuesta['Location'] = registro.ubicacion
+    respuesta['Idempotent-Replayed'] = 'true'
+    return respuesta
+
+
+def idempotente(vista):
+    """Hace que un POST con clave de idempotencia se ejecute una sola vez"""
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        clave = request.headers.get(CABECERA) or request.POST.get(CAMPO_FORMULARIO)
+        if request.method != 'POST' or not clave:
+            return vista(request, *args, **kwargs)
+
+        registro, es_nueva = _reservar(_ambito(request), clave[:100], request.path[:200])
+        if not es_nueva:
+            if registro is not None and registro.ruta != request.path[:200]:
+                return JsonResponse({'success': False, 'error': 'La clave ya se usó en otra operación'},
+                                    status=422)
+            if registro is None or registro.estado_http is None:
+                return JsonResponse({'success': False, 'error': 'La petición original aún se está procesando'},
+                                    status=409)
+            return _repetir(registro)
+
+        try:
+            respuesta = vista(request, *args, **kwargs)
+        except Exception:
+            # Un error no controlado libera la clave: el cliente puede reintentar
+            ClaveIdempotencia.objects.filter(pk=registro.pk).delete()
+            raise
+        if respuesta.streaming or respuesta.status_code >= 500:
+            # No se guardan errores del servidor: el cliente puede reintentar
+            ClaveIdempotencia.objects.filter(pk=registro.pk).delete()
+            return respuesta
+
+        # UPDATE por id: si otra petición retomó la clave por demorarse esta,
+        # no toca nada y la respuesta se entrega igual
+        ClaveIdempotencia.objects.filter(pk=registro.pk).update(
+            estado_http=respuesta.status_code,
+            content_type=respuesta.get('Content-Type', ''),
+            ubicacion=respuesta.get('Location', ''),
+            cuerpo=respuesta.content,
+        )
+        return respuesta
+    return envoltura
+
+
+def purgar_claves_vencidas():
+    """Borra las claves más viejas que IDEMPOTENCIA_TTL (usa el índice de fecha)"""
+    return ClaveIdempotencia.objects.filter(fecha_creacion__lt=_vencimiento()).delete()[0]
@@ -0,0 +1,345 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+
+from .busqueda import indexar_por_categorias, indexar_por_restaurantes, indexar_productos
+from .cache_catalogo import invalidar_catalogo, invalidar_menus, invalidar_precios
+from .costos import recalcular_costos, recalcular_costos_por_ingredientes
+from .disponibilidad import recalcular_existencias, recalcular_existencias_por_ingredientes
+from .inventario import anotar_movimientos
+from .models import CategoriaMenu, Ingrediente, Inventario, Producto, Receta, RestauranteVirtual
+from .signals import al_confirmar
+
+# ============================
+# IMPORTACIÓN MASIVA DEL CATÁLOGO
+# ============================
+# Crea o actualiza (nunca borra) restaurantes, categorías, ingredientes,
+# inventario, productos y recetas identificándolos por claves naturales:
+#
+#   restaurantes  nombre
+#   categorias    restaurante, nombre
+#   ingredientes  nombre
+#   inventario    ingrediente
+#   productos     restaurante, nombre   (+ categoria por nombre)
+#   recetas       restaurante, producto, ingrediente
+#
+# Todo corre en una transacción con bulk_create/bulk_update por sección.
+# Como las operaciones en lote no disparan señales, al final se programan a
+# mano los mismos recálculos que harían (existencias, costos, índice de
+# búsqueda y caché de menús).
+
+SECCIONES = ['restaurantes', 'categorias', 'ingredientes', 'inventario', 'productos', 'recetas']
+
+TAMANO_LOTE = 500
+
+
+class ErrorImportacion(ValueError):
+    pass
+
+
+class Cambio:
+    """Una fila creada o modificada, para el resumen y el modo diff"""
+
+    def __init__(self, seccion, clave, campos, nuevo):
+        self.seccion = seccion
+        self.clave = clave
+        self.campos = campos  # {campo: (antes, después)}
+        self.nuevo = nuevo
+
+    def __str__(self):
+        clave = ' / '.join(str(parte) for parte in self.clave) if isinstance(self.clave, tuple) else self.clave
+        if self.nuevo:
+            return f"+ {self.seccion}: {clave}"
+        detalle = ', '.join(f"{campo}: {antes} -> {despues}" for campo, (antes, despues) in self.campos.items())
+        return f"~ {self.seccion}: {clave} ({detalle})"
+
+
+# ============================
+# LECTURA DE ARCHIVOS
+# ============================
+
+def leer_datos(ruta):
+    """Lee un .json con las secciones como listas, o CSV (uno por sección).
+
+    Para CSV se acepta un directorio con <seccion>.csv o un solo archivo
+    cuyo nombre sea el de la sección (p. ej. productos.csv).
+    """
+    ruta = Path(ruta)
+    if ruta.is_dir():
+        archivos = {seccion: ruta / f'{seccion}.csv' for seccion in SECCIONES}
+        return {seccion: _leer_csv(archivo) for seccion, archivo in archivos.items() if archivo.exists()}
+    if ruta.suffix.lower() == '.csv':
+        if ruta.stem not in SECCIONES:
+            raise ErrorImportacion(f"El CSV debe llamarse como una sección: {', '.join(SECCIONES)}")
+        return {ruta.stem: _leer_csv(ruta)}
+    with open(ruta, encoding='utf-8') as archivo:
+        datos = json.load(archivo)
+    desconocidas = set(datos) - set(SECCIONES)
+    if desconocidas:
+        raise ErrorImportacion(f"Secciones desconocidas: {', '.join(sorted(desconocidas))}")
+    return datos
+
+
+def _leer_csv(archivo):
+    with open(archivo, encoding='utf-8-sig', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def _convertir(modelo, campo, valor):
+    """Convierte un valor del archivo (texto de CSV o tipo JSON) al del campo"""
+    field = modelo._meta.get_field(campo)
+    if valor is None or valor == '':
+        if field.null:
+            return None
+        if field.has_default():
+            return field.get_default()
+        return '' if isinstance(field, (models.CharField, models.TextField)) else None
+    if isinstance(field, models.BooleanField) and isinstance(valor, str):
+        texto = valor.strip().lower()
+        if texto in ('1', 'true', 't', 'si', 'sí', 'yes'):
+            return True
+        if texto in ('0', 'false', 'f', 'no'):
+            return False
+    if isinstance(valor, float):
+        valor = str(valor)
+    try:
+        return field.to_python(valor)
+    except ValidationError:
+        raise ErrorImportacion(f"Valor inválido para {modelo.__name__}.{campo}: {valor!r}")
+
+
+# ============================
+# IMPORTACIÓN
+# ============================
+
+class _Importacion:
+
+    def __init__(self, datos):
+        self.datos = datos
+        self.cambios = []
+        self.creados = {}
+        self.actualizados = {}
+
+    def _filas(self, seccion, requeridos):
+        filas = self.datos.get(seccion) or []
+        for numero, fila in enumerate(filas, start=1):
+            faltantes = [campo for campo in requeridos if not fila.get(campo)]
+            if faltantes:
+                raise ErrorImportacion(f"{seccion}, fila {numero}: faltan {', '.join(faltantes)}")
+            yield numero, fila
+
+    def _aplicar(self, seccion, modelo, existentes, entradas, requeridos_al_crear=()):
+        """Crea o actualiza en lote. `entradas` es una lista de (clave, valores).
+
+        Devuelve el diccionario clave -> objeto (existentes + creados).
+        """
+        vistas = set()
+        nuevos = []
+        modificados = []
+        campos_modificados = set()
+        for clave, valores in entradas:
+            if clave in vistas:
+                raise ErrorImportacion(f"{seccion}: '{clave}' aparece más de una vez")
+            vistas.add(clave)
+
+            objeto = existentes.get(clave)
+            if objeto is None:
+                faltantes = [campo for campo in requeridos_al_crear if valores.get(campo) is None]
+                if faltantes:
+                    raise ErrorImportacion(f"{seccion}: '{clave}' es nuevo y le faltan {', '.join(faltantes)}")
+                objeto = modelo(**valores)
+                existentes[clave] = objeto
+                nuevos.append(objeto)
+                self.cambios.append(Cambio(seccion, clave, {}, nuevo=True))
+                continue
+
+            cambios = {
+                campo: (getattr(objeto, campo), valor)
+                for campo, valor in valores.items()
+                if getattr(objeto, campo) != valor
+            }
+            if cambios:
+                for campo, (_, valor) in cambios.items():
+                    setattr(objeto, campo, valor)
+                modificados.append(objeto)
+                campos_modificados.update(cambios)
+                self.cambios.append(Cambio(seccion, clave, cambios, nuevo=False))
+
+        if nuevos:
+            modelo.objects.bulk_create(nuevos, batch_size=TAMANO_LOTE)
+        if modificados:
+            modelo.objects.bulk_update(modificados, sorted(campos_modificados), batch_size=TAMANO_LOTE)
+        self.creados[seccion] = nuevos
+        self.actualizados[seccion] = modificados
+        return existentes
+
+    def _valores(self, modelo, fila, campos):
+        return {campo: _convertir(modelo, campo, fila[campo]) for campo in campos if campo in fila}
+
+    def _restaurante(self, seccion, numero, nombre):
+        if not nombre:
+            return None
+        restaurante = self.restaurantes.get(nombre)
+        if restaurante is None:
+            raise ErrorImportacion(f"{seccion}, fila {numero}: restaurante desconocido '{nombre}'")
+        return restaurante
+
+    def ejecutar(self):
+        # Restaurantes
+        self.restaurantes = {}
+        for restaurante in RestauranteVirtual.objects.order_by('id'):
+            self.restaurantes.setdefault(restaurante.nombre, restaurante)
+        self._aplicar('restaurantes', RestauranteVirtual, self.restaurantes, [
+            (fila['nombre'], {'nombre': fila['nombre'], **self._valores(
+                RestauranteVirtual, fila, ['descripcion', 'color_principal', 'activo', 'orden'])})
+            for _, fila in self._filas('restaurantes', ['nombre'])
+        ])
+
+        # Categorías, por (restaurante, nombre)
+        categorias = {}
+        for categoria in CategoriaMenu.objects.select_related('restaurante').order_by('id'):
+            categorias.setdefault((categoria.restaurante.nombre, categoria.nombre), categoria)
+        entradas = []
+        for numero, fila in self._filas('categorias', ['restaurante', 'nombre']):
+            restaurante = self._restaurante('categorias', numero, fila['restaurante'])
+            entradas.append(((fila['restaurante'], fila['nombre']), {
+                'restaurante_id': restaurante.pk, 'nombre': fila['nombre'],
+                **self._valores(CategoriaMenu, fila, ['descripcion', 'icono', 'orden']),
+            }))
+        self._aplicar('categorias', CategoriaMenu, categorias, entradas)
+
+        # Ingredientes e inventario
+        ingredientes = {}
+        for ingrediente in Ingrediente.objects.order_by('id'):
+            ingredientes.setdefault(ingrediente.nombre, ingrediente)
+        self._aplicar('ingredientes', Ingrediente, ingredientes, [
+            (fila['nombre'], {'nombre': fila['nombre'], **self._valores(
+                Ingrediente, fila, ['descripcion', 'unidad_medida', 'costo_unitario', 'activo'])})
+            for _, fila in self._filas('ingredientes', ['nombre'])
+        ], requeridos_al_crear=['unidad_medida'])
+
+        def ingrediente_de(seccion, numero, nombre):
+            ingrediente = ingredientes.get(nombre)
+            if ingrediente is None:
+                raise ErrorImportacion(f"{seccion}, fila {numero}: ingrediente desconocido '{nombre}'")
+            return ingrediente
+
+        inventarios = {inv.ingrediente.nombre: inv for inv in Inventario.objects.select_related('ingrediente')}
+        entradas = []
+        for numero, fila in self._filas('inventario', ['ingrediente']):
+            ingrediente = ingrediente_de('inventario', numero, fila['ingrediente'])
+            entradas.append((fila['ingrediente'], {
+                'ingrediente_id': ingrediente.pk,
+                **self._valores(Inventario, fila, ['cantidad_actual', 'stock_minimo', 'proveedor', 'fecha_caducidad']),
+            }))
+        anteriores = {clave: inventario.cantidad_actual for clave, inventario in inventarios.items()}
+        self._aplicar('inventario', Inventario, inventarios, entradas)
+        # El stock importado es absoluto; al libro va la diferencia como ajuste
+        anotar_movimientos({
+            inventarios[clave].ingrediente_id: inventarios[clave].cantidad_actual - anteriores.get(clave, 0)
+            for clave, _ in entradas
+        }, 'ajuste', 'importacion')
+
+        # Productos, por (restaurante, nombre); la categoría se busca en su restaurante
+        nombres_restaurante = {r.pk: nombre for nombre, r in self.restaurantes.items()}
+        productos = {}
+        for producto in Producto.objects.order_by('id'):
+            clave = (nombres_restaurante.get(producto.restaurante_id, ''), producto.nombre)
+            productos.setdefault(clave, producto)
+        entradas = []
+        for numero, fila in self._filas('productos', ['nombre']):
+            nombre_restaurante = fila.get('restaurante') or ''
+            restaurante = self._restaurante('productos', numero, nombre_restaurante)
+            valores = {
+                'restaurante_id': restaurante.pk if restaurante else None,
+                'nombre': fila['nombre'],
+                **self._valores(Producto, fila, ['descripcion', 'precio', 'destacado', 'activo']),
+            }
+            if 'categoria' in fila:
+                categoria = None
+                if fila['categoria']:
+                    categoria = categorias.get((nombre_restaurante, fila['categoria']))
+                    if categoria is None:
+                        raise ErrorImportacion(
+                            f"productos, fila {numero}: categoría desconocida '{fila['categoria']}'"
+                        )
+                valores['categoria_menu_id'] = categoria.pk if categoria else None
+            entradas.append(((nombre_restaurante, fila['nombre']), valores))
+        self._aplicar('productos', Producto, productos, entradas, requeridos_al_crear=['precio'])
+
+        # Recetas, por (restaurante, producto, ingrediente)
+        producto_ids = {p.pk: clave for clave, p in productos.items()}
+        nombres_ingrediente = {i.pk: nombre for nombre, i in ingredientes.items()}
+        recetas = {
+            (*producto_ids[r.producto_id], nombres_ingrediente[r.ingrediente_id]): r
+            for r in Receta.objects.all()
+            if r.producto_id in producto_ids and r.ingrediente_id in nombres_ingrediente
+        }
+        entradas = []
+        for numero, fila in self._filas('recetas', ['producto', 'ingrediente', 'cantidad_necesaria']):
+            nombre_restaurante = fila.get('restaurante') or ''
+            producto = productos.get((nombre_restaurante, fila['producto']))
+            if producto is None:
+                raise ErrorImportacion(f"recetas, fila {numero}: producto desconocido '{fila['producto']}'")
+            ingrediente = ingrediente_de('recetas', numero, fila['ingrediente'])
+            entradas.append(((nombre_restaurante, fila['producto'], fila['ingrediente']), {
+                'producto_id': producto.pk,
+                'ingrediente_id': ingrediente.pk,
+                'cantidad_necesaria': _convertir(Receta, 'cantidad_necesaria', fila['cantidad_necesaria']),
+            }))
+        self._aplicar('recetas', Receta, recetas, entradas)
+
+    def programar_recalculos(self):
+        """Lo que harían las señales si las filas se hubieran guardado una a una"""
+        def ids(*secciones, atributo='pk'):
+            return {
+                getattr(objeto, atributo)
+                for seccion in secciones
+                for objeto in self.creados.get(seccion, []) + self.actualizados.get(seccion, [])
+            }
+
+        productos = ids('productos') | ids('recetas', atributo='producto_id')
+        ingredientes = ids('ingredientes') | ids('inventario', atributo='ingrediente_id')
+        restaurantes = ids('restaurantes')
+        categorias = ids('categorias')
+
+        if productos:
+            al_confirmar(recalcular_existencias, productos)
+            al_confirmar(recalcular_costos, productos)
+            al_confirmar(indexar_productos, productos)
+            # También el restaurante anterior de los productos que cambiaron de restaurante
+            anteriores = {
+                cambio.campos['restaurante_id'][0] for cambio in self.cambios
+                if cambio.seccion == 'productos' and 'restaurante_id' in cambio.campos
+            }
+            al_confirmar(invalidar_menus, ids('productos', atributo='restaurante_id') | anteriores)
+        if ingredientes:
+            al_confirmar(recalcular_existencias_por_ingredientes, ingredientes)
+            al_confirmar(recalcular_costos_por_ingredientes, ingredientes)
+        if categorias:
+            al_confirmar(indexar_por_categorias, categorias)
+            al_confirmar(invalidar_menus, ids('categorias', atributo='restaurante_id'))
+        if restaurantes:
+            al_confirmar(indexar_por_restaurantes, restaurantes)
+            al_confirmar(invalidar_menus, restaurantes)
+            al_confirmar(invalidar_catalogo)
+        if productos or categorias or restaurantes:
+            al_confirmar(invalidar_precios)
+
+
+def importar_catalogo(datos, simular=False):
+    """Importa el catálogo en una sola transacción y devuelve la lista de Cambio.
+
+    Con simular=True se hace todo igual pero la transacción se revierte.
+    """
+    importacion = _Importacion(datos)
+    with transaction.atomic():
+        importacion.ejecutar()
+        if simular:
+            transaction.set_rollback(True)
+        else:
+            importacion.programar_recalculos()
+    return importacion.cambios
@@ -0,0 +1,156 @@
+from decimal import Decimal, InvalidOperation
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache_catalogo import obtener_cacheado, version_precios
+from .eventos import publicar_cambio
+from .models import Cliente, DetallePedido, Pedido, Producto
+from .signals import al_confirmar
+from .ventas import sumar_pedidos
+
+# ============================
+# INGESTA DE PEDIDOS EN LOTE (SOCIOS)
+# ============================
+# Los socios (Rappi, la web, la central telefónica) envían muchos pedidos
+# por llamada. Cada pedido se valida por separado contra una foto cacheada
+# de precios de los productos visibles (una lectura de caché, sin consultar
+# Producto por ítem) y los válidos se escriben juntos: un bulk_create de
+# Pedido y otro de DetallePedido en una sola transacción. Un pedido
+# inválido no bloquea al resto; el resultado se informa pedido por pedido.
+#
+# bulk_create no dispara post_save: el aviso a cocina (core/eventos.py) y
+# la suma a las ventas diarias (ticket y líneas, core/ventas.py) se
+# programan aquí mismo.
+
+CANALES = {valor.lower(): valor for valor, _ in Pedido.CANAL}
+MAX_CANTIDAD_ITEM = 1000
+
+
+class PedidoRechazado(Exception):
+    pass
+
+
+def foto_de_precios():
+    """{producto_id: (precio, restaurante_id)} de los productos visibles"""
+    def construir():
+        productos = (
+            Producto.objects.filter(activo=True).exclude(restaurante__activo=False)
+            .values_list('id', 'precio', 'restaurante_id')
+        )
+        return {producto_id: (precio, restaurante_id) for producto_id, precio, restaurante_id in productos}
+    return obtener_cacheado('productos:precios', version_precios(), construir)
+
+
+def canal_de(valor):
+    """Normaliza un canal ('rappi' -> 'Rappi'); None si no es de Pedido.CANAL"""
+    return CANALES.get(str(valor or '').lower())
+
+
+def _entero(valor, campo):
+    if isinstance(valor, bool):
+        raise PedidoRechazado(f"'{campo}' debe ser un número entero")
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise PedidoRechazado(f"'{campo}' debe ser un número entero")
+
+
+def _decimal(valor, campo):
+    try:
+        return Decimal(str(valor))
+    except InvalidOperation:
+        raise PedidoRechazado(f"'{campo}' debe ser un número")
+
+
+def validar_pedido(datos, precios, clientes, canal):
+    """Arma (Pedido, [DetallePedido]) sin guardar, o lanza PedidoRechazado.
+
+    `canal` es el del token del socio; sin token (personal) se toma del pedido.
+    """
+    if not isinstance(datos, dict):
+        raise PedidoRechazado("Cada pedido debe ser un objeto")
+    canal = canal or canal_de(datos.get('canal'))
+    if canal is None:
+        raise PedidoRechazado(f"Canal inválido; opciones: {', '.join(CANALES.values())}")
+    cliente_id = _entero(datos.get('cliente_id'), 'cliente_id')
+    if cliente_id not in clientes:
+        raise PedidoRechazado(f"No existe el cliente {cliente_id}")
+
+    items = datos.get('items')
+    if not isinstance(items, list) or not items:
+        raise PedidoRechazado("El pedido no tiene ítems")
+    detalles = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise PedidoRechazado("Cada ítem debe ser un objeto")
+        producto_id = _entero(item.get('producto_id'), 'producto_id')
+        if producto_id not in precios:
+            raise PedidoRechazado(f"El producto {producto_id} no existe o no está disponible")
+        cantidad = _entero(item.get('cantidad', 1), 'cantidad')
+        if not 1 <= cantidad <= MAX_CANTIDAD_ITEM:
+            raise PedidoRechazado(f"Cantidad inválida para el producto {producto_id}")
+        precio = precios[producto_id][0]
+        # El socio puede informar el precio que mostró; si quedó viejo se rechaza
+        if 'precio_unitario' in item and _decimal(item['precio_unitario'], 'precio_unitario') != precio:
+            raise PedidoRechazado(f"El precio del producto {producto_id} cambió (vigente: {precio})")
+        detalles.append(DetallePedido(
+            producto_id=producto_id, cantidad=cantidad, precio_unitario=precio, subtotal=precio * cantidad,
+        ))
+
+    total = sum(detalle.subtotal for detalle in detalles)
+    if 'total' in datos and _decimal(datos['total'], 'total') != total:
+        raise PedidoRechazado(f"El total no coincide con el catálogo (vigente: {total})")
+    pedido = Pedido(
+        cliente_id=cliente_id, canal=canal, total=total, zona=str(datos.get('zona') or '')[:50],
+    )
+    return pedido, detalles
+
+
+def ingerir_pedidos(lista, canal=None):
+    """Valida y crea un lote de pedidos; devuelve un resultado por pedido.
+
+    Cada resultado es {'indice', 'referencia', 'ok', 'pedido_id' | 'error'}.
+    """
+    if len(lista) > settings.INGESTA_MAX_PEDIDOS:
+        raise PedidoRechazado(f"Máximo {settings.INGESTA_MAX_PEDIDOS} pedidos por llamada")
+    precios = foto_de_precios()
+    ids_clientes = set()
+    for datos in lista:
+        try:
+            ids_clientes.add(int(datos['cliente_id']))
+        except (TypeError, ValueError, KeyError):
+            pass
+    clientes = set(Cliente.objects.filter(id__in=ids_clientes).values_list('id', flat=True))
+
+    resultados = []
+    validos = []
+    for indice, datos in enumerate(lista):
+        referencia = datos.get('referencia') if isinstance(datos, dict) else None
+        resultado = {'indice': indice, 'referencia': referencia}
+        try:
+            validos.append((resultado, *validar_pedido(datos, precios, clientes, canal)))
+            resultado['ok'] = True
+        except PedidoRechazado as error:
+            resultado.update(ok=False, error=str(error))
+        resultados.append(resultado)
+
+    if validos:
+        with transaction.atomic():
+            # SQLite y PostgreSQL devuelven los ids del INSERT en lote
+            Pedido.objects.bulk_create([pedido for _, pedido, _ in validos])
+            lineas = []
+            for resultado, pedido, detalles in validos:
+                resultado['pedido_id'] = pedido.pk
+                for detalle in detalles:
+                    detalle.pedido = pedido
+                lineas.extend(detalles)
+            DetallePedido.objects.bulk_create(lineas, batch_size=500)
+            al_confirmar(sumar_pedidos, [pedido.pk for _, pedido, _ in validos])
+            for _, pedido, _ in validos:
+                transaction.on_commit(partial(
+                    publicar_cambio, 'pedido', pedido.pk, pedido.estado, None,
+                    ['cocina', f'cliente:{pedido.cliente_id}'],
+                ))
+    return resultados
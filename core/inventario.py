@@ -0,0 +1,151 @@
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Max, Q, Sum, Value, When
+from django.utils import timezone
+
+from .disponibilidad import recalcular_existencias_por_ingredientes
+from .models import Inventario, MovimientoInventario, SaldoInventario
+from .signals import al_confirmar
+
+# ============================
+# LIBRO DE MOVIMIENTOS DE INVENTARIO
+# ============================
+# Cada cambio de stock se inserta como un MovimientoInventario con signo
+# (compra, venta, merma, ajuste); nunca se edita ni se borra uno suelto.
+# El stock según el libro es el SaldoInventario del ingrediente más los
+# movimientos posteriores a su corte, y la compactación periódica mueve
+# ese corte hacia adelante para que la cola a sumar siga siendo corta.
+#
+# Inventario.cantidad_actual queda como el mismo valor ya sumado: se
+# actualiza con UPDATE ... F() + diferencia (dos escrituras concurrentes no
+# se pisan) y es lo que leen la disponibilidad y el checkout. Si alguna vez
+# difiere del libro, conciliar_inventario() lo repara.
+
+DECIMAL_LIBRO = DecimalField(max_digits=12, decimal_places=2)
+
+# Movimientos que todavía no entraron en el saldo de su ingrediente
+POSTERIORES_AL_CORTE = Q(ingrediente__saldo__isnull=True) | Q(id__gt=F('ingrediente__saldo__hasta_movimiento'))
+
+
+def anotar_movimientos(cambios, tipo, referencia=''):
+    """Inserta movimientos {ingrediente_id: cantidad con signo} sin tocar Inventario.
+
+    Para quien ya aplicó el cambio con su propio UPDATE (el checkout).
+    """
+    MovimientoInventario.objects.bulk_create([
+        MovimientoInventario(ingrediente_id=ingrediente_id, tipo=tipo, cantidad=cantidad, referencia=referencia)
+        for ingrediente_id, cantidad in cambios.items()
+        if cantidad
+    ])
+
+
+def registrar_movimientos(cambios, tipo, referencia=''):
+    """Inserta los movimientos y suma cada diferencia a Inventario.cantidad_actual"""
+    with transaction.atomic():
+        anotar_movimientos(cambios, tipo, referencia)
+        aplicar_a_inventario(cambios)
+
+
+def aplicar_a_inventario(cambios):
+    """Suma {ingrediente_id: cantidad} a cantidad_actual con un solo UPDATE ... F()"""
+    cambios = {ingrediente_id: cantidad for ingrediente_id, cantidad in cambios.items() if cantidad}
+    if not cambios:
+        return
+    Inventario.objects.bulk_create(
+        [Inventario(ingrediente_id=ingrediente_id) for ingrediente_id in cambios],
+        ignore_conflicts=True,
+    )
+    diferencia = Case(
+        *[When(ingrediente_id=ingrediente_id, then=Value(cantidad)) for ingrediente_id, cantidad in cambios.items()],
+        output_field=DECIMAL_LIBRO,
+    )
+    Inventario.objects.filter(ingrediente_id__in=cambios).update(
+        cantidad_actual=F('cantidad_actual') + diferencia,
+        fecha_ultima_actualizacion=timezone.now(),
+    )
+    # El UPDATE en lote no dispara las señales de Inventario
+    al_confirmar(recalcular_existencias_por_ingredientes, list(cambios))
+
+
+def stock_segun_libro(ingrediente_ids=None):
+    """{ingrediente_id: saldo + movimientos posteriores al corte}, en dos consultas"""
+    saldos = SaldoInventario.objects.all()
+    movimientos = MovimientoInventario.objects.all()
+    if ingrediente_ids is not None:
+        saldos = saldos.filter(ingrediente_id__in=ingrediente_ids)
+        movimientos = movimientos.filter(ingrediente_id__in=ingrediente_ids)
+    stock = dict(saldos.values_list('ingrediente_id', 'cantidad'))
+
+    # Solo la cola posterior a cada corte; el índice por ingrediente la acota
+    for ingrediente_id, suma in (
+        movimientos.filter(POSTERIORES_AL_CORTE)
+        .values('ingrediente_id').annotate(suma=Sum('cantidad')).values_list('ingrediente_id', 'suma')
+    ):
+        stock[ingrediente_id] = stock.get(ingrediente_id, 0) + suma
+    return stock
+
+
+def compactar_libro(antes_de, purgar=False):
+    """Lleva los saldos hasta el último movimiento anterior a `antes_de`.
+
+    Con purgar=True borra los movimientos ya incluidos en un saldo (se
+    pierde ese historial). Devuelve (saldos actualizados, movimientos borrados).
+    """
+    with transaction.atomic():
+        corte = MovimientoInventario.objects.filter(fecha__lt=antes_de).aggregate(corte=Max('id'))['corte']
+        if corte is None:
+            return 0, 0
+        sumas = dict(
+            MovimientoInventario.objects
+            .filter(POSTERIORES_AL_CORTE, id__lte=corte)
+            .values('ingrediente_id').annotate(suma=Sum('cantidad')).values_list('ingrediente_id', 'suma')
+        )
+        anteriores = dict(
+            SaldoInventario.objects.filter(ingrediente_id__in=sumas).values_list('ingrediente_id', 'cantidad')
+        )
+        ahora = timezone.now()
+        SaldoInventario.objects.bulk_create(
+            [
+                SaldoInventario(
+                    ingrediente_id=ingrediente_id,
+                    cantidad=anteriores.get(ingrediente_id, 0) + suma,
+                    hasta_movimiento=corte,
+                    fecha_corte=ahora,
+                )
+                for ingrediente_id, suma in sumas.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['ingrediente'],
+            update_fields=['cantidad', 'hasta_movimiento', 'fecha_corte'],
+        )
+        borrados = 0
+        if purgar:
+            borrados, _ = MovimientoInventario.objects.filter(
+                id__lte=F('ingrediente__saldo__hasta_movimiento')
+            ).delete()
+    return len(sumas), borrados
+
+
+def conciliar_inventario():
+    """Iguala Inventario.cantidad_actual al stock según el libro; devuelve los ids corregidos"""
+    libro = stock_segun_libro()
+    actuales = dict(Inventario.objects.values_list('ingrediente_id', 'cantidad_actual'))
+    diferencias = {
+        ingrediente_id: cantidad
+        for ingrediente_id, cantidad in libro.items()
+        if actuales.get(ingrediente_id) != cantidad
+    }
+    if diferencias:
+        with transaction.atomic():
+            Inventario.objects.bulk_create(
+                [Inventario(ingrediente_id=ingrediente_id) for ingrediente_id in diferencias],
+                ignore_conflicts=True,
+            )
+            Inventario.objects.filter(ingrediente_id__in=diferencias).update(
+                cantidad_actual=Case(
+                    *[When(ingrediente_id=i, then=Value(cantidad)) for i, cantidad in diferencias.items()],
+                    output_field=DECIMAL_LIBRO,
+                ),
+                fecha_ultima_actualizacion=timezone.now(),
+            )
+            al_confirmar(recalcular_existencias_por_ingredientes, list(diferencias))
+    return sorted(diferencias)
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.inventario import compactar_libro, conciliar_inventario
+
+
+class Command(BaseCommand):
+    help = "Suma los movimientos de inventario antiguos a los saldos de cada ingrediente"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=7,
+                            help="Compactar los movimientos con más de estos días (0 = todos)")
+        parser.add_argument('--purgar', action='store_true',
+                            help="Borrar los movimientos ya incluidos en un saldo (se pierde ese historial)")
+        parser.add_argument('--conciliar', action='store_true',
+                            help="Corregir Inventario.cantidad_actual donde difiera del libro")
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0:
+            raise CommandError("--dias no puede ser negativo")
+        antes_de = timezone.now() - timedelta(days=options['dias'])
+        saldos, borrados = compactar_libro(antes_de, purgar=options['purgar'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Saldos actualizados: {saldos}; movimientos purgados: {borrados}"
+        ))
+        if options['conciliar']:
+            corregidos = conciliar_inventario()
+            self.stdout.write(f"Inventarios corregidos según el libro: {len(corregidos)}")
@@ -0,0 +1,73 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.despacho import despachar
+from core.models import Cliente, Pedido, Repartidor, Usuario
+
+
+class Command(BaseCommand):
+    help = "Asigna repartidores disponibles a los pedidos abiertos, en ciclos cada --intervalo segundos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=15.0, help="Segundos entre ciclos")
+        parser.add_argument('--una-vez', action='store_true', help="Ejecutar un solo ciclo y terminar")
+        parser.add_argument('--limite', type=int, default=5000, help="Pedidos considerados por ciclo")
+        parser.add_argument('--presupuesto', type=float, default=1.0,
+                            help="Segundos máximos para resolver la asignación de un ciclo")
+        parser.add_argument('--benchmark', type=int, metavar='PEDIDOS',
+                            help="Medir un ciclo con PEDIDOS pedidos sintéticos (se revierte todo)")
+        parser.add_argument('--repartidores', type=int, default=None,
+                            help="Repartidores sintéticos del benchmark (por defecto, la mitad de los pedidos)")
+        parser.add_argument('--zonas', type=int, default=8, help="Zonas sintéticas del benchmark")
+
+    def handle(self, *args, **options):
+        if options['limite'] < 1:
+            raise CommandError("--limite debe ser mayor que 0")
+        if options['benchmark']:
+            return self.benchmark(options)
+
+        while True:
+            cifras = despachar(options['limite'], options['presupuesto'])
+            self.informar(cifras)
+            if options['una_vez']:
+                return
+            time.sleep(options['intervalo'])
+
+    def informar(self, cifras):
+        self.stdout.write(
+            f"Asignados {cifras['asignados']} de {cifras['pedidos']} pedidos "
+            f"({cifras['repartidores']} repartidores libres, {cifras['liberados']} liberados) "
+            f"en {cifras['segundos_total'] * 1000:.0f} ms (resolver: {cifras['segundos_resolver'] * 1000:.1f} ms)"
+        )
+
+    def benchmark(self, options):
+        cantidad = options['benchmark']
+        repartidores = options['repartidores'] or cantidad // 2
+        zonas = [f'zona-{numero}' for numero in range(max(options['zonas'], 1))]
+        azar = random.Random(0)
+        with transaction.atomic():
+            usuario = Usuario.objects.create(
+                nombre_usuario='benchmark-despacho', email='benchmark-despacho@example.com', password_hash='x'
+            )
+            cliente = Cliente.objects.create(usuario=usuario, nombre='Benchmark')
+            Repartidor.objects.bulk_create([
+                Repartidor(nombre=f'Repartidor {numero}', zona=azar.choice(zonas + ['']))
+                for numero in range(repartidores)
+            ], batch_size=1000)
+            creados = Pedido.objects.bulk_create([
+                Pedido(cliente=cliente, canal='Web', total=10000, zona=azar.choice(zonas))
+                for _ in range(cantidad)
+            ], batch_size=1000)
+            # Antigüedades variadas para que algunos acepten otra zona
+            ahora = timezone.now()
+            for pedido in creados:
+                pedido.fecha_hora = ahora - timedelta(seconds=azar.randint(0, 1800))
+            Pedido.objects.bulk_update(creados, ['fecha_hora'], batch_size=1000)
+
+            self.informar(despachar(options['limite'], options['presupuesto']))
+            transaction.set_rollback(True)
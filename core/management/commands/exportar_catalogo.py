@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exportacion import FORMATOS, TAMANO_LOTE, exportar
+
+
+class Command(BaseCommand):
+    help = "Exporta el catálogo completo (restaurantes, categorías, productos, precios y disponibilidad)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='ndjson')
+        parser.add_argument('--salida', help="Archivo de salida (por defecto, la salida estándar)")
+        parser.add_argument('--chunk-size', type=int, default=TAMANO_LOTE,
+                            help="Filas leídas por lote de la base de datos")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size debe ser mayor que 0")
+
+        archivo = open(options['salida'], 'w', encoding='utf-8', newline='') if options['salida'] else None
+        escribir = archivo.write if archivo else (lambda linea: self.stdout.write(linea, ending=''))
+        inicio = time.perf_counter()
+        lineas = 0
+        try:
+            for linea in exportar(options['formato'], options['chunk_size']):
+                escribir(linea)
+                lineas += 1
+        finally:
+            if archivo:
+                archivo.close()
+
+        filas = lineas - 1 if options['formato'] == 'csv' else lineas
+        segundos = time.perf_counter() - inicio
+        velocidad = filas / segundos if segundos else 0
+        self.stderr.write(f"Exportados {filas} productos en {segundos:.2f}s ({velocidad:,.0f} filas/s)")
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importacion import ErrorImportacion, importar_catalogo, leer_datos
+
+
+class Command(BaseCommand):
+    help = ("Importa restaurantes, categorías, ingredientes, inventario, productos y recetas "
+            "desde un JSON o CSV (crea o actualiza por nombre, nunca borra)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta', help="Archivo .json, archivo <seccion>.csv o directorio con los CSV")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Muestra las diferencias sin guardar nada")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            datos = leer_datos(options['ruta'])
+            cambios = importar_catalogo(datos, simular=options['dry_run'])
+        except (ErrorImportacion, OSError, ValueError) as e:
+            raise CommandError(str(e))
+        segundos = time.perf_counter() - inicio
+
+        if options['dry_run'] or options['verbosity'] > 1:
+            for cambio in cambios:
+                self.stdout.write(str(cambio))
+
+        resumen = {}
+        for cambio in cambios:
+            creados, actualizados = resumen.get(cambio.seccion, (0, 0))
+            resumen[cambio.seccion] = (creados + cambio.nuevo, actualizados + (not cambio.nuevo))
+        for seccion, (creados, actualizados) in resumen.items():
+            self.stdout.write(f"{seccion}: {creados} nuevos, {actualizados} modificados")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("Simulación: no se guardó ningún cambio"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Catálogo importado en {segundos:.2f}s ({len(cambios)} cambios)"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.reservas import liberar_reservas_vencidas
+
+
+class Command(BaseCommand):
+    help = "Borra las reservas de ingredientes vencidas y recalcula las existencias afectadas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help="Reservas borradas por transacción")
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError("--lote debe ser mayor que 0")
+        liberadas = liberar_reservas_vencidas(options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"Reservas liberadas: {liberadas}"))
@@ -0,0 +1,31 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.carrito import desactivar_duplicados, purgar_carritos_anonimos
+
+
+class Command(BaseCommand):
+    help = ("Desactiva carritos activos duplicados y borra en lotes los carritos anónimos "
+            "vencidos (pensado para correr periódicamente)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.CARRITOS_ANONIMOS_DIAS,
+                            help="Días sin actividad para considerar vencido un carrito anónimo")
+        parser.add_argument('--lote', type=int, default=500,
+                            help="Carritos borrados por transacción")
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0 or options['lote'] < 1:
+            raise CommandError("--dias debe ser >= 0 y --lote mayor que 0")
+
+        inicio = time.perf_counter()
+        revisados, desactivados = desactivar_duplicados()
+        self.stdout.write(f"Carritos activos revisados: {revisados}, duplicados desactivados: {desactivados}")
+
+        carritos, detalles = purgar_carritos_anonimos(timedelta(days=options['dias']), options['lote'])
+        self.stdout.write(f"Carritos anónimos borrados: {carritos} ({detalles} detalles)")
+
+        self.stdout.write(self.style.SUCCESS(f"Limpieza completada en {time.perf_counter() - inicio:.2f}s"))
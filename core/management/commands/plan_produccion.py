@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.produccion import plan_de_produccion
+
+
+class Command(BaseCommand):
+    help = "Muestra qué preparar por franja horaria y los ingredientes que van a faltar"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas-compras', type=float, default=None,
+                            help="Horas de compras web a considerar (por defecto settings.PRODUCCION_HORAS_COMPRAS)")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        plan = plan_de_produccion(options['horas_compras'])
+        segundos = time.perf_counter() - inicio
+
+        franjas = [timezone.localtime(franja).strftime('%H:%M') for franja in plan['franjas']]
+        self.stdout.write(self.style.MIGRATE_HEADING("Preparación por franja"))
+        self.stdout.write(f"{'Producto':30} {'Total':>7}  " + ' '.join(f'{franja:>7}' for franja in franjas))
+        for fila in plan['preparacion']:
+            self.stdout.write(
+                f"{fila['nombre'][:30]:30} {fila['total']:>7}  "
+                + ' '.join(f'{unidades:>7}' for unidades in fila['por_franja'])
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Ingredientes"))
+        for fila in plan['ingredientes']:
+            linea = f"{fila['nombre'][:30]:30} necesita {fila['total']} {fila['unidad']}, hay {fila['stock']}"
+            if fila['faltante']:
+                agotamiento = timezone.localtime(fila['se_agota_en']).strftime('%H:%M')
+                self.stdout.write(self.style.ERROR(
+                    f"{linea}; faltan {fila['faltante']} (se agota en la franja de las {agotamiento})"
+                ))
+            else:
+                self.stdout.write(linea)
+        self.stderr.write(f"Plan calculado en {segundos * 1000:.0f} ms")
@@ -0,0 +1,88 @@
+import multiprocessing
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections
+
+
+def bucle_trabajador(detener, una_vez, lote, espera):
+    """Reclama y ejecuta tareas hasta que `detener` se active (o la cola se vacíe con una_vez)"""
+    # Importación diferida: en modo procesos este módulo se importa antes de django.setup()
+    from core.tareas import nombre_trabajador, procesar_lote
+
+    trabajador = nombre_trabajador()
+    try:
+        while not detener.is_set():
+            close_old_connections()
+            try:
+                ejecutadas, _ = procesar_lote(trabajador, lote)
+            except OperationalError:
+                # Base ocupada (p. ej. SQLite bloqueada por otro escritor): no
+                # significa que la cola esté vacía, reintentar en un momento
+                detener.wait(min(espera, 0.1))
+                continue
+            if una_vez and not ejecutadas:
+                return
+            if not ejecutadas:
+                detener.wait(espera)
+    finally:
+        connections.close_all()
+
+
+def _proceso_hijo(detener, una_vez, lote, espera):
+    # Con "spawn" el hijo arranca un intérprete limpio y debe configurar Django
+    import django
+    django.setup()
+    bucle_trabajador(detener, una_vez, lote, espera)
+
+
+class Command(BaseCommand):
+    help = "Ejecuta los trabajadores de la cola de tareas en segundo plano (core/tareas.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trabajadores', type=int, default=2, help="Cantidad de hilos o procesos")
+        parser.add_argument('--modo', choices=['hilos', 'procesos'], default='hilos')
+        parser.add_argument('--lote', type=int, default=10, help="Tareas reclamadas por consulta")
+        parser.add_argument('--espera', type=float, default=2.0,
+                            help="Segundos de espera cuando la cola está vacía")
+        parser.add_argument('--una-vez', action='store_true',
+                            help="Procesar lo disponible y terminar (útil para cron)")
+
+    def handle(self, *args, **options):
+        if options['trabajadores'] < 1 or options['lote'] < 1:
+            raise CommandError("--trabajadores y --lote deben ser mayores que 0")
+
+        argumentos = (options['una_vez'], options['lote'], options['espera'])
+        if options['modo'] == 'procesos':
+            contexto = multiprocessing.get_context('spawn')
+            detener = contexto.Event()
+            # Las conexiones abiertas no deben heredarse entre procesos
+            connections.close_all()
+            trabajadores = [
+                contexto.Process(target=_proceso_hijo, args=(detener, *argumentos), daemon=True)
+                for _ in range(options['trabajadores'])
+            ]
+        else:
+            detener = threading.Event()
+            trabajadores = [
+                threading.Thread(target=bucle_trabajador, args=(detener, *argumentos), daemon=True)
+                for _ in range(options['trabajadores'])
+            ]
+
+        self.stdout.write(f"Iniciando {len(trabajadores)} trabajadores ({options['modo']})")
+        inicio = time.perf_counter()
+        for trabajador in trabajadores:
+            trabajador.start()
+        try:
+            for trabajador in trabajadores:
+                while trabajador.is_alive():
+                    trabajador.join(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("Deteniendo trabajadores...")
+            detener.set()
+            for trabajador in trabajadores:
+                trabajador.join()
+        self.stdout.write(self.style.SUCCESS(
+            f"Trabajadores detenidos tras {time.perf_counter() - inicio:.1f}s"
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.idempotencia import purgar_claves_vencidas
+
+
+class Command(BaseCommand):
+    help = "Borra las claves de idempotencia vencidas (settings.IDEMPOTENCIA_TTL)"
+
+    def handle(self, *args, **options):
+        borradas = purgar_claves_vencidas()
+        self.stdout.write(self.style.SUCCESS(f"Claves de idempotencia borradas: {borradas}"))
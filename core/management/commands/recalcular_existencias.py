@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.disponibilidad import recalcular_existencias
+
+
+class Command(BaseCommand):
+    help = "Recalcula la tabla de unidades preparables (ExistenciaProducto)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--producto', type=int, action='append', dest='productos',
+            help="Id de producto a recalcular (se puede repetir). Por defecto, todos."
+        )
+
+    def handle(self, *args, **options):
+        total = recalcular_existencias(options['productos'])
+        self.stdout.write(self.style.SUCCESS(f"Existencias recalculadas: {total} productos"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.carrito import recalcular_totales
+
+
+class Command(BaseCommand):
+    help = "Recalcula cantidad_total y total de los carritos con una sola consulta agregada"
+
+    def handle(self, *args, **options):
+        total = recalcular_totales()
+        self.stdout.write(self.style.SUCCESS(f"Totales recalculados: {total} carritos"))
@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from core.models import Compra, Pedido
+from core.ventas import reconstruir_ventas
+
+
+class Command(BaseCommand):
+    help = "Recalcula las ventas diarias (VentaDiaria, VentaDiariaProducto) de un rango de fechas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat,
+                            help="Primer día (AAAA-MM-DD). Por defecto, el de la venta más antigua.")
+        parser.add_argument('--hasta', type=date.fromisoformat, help="Último día (AAAA-MM-DD). Por defecto, hoy.")
+        parser.add_argument('--dias-por-lote', type=int, default=7, help="Días por transacción")
+
+    def handle(self, *args, **options):
+        if options['dias_por_lote'] < 1:
+            raise CommandError("--dias-por-lote debe ser mayor que 0")
+        hasta = options['hasta'] or timezone.localdate()
+        desde = options['desde']
+        if desde is None:
+            primeras = [
+                Compra.objects.aggregate(primera=Min('fecha_compra'))['primera'],
+                Pedido.objects.aggregate(primera=Min('fecha_hora'))['primera'],
+            ]
+            primeras = [timezone.localdate(fecha) for fecha in primeras if fecha is not None]
+            if not primeras:
+                self.stdout.write("No hay ventas para reconstruir")
+                return
+            desde = min(primeras)
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta")
+
+        dias = reconstruir_ventas(desde, hasta, options['dias_por_lote'])
+        self.stdout.write(self.style.SUCCESS(f"Ventas diarias reconstruidas: {dias} días ({desde} a {hasta})"))
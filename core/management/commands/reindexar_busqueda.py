@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.busqueda import fts_disponible, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice FTS5 de búsqueda de productos"
+
+    def handle(self, *args, **options):
+        if not fts_disponible():
+            self.stdout.write(self.style.WARNING("El motor de base de datos no es SQLite: no hay índice FTS5"))
+            return
+        inicio = time.perf_counter()
+        total = reconstruir_indice()
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f"Índice reconstruido: {total} productos en {segundos:.2f}s"))
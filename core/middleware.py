@@ -0,0 +1,74 @@
+from functools import cached_property
+
+from .carrito import carrito_anonimo, carrito_de_cliente
+from .models import Cliente, Usuario
+
+# ============================
+# PERFIL DEL CLIENTE POR PETICIÓN
+# ============================
+# request.perfil resuelve Usuario, Cliente y Carrito activo solo si una vista
+# los pide, y a lo sumo una vez por petición. Los ids de Usuario y Cliente
+# del usuario autenticado se guardan en la sesión, así que en la mayoría de
+# las peticiones no hace falta buscarlos por nombre de usuario.
+
+CLAVE_SESION_PERFIL = 'perfil'
+
+
+class PerfilCliente:
+
+    def __init__(self, request, user=None):
+        self.request = request
+        self._user = user
+
+    @cached_property
+    def _ids(self):
+        user = self._user or self.request.user
+        if not user.is_authenticated:
+            return {}
+        guardados = self.request.session.get(CLAVE_SESION_PERFIL)
+        if guardados and guardados.get('user_id') == user.pk:
+            return guardados
+
+        # Usuarios sin Usuario (p. ej. solo staff) no se guardan: pueden
+        # registrarse más tarde con la misma sesión
+        usuario = Usuario.objects.filter(nombre_usuario=user.username).first()
+        if usuario is None:
+            return {}
+        cliente, _ = Cliente.objects.get_or_create(usuario=usuario, defaults={'nombre': usuario.nombre_usuario})
+        ids = {'user_id': user.pk, 'usuario_id': usuario.pk, 'cliente_id': cliente.pk}
+        self.request.session[CLAVE_SESION_PERFIL] = ids
+        return ids
+
+    @property
+    def usuario_id(self):
+        return self._ids.get('usuario_id')
+
+    @property
+    def cliente_id(self):
+        return self._ids.get('cliente_id')
+
+    @cached_property
+    def usuario(self):
+        return Usuario.objects.filter(pk=self.usuario_id).first() if self.usuario_id else None
+
+    @cached_property
+    def cliente(self):
+        return Cliente.objects.filter(pk=self.cliente_id).first() if self.cliente_id else None
+
+    @cached_property
+    def carrito(self):
+        """Carrito del cliente, o el anónimo según settings.CARRITO_ANONIMO"""
+        if self.cliente_id is not None:
+            return carrito_de_cliente(self.cliente_id)
+        return carrito_anonimo(self.request)
+
+
+class PerfilClienteMiddleware:
+    """Agrega request.perfil (va después de AuthenticationMiddleware)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.perfil = PerfilCliente(request)
+        return self.get_response(request)
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:38
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def calcular_existencias(apps, schema_editor):
+    Producto = apps.get_model('core', 'Producto')
+    Receta = apps.get_model('core', 'Receta')
+    ExistenciaProducto = apps.get_model('core', 'ExistenciaProducto')
+
+    unidades = {producto_id: None for producto_id in Producto.objects.values_list('id', flat=True)}
+    recetas = Receta.objects.values_list(
+        'producto_id', 'cantidad_necesaria', 'ingrediente__inventario__cantidad_actual'
+    )
+    for producto_id, necesaria, stock in recetas:
+        stock = stock or Decimal('0')
+        if necesaria > 0:
+            posibles = max(int(stock // necesaria), 0)
+        elif stock < necesaria:
+            posibles = 0
+        else:
+            continue
+        actual = unidades[producto_id]
+        unidades[producto_id] = posibles if actual is None else min(actual, posibles)
+
+    ExistenciaProducto.objects.bulk_create(
+        ExistenciaProducto(producto_id=producto_id, unidades=valor)
+        for producto_id, valor in unidades.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExistenciaProducto',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='existencia', serialize=False, to='core.producto')),
+                ('unidades', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Existencia de Producto',
+                'verbose_name_plural': 'Existencias de Productos',
+            },
+        ),
+        migrations.RunPython(calcular_existencias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:40
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def calcular_margenes(apps, schema_editor):
+    Producto = apps.get_model('core', 'Producto')
+    Receta = apps.get_model('core', 'Receta')
+    MargenProducto = apps.get_model('core', 'MargenProducto')
+
+    precios = dict(Producto.objects.values_list('id', 'precio'))
+    costos = {producto_id: Decimal('0') for producto_id in precios}
+    recetas = Receta.objects.values_list('producto_id', 'cantidad_necesaria', 'ingrediente__costo_unitario')
+    for producto_id, cantidad, costo_unitario in recetas:
+        costos[producto_id] += cantidad * costo_unitario
+
+    MargenProducto.objects.bulk_create(
+        MargenProducto(producto_id=producto_id, costo_produccion=costo, margen=precios[producto_id] - costo)
+        for producto_id, costo in costos.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_existenciaproducto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MargenProducto',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='margen', serialize=False, to='core.producto')),
+                ('costo_produccion', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('margen', models.DecimalField(db_index=True, decimal_places=4, default=0, max_digits=14)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Margen de Producto',
+                'verbose_name_plural': 'Reporte de Márgenes',
+                'ordering': ['margen'],
+            },
+        ),
+        migrations.RunPython(calcular_margenes, migrations.RunPython.noop),
+    ]
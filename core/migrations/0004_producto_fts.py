@@ -0,0 +1,47 @@
+from django.db import migrations
+
+CREAR_TABLA = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS core_producto_fts USING fts5(
+        nombre, descripcion, categoria, restaurante,
+        restaurante_id UNINDEXED, categoria_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+'''
+
+LLENAR_TABLA = '''
+    INSERT INTO core_producto_fts (
+        rowid, nombre, descripcion, categoria, restaurante, restaurante_id, categoria_id
+    )
+    SELECT p.id, p.nombre, COALESCE(p.descripcion, ''), COALESCE(c.nombre, ''),
+           COALESCE(r.nombre, ''), p.restaurante_id, p.categoria_menu_id
+    FROM core_producto p
+    LEFT JOIN core_categoriamenu c ON c.id = p.categoria_menu_id
+    LEFT JOIN core_restaurantevirtual r ON r.id = p.restaurante_id
+    WHERE p.activo AND COALESCE(r.activo, 1)
+'''
+
+
+def crear_indice(apps, schema_editor):
+    # FTS5 es exclusivo de SQLite; en otros motores core.busqueda usa icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREAR_TABLA)
+    schema_editor.execute(LLENAR_TABLA)
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS core_producto_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_margenproducto'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
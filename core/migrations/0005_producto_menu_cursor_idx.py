@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_producto_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['restaurante', 'activo', 'id'], name='producto_menu_cursor_idx'),
+        ),
+    ]
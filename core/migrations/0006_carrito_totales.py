@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:51
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, PositiveIntegerField, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def calcular_totales(apps, schema_editor):
+    Carrito = apps.get_model('core', 'Carrito')
+    CarritoDetalle = apps.get_model('core', 'CarritoDetalle')
+
+    detalles = CarritoDetalle.objects.filter(carrito=OuterRef('pk')).values('carrito')
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    Carrito.objects.update(
+        cantidad_total=Coalesce(
+            Subquery(detalles.annotate(suma=Sum('cantidad')).values('suma'), output_field=PositiveIntegerField()),
+            0,
+        ),
+        total=Coalesce(
+            Subquery(detalles.annotate(suma=Sum(F('cantidad') * F('precio_unitario'))).values('suma'),
+                     output_field=decimal),
+            0,
+            output_field=decimal,
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_producto_menu_cursor_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carrito',
+            name='cantidad_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='carrito',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+def desactivar_duplicados(apps, schema_editor):
+    # Igual que limpiar_carritos.py: se conserva el carrito activo más reciente
+    Carrito = apps.get_model('core', 'Carrito')
+    vistos = set()
+    duplicados = []
+    activos = Carrito.objects.filter(activo=True, cliente__isnull=False).order_by('-fecha_creacion', '-id')
+    for carrito_id, cliente_id in activos.values_list('id', 'cliente_id'):
+        if cliente_id in vistos:
+            duplicados.append(carrito_id)
+        vistos.add(cliente_id)
+    Carrito.objects.filter(id__in=duplicados).update(activo=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_carrito_totales'),
+    ]
+
+    operations = [
+        migrations.RunPython(desactivar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='carrito',
+            constraint=models.UniqueConstraint(condition=models.Q(('activo', True), ('cliente__isnull', False)), fields=('cliente',), name='carrito_activo_unico_por_cliente'),
+        ),
+    ]
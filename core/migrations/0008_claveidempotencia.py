@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_carrito_activo_unico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ambito', models.CharField(max_length=100)),
+                ('clave', models.CharField(max_length=100)),
+                ('ruta', models.CharField(max_length=200)),
+                ('estado_http', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('ubicacion', models.CharField(blank=True, max_length=500)),
+                ('cuerpo', models.BinaryField(blank=True, default=b'')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Clave de Idempotencia',
+                'verbose_name_plural': 'Claves de Idempotencia',
+                'constraints': [models.UniqueConstraint(fields=('ambito', 'clave'), name='clave_idempotencia_unica')],
+            },
+        ),
+    ]
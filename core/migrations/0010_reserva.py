@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_tarea'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('vence', models.DateTimeField()),
+                ('carrito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='core.carrito')),
+                ('ingrediente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.ingrediente')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Ingrediente',
+                'verbose_name_plural': 'Reservas de Ingredientes',
+                'indexes': [models.Index(fields=['ingrediente', 'vence', 'cantidad'], name='reserva_vigente_idx')],
+                'unique_together': {('carrito', 'ingrediente')},
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def saldos_iniciales(apps, schema_editor):
+    # El stock actual pasa a ser el saldo de partida del libro
+    Inventario = apps.get_model('core', 'Inventario')
+    SaldoInventario = apps.get_model('core', 'SaldoInventario')
+    ahora = timezone.now()
+    SaldoInventario.objects.bulk_create([
+        SaldoInventario(ingrediente_id=ingrediente_id, cantidad=cantidad, hasta_movimiento=0, fecha_corte=ahora)
+        for ingrediente_id, cantidad in Inventario.objects.values_list('ingrediente_id', 'cantidad_actual')
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_reserva'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoInventario',
+            fields=[
+                ('ingrediente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo', serialize=False, to='core.ingrediente')),
+                ('cantidad', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('hasta_movimiento', models.PositiveBigIntegerField(default=0)),
+                ('fecha_corte', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Saldo de Inventario',
+                'verbose_name_plural': 'Saldos de Inventario',
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('compra', 'Compra a proveedor'), ('venta', 'Venta'), ('merma', 'Merma'), ('ajuste', 'Ajuste')], max_length=10)),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('referencia', models.CharField(blank=True, max_length=100)),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('ingrediente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='core.ingrediente')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Inventario',
+                'verbose_name_plural': 'Movimientos de Inventario',
+            },
+        ),
+        migrations.RunPython(saldos_iniciales, migrations.RunPython.noop),
+    ]
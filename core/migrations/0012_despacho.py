@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_libro_inventario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='fecha_asignacion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='zona',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='repartidor',
+            name='zona',
+            field=models.CharField(blank=True, db_index=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'repartidor', 'fecha_hora'], name='pedido_despacho_idx'),
+        ),
+    ]
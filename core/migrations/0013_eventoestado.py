@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_despacho'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('canales', models.CharField(max_length=255)),
+                ('datos', models.JSONField()),
+                ('fecha', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de Estado',
+                'verbose_name_plural': 'Eventos de Estado',
+            },
+        ),
+    ]
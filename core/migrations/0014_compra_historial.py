@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def contar_items(apps, schema_editor):
+    # Unidades de las compras existentes, en un solo UPDATE
+    Compra = apps.get_model('core', 'Compra')
+    ItemCompra = apps.get_model('core', 'ItemCompra')
+    unidades = (
+        ItemCompra.objects.filter(compra=OuterRef('pk'))
+        .values('compra').annotate(total=Sum('cantidad')).values('total')
+    )
+    Compra.objects.update(cantidad_items=Coalesce(Subquery(unidades), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_eventoestado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compra',
+            name='cantidad_items',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='compra',
+            index=models.Index(fields=['usuario', '-fecha_compra', '-id'], name='compra_historial_idx'),
+        ),
+        migrations.RunPython(contar_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def ventas_existentes(apps, schema_editor):
+    # Igual que core/ventas.py, pero con los modelos históricos de la migración
+    ItemCompra = apps.get_model('core', 'ItemCompra')
+    DetallePedido = apps.get_model('core', 'DetallePedido')
+    Compra = apps.get_model('core', 'Compra')
+    Pedido = apps.get_model('core', 'Pedido')
+    VentaDiaria = apps.get_model('core', 'VentaDiaria')
+    VentaDiariaProducto = apps.get_model('core', 'VentaDiariaProducto')
+
+    por_producto, por_dia = {}, {}
+
+    def dia(fecha_hora):
+        return por_dia.setdefault(timezone.localdate(fecha_hora), VentaDiaria(fecha=timezone.localdate(fecha_hora)))
+
+    lineas = [
+        (fecha, producto, restaurante, cantidad, cantidad * precio)
+        for fecha, producto, restaurante, cantidad, precio in ItemCompra.objects.exclude(compra__estado='cancelada')
+        .values_list('compra__fecha_compra', 'producto_id', 'producto__restaurante_id', 'cantidad', 'precio_unitario')
+    ] + list(DetallePedido.objects.values_list(
+        'pedido__fecha_hora', 'producto_id', 'producto__restaurante_id', 'cantidad', 'subtotal'
+    ))
+    for fecha_hora, producto_id, restaurante_id, cantidad, importe in lineas:
+        fecha = timezone.localdate(fecha_hora)
+        fila = por_producto.setdefault(
+            (fecha, producto_id), VentaDiariaProducto(fecha=fecha, producto_id=producto_id, restaurante_id=restaurante_id)
+        )
+        fila.unidades += cantidad
+        fila.ingresos += importe
+        dia(fecha_hora).unidades += cantidad
+    for fecha_hora, total in Compra.objects.exclude(estado='cancelada').values_list('fecha_compra', 'total'):
+        dia(fecha_hora).compras += 1
+        dia(fecha_hora).ingresos += total
+    for fecha_hora, total in Pedido.objects.values_list('fecha_hora', 'total'):
+        dia(fecha_hora).pedidos += 1
+        dia(fecha_hora).ingresos += total
+
+    VentaDiariaProducto.objects.bulk_create(por_producto.values(), batch_size=500)
+    VentaDiaria.objects.bulk_create(por_dia.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_compra_historial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('compras', models.IntegerField(default=0)),
+                ('pedidos', models.IntegerField(default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria',
+                'verbose_name_plural': 'Ventas Diarias',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='compra',
+            name='fecha_compra',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='pedido',
+            name='fecha_hora',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='core.producto')),
+                ('restaurante', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.restaurantevirtual')),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria por Producto',
+                'verbose_name_plural': 'Ventas Diarias por Producto',
+                'ordering': ['-fecha', '-ingresos'],
+                'indexes': [models.Index(fields=['restaurante', 'fecha'], name='venta_restaurante_fecha_idx')],
+                'unique_together': {('fecha', 'producto')},
+            },
+        ),
+        migrations.RunPython(ventas_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+def ocupados_por_despacho(apps, schema_editor):
+    # Los ocupados con algún pedido asignado por el despacho siguen siendo suyos
+    Repartidor = apps.get_model('core', 'Repartidor')
+    Pedido = apps.get_model('core', 'Pedido')
+    asignados = Pedido.objects.filter(fecha_asignacion__isnull=False).values('repartidor_id')
+    Repartidor.objects.filter(estado='ocupado', id__in=asignados).update(ocupado_por_despacho=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_ventas_diarias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repartidor',
+            name='ocupado_por_despacho',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(ocupados_por_despacho, migrations.RunPython.noop),
+    ]
@@ -41,6 +41,11 @@ class Repartidor(models.Model):
     nombre = models.CharField(max_length=100)
     vehiculo = models.CharField(max_length=50, blank=True, null=True)
     estado = models.CharField(max_length=15, choices=ESTADO, default='disponible')
+    # Zona de reparto (texto libre, igual al de Pedido.zona; vacío = cualquiera)
+    zona = models.CharField(max_length=50, blank=True, db_index=True)
+    # Lo ocupó el despacho (core/despacho.py), que lo libera solo; un estado
+    # puesto a mano desde el admin no lo toca
+    ocupado_por_despacho = models.BooleanField(default=False, editable=False)
 
     def __str__(self):
         return self.nombre
@@ -65,6 +70,57 @@ class Inventario(models.Model):
         return self.cantidad_actual <= self.stock_minimo
 
 
+class MovimientoInventario(models.Model):
+    """Libro de movimientos de stock: solo se insertan filas (ver core/inventario.py).
+
+    `cantidad` lleva signo: positiva entra, negativa sale. El stock de un
+    ingrediente es su SaldoInventario más los movimientos posteriores;
+    Inventario.cantidad_actual es ese mismo valor ya sumado.
+    """
+    TIPOS = [
+        ('compra', 'Compra a proveedor'),
+        ('venta', 'Venta'),
+        ('merma', 'Merma'),
+        ('ajuste', 'Ajuste'),
+    ]
+    
+    ingrediente = models.ForeignKey('Ingrediente', on_delete=models.CASCADE, related_name='movimientos')
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2)
+    referencia = models.CharField(max_length=100, blank=True)
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = "Movimiento de Inventario"
+        verbose_name_plural = "Movimientos de Inventario"
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad:+} {self.ingrediente.unidad_medida} de {self.ingrediente.nombre}"
+
+
+class SaldoInventario(models.Model):
+    """Stock de un ingrediente acumulado hasta el movimiento `hasta_movimiento`.
+
+    Lo escribe la compactación (manage.py compactar_inventario).
+    """
+    ingrediente = models.OneToOneField(
+        'Ingrediente',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='saldo'
+    )
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    hasta_movimiento = models.PositiveBigIntegerField(default=0)
+    fecha_corte = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = "Saldo de Inventario"
+        verbose_name_plural = "Saldos de Inventario"
+    
+    def __str__(self):
+        return f"Saldo de {self.ingrediente.nombre}: {self.cantidad}"
+
+
 # ============================
 # INGREDIENTES (AHORA CON INVENTARIO)
 # ============================
@@ -118,24 +174,42 @@ class Producto(models.Model):
     destacado = models.BooleanField(default=False)
     activo = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Paginación por cursor del menú de cada restaurante (api_menu_restaurante)
+            models.Index(fields=['restaurante', 'activo', 'id'], name='producto_menu_cursor_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
     @property
     def disponible(self):
         """Verifica si hay suficiente stock de todos los ingredientes"""
-        for receta in self.receta_set.all():
-            if receta.ingrediente.stock_actual < receta.cantidad_necesaria:
-                return False
-        return True
+        from .disponibilidad import producto_disponible
+        return producto_disponible(self)
+
+    @property
+    def unidades_disponibles(self):
+        """Unidades que se pueden preparar ahora (None si no tiene receta)"""
+        try:
+            return self.existencia.unidades
+        except ExistenciaProducto.DoesNotExist:
+            return None
+
+    @property
+    def agotado(self):
+        unidades = self.unidades_disponibles
+        return unidades is not None and unidades < 1
 
     @property
     def costo_produccion(self):
-        """Calcula el costo basado en los ingredientes"""
-        costo_total = 0
-        for receta in self.receta_set.all():
-            costo_total += receta.cantidad_necesaria * receta.ingrediente.costo_unitario
-        return costo_total
+        """Costo basado en los ingredientes (leído de la tabla de márgenes)"""
+        try:
+            return self.margen.costo_produccion
+        except MargenProducto.DoesNotExist:
+            from .costos import calcular_costos
+            return calcular_costos([self.pk])[self.pk]
 
 
 # ============================
@@ -153,6 +227,123 @@ class Receta(models.Model):
         return f"{self.cantidad_necesaria} {self.ingrediente.unidad_medida} de {self.ingrediente.nombre} para {self.producto.nombre}"
 
 
+# ============================
+# EXISTENCIAS MATERIALIZADAS (UNIDADES PREPARABLES POR PRODUCTO)
+# ============================
+class ExistenciaProducto(models.Model):
+    """Mínimo de cantidad_actual / cantidad_necesaria sobre la receta del producto.
+
+    Se mantiene por señales cuando cambia un Inventario o una Receta
+    (ver core/signals.py); `unidades` es None si el producto no tiene receta.
+    """
+    producto = models.OneToOneField(
+        Producto,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='existencia'
+    )
+    unidades = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Existencia de Producto"
+        verbose_name_plural = "Existencias de Productos"
+
+    def __str__(self):
+        if self.unidades is None:
+            return f"{self.producto.nombre}: sin límite"
+        return f"{self.producto.nombre}: {self.unidades} unidades"
+
+
+# ============================
+# COSTOS Y MÁRGENES MATERIALIZADOS
+# ============================
+class MargenProducto(models.Model):
+    """Costo de producción y margen (precio - costo) de cada producto.
+
+    Se recalcula en lote cuando cambian costos de ingredientes, recetas o
+    precios (ver core/costos.py y core/signals.py).
+    """
+    producto = models.OneToOneField(
+        Producto,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='margen'
+    )
+    costo_produccion = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    margen = models.DecimalField(max_digits=14, decimal_places=4, default=0, db_index=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Margen de Producto"
+        verbose_name_plural = "Reporte de Márgenes"
+        ordering = ['margen']
+
+    def __str__(self):
+        return f"{self.producto.nombre}: margen ${self.margen}"
+
+    @property
+    def porcentaje(self):
+        precio = self.producto.precio
+        if not precio:
+            return None
+        return round(self.margen * 100 / precio, 1)
+
+
+# ============================
+# VENTAS DIARIAS (TABLAS RESUMEN)
+# ============================
+class VentaDiariaProducto(models.Model):
+    """Unidades e ingresos de un producto en un día (compras y pedidos).
+
+    Se suma al confirmar cada compra o pedido (ver core/ventas.py); un rango
+    de fechas se reconstruye desde cero con manage.py reconstruir_ventas.
+    """
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='ventas_diarias')
+    # Copiado del producto: los reportes por restaurante no necesitan el JOIN
+    restaurante = models.ForeignKey('RestauranteVirtual', on_delete=models.SET_NULL, null=True, blank=True)
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Venta Diaria por Producto"
+        verbose_name_plural = "Ventas Diarias por Producto"
+        unique_together = ('fecha', 'producto')
+        ordering = ['-fecha', '-ingresos']
+        indexes = [
+            models.Index(fields=['restaurante', 'fecha'], name='venta_restaurante_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.producto.nombre}: {self.unidades} unidades"
+
+
+class VentaDiaria(models.Model):
+    """Totales del día: tickets (compras y pedidos), unidades e ingresos"""
+    fecha = models.DateField(unique=True)
+    compras = models.IntegerField(default=0)
+    pedidos = models.IntegerField(default=0)
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Venta Diaria"
+        verbose_name_plural = "Ventas Diarias"
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.fecha}: ${self.ingresos}"
+
+    @property
+    def tickets(self):
+        return self.compras + self.pedidos
+
+    @property
+    def ticket_promedio(self):
+        return round(self.ingresos / self.tickets, 2) if self.tickets else None
+
+
 # ============================
 # MENU
 # ============================
@@ -185,18 +376,63 @@ class Carrito(models.Model):
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     activo = models.BooleanField(default=True)
     
+    # Totales desnormalizados: los mantienen las señales de CarritoDetalle con
+    # UPDATE ... F() (ver core/signals.py); se reparan con
+    # manage.py recalcular_totales_carritos
+    cantidad_total = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    class Meta:
+        constraints = [
+            # Un solo carrito activo por cliente (ver carrito_de_cliente)
+            models.UniqueConstraint(
+                fields=['cliente'],
+                condition=models.Q(activo=True, cliente__isnull=False),
+                name='carrito_activo_unico_por_cliente',
+            ),
+        ]
+    
     def __str__(self):
         if self.cliente:
             return f"Carrito de {self.cliente.nombre}"
         return f"Carrito (Session: {self.session_key})"
     
-    @property
-    def total(self):
-        return sum(item.subtotal for item in self.detalles.all())
+    def refrescar_totales(self):
+        self.refresh_from_db(fields=['cantidad_total', 'total'])
     
-    @property
-    def cantidad_total(self):
-        return sum(item.cantidad for item in self.detalles.all())
+    # Misma interfaz que los carritos anónimos de core/carrito.py
+    def items(self):
+        return list(self.detalles.select_related('producto__categoria_menu'))
+    
+    def item(self, item_id):
+        return self.detalles.select_related('producto').filter(id=item_id).first()
+    
+    def agregar(self, producto, cantidad=1):
+        from .carrito import incrementar_linea
+        incrementar_linea(self, producto, cantidad)
+        self.refrescar_totales()
+    
+    def fijar_cantidad(self, producto, cantidad):
+        """Deja la línea del producto en `cantidad` (0 la elimina)"""
+        from .carrito import fijar_linea
+        fijar_linea(self, producto, cantidad)
+        self.refrescar_totales()
+    
+    # Cambios condicionales (core/carrito.py): seguros con peticiones simultáneas
+    def cambiar_cantidad(self, item_id, cantidad):
+        from .carrito import cambiar_linea
+        cambiar_linea(self, self.detalles.filter(id=item_id), cantidad)
+        self.refrescar_totales()
+    
+    def quitar(self, item_id):
+        from .carrito import cambiar_linea
+        cambiar_linea(self, self.detalles.filter(id=item_id), 0)
+        self.refrescar_totales()
+    
+    def vaciar(self):
+        from .carrito import vaciar_carrito
+        vaciar_carrito(self)
+        self.refrescar_totales()
 
 
 class CarritoDetalle(models.Model):
@@ -216,6 +452,30 @@ class CarritoDetalle(models.Model):
         return self.cantidad * self.precio_unitario
 
 
+class Reserva(models.Model):
+    """Ingrediente apartado por un carrito hasta `vence` (ver core/reservas.py).
+
+    Hay una fila por carrito e ingrediente con la demanda total del carrito;
+    las vencidas no cuentan y las borra manage.py liberar_reservas.
+    """
+    carrito = models.ForeignKey(Carrito, on_delete=models.CASCADE, related_name='reservas')
+    ingrediente = models.ForeignKey('Ingrediente', on_delete=models.CASCADE)
+    cantidad = models.DecimalField(max_digits=10, decimal_places=2)
+    vence = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = "Reserva de Ingrediente"
+        verbose_name_plural = "Reservas de Ingredientes"
+        unique_together = ['carrito', 'ingrediente']
+        indexes = [
+            # Suma de reservas vigentes por ingrediente sin recorrer la tabla
+            models.Index(fields=['ingrediente', 'vence', 'cantidad'], name='reserva_vigente_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.cantidad} {self.ingrediente.unidad_medida} de {self.ingrediente.nombre} ({self.carrito})"
+
+
 # ============================
 # PEDIDOS
 # ============================
@@ -233,10 +493,18 @@ class Pedido(models.Model):
     ]
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
     repartidor = models.ForeignKey(Repartidor, on_delete=models.SET_NULL, null=True, blank=True)
-    fecha_hora = models.DateTimeField(auto_now_add=True)
+    fecha_hora = models.DateTimeField(auto_now_add=True, db_index=True)
     estado = models.CharField(max_length=15, choices=ESTADO, default='pendiente')
     canal = models.CharField(max_length=10, choices=CANAL)
     total = models.DecimalField(max_digits=10, decimal_places=2)
+    zona = models.CharField(max_length=50, blank=True)
+    fecha_asignacion = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Pedidos abiertos sin repartidor, del más antiguo al más nuevo (core/despacho.py)
+            models.Index(fields=['estado', 'repartidor', 'fecha_hora'], name='pedido_despacho_idx'),
+        ]
 
     def __str__(self):
         return f"Pedido {self.id} - {self.cliente.nombre}"
@@ -303,14 +571,20 @@ class Compra(models.Model):
     ]
     
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
-    fecha_compra = models.DateTimeField(auto_now_add=True)
+    fecha_compra = models.DateTimeField(auto_now_add=True, db_index=True)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     estado = models.CharField(max_length=15, choices=ESTADO_COMPRA, default='completada')
+    # Unidades compradas: el historial en modo resumen las muestra sin leer ItemCompra
+    cantidad_items = models.PositiveIntegerField(default=0)
     
     class Meta:
         verbose_name = "Compra Agrupada"
         verbose_name_plural = "Compras Agrupadas"
         ordering = ['-fecha_compra']
+        indexes = [
+            # Historial paginado por cursor (fecha_compra, id) de cada usuario (core/historial.py)
+            models.Index(fields=['usuario', '-fecha_compra', '-id'], name='compra_historial_idx'),
+        ]
     
     def __str__(self):
         return f"Compra #{self.id} - {self.usuario.nombre_usuario} - ${self.total}"
@@ -330,4 +604,94 @@ class ItemCompra(models.Model):
     
     @property
     def subtotal(self):
-        return self.cantidad * self.precio_unitario
\ No newline at end of file
+        return self.cantidad * self.precio_unitario
+
+
+# ============================
+# CLAVES DE IDEMPOTENCIA (REINTENTOS DE COMPRAS Y PEDIDOS)
+# ============================
+class ClaveIdempotencia(models.Model):
+    """Respuesta guardada de una petición POST con clave de idempotencia.
+
+    Mientras la petición original se procesa, estado_http es None. Ver
+    core/idempotencia.py.
+    """
+    ambito = models.CharField(max_length=100)  # usuario, canal de socio o sesión
+    clave = models.CharField(max_length=100)
+    ruta = models.CharField(max_length=200)
+    estado_http = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    ubicacion = models.CharField(max_length=500, blank=True)  # cabecera Location de redirecciones
+    cuerpo = models.BinaryField(blank=True, default=b'')
+    fecha_creacion = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = "Clave de Idempotencia"
+        verbose_name_plural = "Claves de Idempotencia"
+        constraints = [
+            models.UniqueConstraint(fields=['ambito', 'clave'], name='clave_idempotencia_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ambito}: {self.clave}"
+
+
+
+# ============================
+# COLA DE TAREAS EN SEGUNDO PLANO
+# ============================
+class Tarea(models.Model):
+    """Trabajo diferido que ejecuta manage.py procesar_tareas (ver core/tareas.py).
+
+    `disponible_desde` indica cuándo puede reclamarse: sirve para el backoff
+    entre reintentos y como tiempo de visibilidad de una tarea en proceso
+    (si el trabajador muere, la tarea vuelve a quedar disponible).
+    """
+    ESTADO = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+    
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=15, choices=ESTADO, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=5)
+    disponible_desde = models.DateTimeField()
+    trabajador = models.CharField(max_length=100, blank=True)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Tarea"
+        verbose_name_plural = "Cola de Tareas"
+        indexes = [
+            models.Index(fields=['estado', 'disponible_desde'], name='tarea_reclamables_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.nombre} #{self.id} ({self.estado})"
+
+
+# ============================
+# EVENTOS DE ESTADO (BROKER EN BASE PARA VARIOS PROCESOS)
+# ============================
+class EventoEstado(models.Model):
+    """Cambio de estado publicado para los streams SSE (ver core/eventos.py).
+
+    Solo se usa con settings.EVENTOS_BROKER = 'base': cada proceso lee las
+    filas nuevas y las reparte a sus suscriptores; las viejas se borran solas.
+    """
+    canales = models.CharField(max_length=255)
+    datos = models.JSONField()
+    fecha = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        verbose_name = "Evento de Estado"
+        verbose_name_plural = "Eventos de Estado"
+    
+    def __str__(self):
+        return f"Evento #{self.id} ({self.canales})"
@@ -0,0 +1,121 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import DetallePedido, Ingrediente, ItemCompra, Producto, Receta
+
+# ============================
+# PLAN DE PRODUCCIÓN DE COCINA
+# ============================
+# Los pedidos abiertos y las compras web recientes se agrupan en una matriz
+# producto × franja horaria (unidades a preparar) y se multiplican por la
+# matriz de recetas producto × ingrediente: el resultado es la demanda por
+# ingrediente × franja. Son cinco consultas en total y un producto de
+# matrices dispersas en memoria, sin recorrer pedidos uno por uno.
+#
+# La franja se trunca en Python: TruncHour en SQLite llama a una función
+# Python por fila y hace el plan varias veces más lento.
+#
+# Los pedidos todavía no descontaron inventario, así que su demanda
+# acumulada se compara con el stock para detectar faltantes; las compras
+# web ya lo descontaron en el checkout y solo suman a lo que hay que preparar.
+
+ESTADOS_A_PREPARAR = ['pendiente', 'preparacion']
+
+
+def _unidades_por_franja(detalles, campo_fecha, matriz):
+    """Suma a `matriz[(producto_id, franja)]` las unidades de `detalles`"""
+    franjas = {}
+    filas = detalles.values_list('producto_id', campo_fecha).annotate(unidades=Sum('cantidad')).order_by()
+    for producto_id, fecha, unidades in filas:
+        franja = franjas.get(fecha)
+        if franja is None:
+            franja = franjas[fecha] = timezone.localtime(fecha).replace(minute=0, second=0, microsecond=0)
+        matriz[producto_id, franja] = matriz.get((producto_id, franja), 0) + unidades
+
+
+def plan_de_produccion(horas_compras=None):
+    """Calcula la lista de preparación y los faltantes por ingrediente.
+
+    Devuelve {'franjas': [...], 'preparacion': [...], 'ingredientes': [...]}
+    con las cantidades por franja alineadas con 'franjas'.
+    """
+    if horas_compras is None:
+        horas_compras = settings.PRODUCCION_HORAS_COMPRAS
+    pedidos = {}
+    compras = {}
+    _unidades_por_franja(
+        DetallePedido.objects.filter(pedido__estado__in=ESTADOS_A_PREPARAR), 'pedido__fecha_hora', pedidos
+    )
+    _unidades_por_franja(
+        ItemCompra.objects.filter(compra__fecha_compra__gte=timezone.now() - timedelta(hours=horas_compras))
+        .exclude(compra__estado='cancelada'),
+        'compra__fecha_compra',
+        compras,
+    )
+
+    franjas = sorted({franja for _, franja in pedidos} | {franja for _, franja in compras})
+    columna = {franja: numero for numero, franja in enumerate(franjas)}
+    vacia = [Decimal('0')] * len(franjas)
+
+    # Lista de preparación: unidades por producto y franja
+    preparacion = {}
+    for origen in (pedidos, compras):
+        for (producto_id, franja), unidades in origen.items():
+            preparacion.setdefault(producto_id, [0] * len(franjas))[columna[franja]] += unidades
+
+    # Producto disperso (unidades × receta): demanda total y la que aún no se descontó
+    recetas = {}
+    for producto_id, ingrediente_id, cantidad in Receta.objects.filter(producto_id__in=preparacion).values_list(
+        'producto_id', 'ingrediente_id', 'cantidad_necesaria'
+    ):
+        recetas.setdefault(producto_id, []).append((ingrediente_id, cantidad))
+    demanda = {}
+    sin_descontar = {}
+    for origen, descuenta_stock in ((pedidos, True), (compras, False)):
+        for (producto_id, franja), unidades in origen.items():
+            numero = columna[franja]
+            for ingrediente_id, cantidad in recetas.get(producto_id, ()):
+                demanda.setdefault(ingrediente_id, vacia[:])[numero] += cantidad * unidades
+                if descuenta_stock:
+                    sin_descontar.setdefault(ingrediente_id, vacia[:])[numero] += cantidad * unidades
+
+    datos = Ingrediente.objects.filter(id__in=demanda).values_list(
+        'id', 'nombre', 'unidad_medida', 'inventario__cantidad_actual'
+    )
+    ingredientes = []
+    for ingrediente_id, nombre, unidad, stock in datos:
+        stock = stock or Decimal('0')
+        acumulado = Decimal('0')
+        agotamiento = None
+        for numero, cantidad in enumerate(sin_descontar.get(ingrediente_id, ())):
+            acumulado += cantidad
+            if agotamiento is None and acumulado > stock:
+                agotamiento = franjas[numero]
+        ingredientes.append({
+            'id': ingrediente_id,
+            'nombre': nombre,
+            'unidad': unidad,
+            'stock': stock,
+            'por_franja': demanda[ingrediente_id],
+            'total': sum(demanda[ingrediente_id]),
+            'faltante': max(acumulado - stock, Decimal('0')),
+            'se_agota_en': agotamiento,
+        })
+    ingredientes.sort(key=lambda fila: (-fila['faltante'], fila['nombre']))
+
+    nombres = dict(
+        Producto.objects
+        .filter(id__in=preparacion).values_list('id', 'nombre')
+    )
+    lista = sorted(
+        (
+            {'id': producto_id, 'nombre': nombres.get(producto_id, ''), 'por_franja': fila, 'total': sum(fila)}
+            for producto_id, fila in preparacion.items()
+        ),
+        key=lambda fila: (-fila['total'], fila['nombre']),
+    )
+    return {'franjas': franjas, 'preparacion': lista, 'ingredientes': ingredientes}
@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef
+from django.utils import timezone
+
+from .compras import demanda_de_ingredientes
+from .disponibilidad import recalcular_existencias_por_ingredientes, reservado, reservas_activas
+from .models import Carrito, Ingrediente, Inventario, Reserva
+from .signals import al_confirmar
+
+# ============================
+# RESERVAS TEMPORALES DE INGREDIENTES
+# ============================
+# Opcional (settings.RESERVAS_TTL en segundos; 0 las desactiva). Cada vez
+# que cambia un carrito guardado en la base, sus reservas se igualan a la
+# demanda de ingredientes de sus recetas y se renueva el vencimiento. La
+# disponibilidad y el checkout descuentan lo reservado por otros carritos;
+# la compra consume las reservas propias. Las vencidas dejan de contar solas
+# y manage.py liberar_reservas las borra en lote.
+#
+# Una reserva que crece no puede pasar del stock que otros carritos no
+# apartaron: si no alcanza se lanza ReservaRechazada y las vistas revierten
+# el cambio del carrito, hecho en la misma transacción.
+#
+# Los carritos anónimos en sesión o caché no reservan: no tienen fila.
+
+
+class ReservaRechazada(Exception):
+    pass
+
+
+def verificar_stock_libre(carrito, demanda):
+    """Lanza ReservaRechazada si la demanda supera lo que no reservaron otros carritos"""
+    # Bloquea las filas de inventario (en motores que lo soportan) para que
+    # dos carritos no aparten a la vez la misma última unidad
+    libres = dict(
+        Inventario.objects.select_for_update()
+        .filter(ingrediente_id__in=demanda)
+        .annotate(libre=F('cantidad_actual') - reservado(OuterRef('ingrediente_id'), carrito))
+        .values_list('ingrediente_id', 'libre')
+    )
+    faltantes = [i for i, cantidad in demanda.items() if libres.get(i, 0) < cantidad]
+    if faltantes:
+        nombres = Ingrediente.objects.filter(id__in=faltantes).values_list('nombre', flat=True)
+        raise ReservaRechazada(f"No hay stock suficiente de: {', '.join(sorted(nombres))}")
+
+
+def renovar_reservas(carrito):
+    """Iguala las reservas del carrito a su demanda actual y extiende su vigencia.
+
+    Lanza ReservaRechazada si alguna reserva crece más allá del stock libre;
+    conviene llamarla en la misma transacción que cambió el carrito.
+    """
+    if not reservas_activas() or not isinstance(carrito, Carrito):
+        return
+    vence = timezone.now() + timedelta(seconds=settings.RESERVAS_TTL)
+    with transaction.atomic():
+        anteriores = dict(Reserva.objects.filter(carrito=carrito).values_list('ingrediente_id', 'cantidad'))
+        demanda = demanda_de_ingredientes(carrito)
+        # Bajar o mantener una reserva siempre se permite
+        aumentos = {i: cantidad for i, cantidad in demanda.items() if cantidad > anteriores.get(i, 0)}
+        if aumentos:
+            verificar_stock_libre(carrito, aumentos)
+        if demanda:
+            Reserva.objects.bulk_create(
+                [
+                    Reserva(carrito=carrito, ingrediente_id=ingrediente_id, cantidad=cantidad, vence=vence)
+                    for ingrediente_id, cantidad in demanda.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['carrito', 'ingrediente'],
+                update_fields=['cantidad', 'vence'],
+            )
+        sobrantes = set(anteriores) - set(demanda)
+        if sobrantes:
+            Reserva.objects.filter(carrito=carrito, ingrediente_id__in=sobrantes).delete()
+
+        # Renovar solo el vencimiento no cambia existencias; cambiar cantidades sí
+        cambiados = sobrantes | {i for i, cantidad in demanda.items() if anteriores.get(i) != cantidad}
+        if cambiados:
+            al_confirmar(recalcular_existencias_por_ingredientes, cambiados)
+
+
+def reservas_vencidas(ahora=None):
+    return Reserva.objects.filter(vence__lte=ahora or timezone.now())
+
+
+def liberar_reservas_vencidas(lote=1000):
+    """Borra las reservas vencidas en tandas por id; devuelve cuántas borró"""
+    ahora = timezone.now()
+    liberadas = 0
+    ingredientes = set()
+    while True:
+        filas = list(reservas_vencidas(ahora).order_by('id').values_list('id', 'ingrediente_id')[:lote])
+        if not filas:
+            break
+        with transaction.atomic():
+            liberadas += Reserva.objects.filter(id__in=[reserva_id for reserva_id, _ in filas]).delete()[0]
+            ingredientes.update(ingrediente_id for _, ingrediente_id in filas)
+    if ingredientes:
+        # Las existencias materializadas vuelven a contar lo liberado
+        recalcular_existencias_por_ingredientes(ingredientes)
+    return liberadas
@@ -0,0 +1,306 @@
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from .busqueda import eliminar_del_indice, indexar_por_categorias, indexar_por_restaurantes, indexar_productos
+from .cache_catalogo import invalidar_catalogo, invalidar_menus, invalidar_precios
+from .carrito import fusionar_carrito_anonimo, sumar_a_carrito
+from .costos import recalcular_costos, recalcular_costos_por_ingredientes
+from .disponibilidad import recalcular_existencias, recalcular_existencias_por_ingredientes
+from .historial import recontar_items
+from .ventas import restar_compras, sumar_compras, sumar_lineas_de_pedidos, sumar_tickets_de_pedidos
+from .middleware import PerfilCliente
+from .eventos import publicar_cambio
+from .models import (
+    CarritoDetalle, CategoriaMenu, Compra, DetallePedido, Ingrediente, Inventario, ItemCompra, MovimientoInventario,
+    Pedido, Producto, Receta, RestauranteVirtual,
+)
+
+# ============================
+# MANTENIMIENTO INCREMENTAL DE TABLAS DERIVADAS
+# ============================
+# Los recálculos se ejecutan al confirmar la transacción: así leen el estado
+# final y no tocan filas que un borrado en cascada está por eliminar.
+
+_lote = threading.local()
+
+
+def al_confirmar(funcion, ids=None):
+    """Programa `funcion(ids)` (o `funcion()`) para cuando se confirme la transacción"""
+    pendientes = getattr(_lote, 'pendientes', None)
+    if pendientes is not None:
+        # Dentro de recalculo_agrupado(): acumular ids y ejecutar una sola vez
+        if ids is None:
+            pendientes.setdefault(funcion, None)
+        else:
+            pendientes.setdefault(funcion, set()).update(ids)
+        return
+    transaction.on_commit(funcion if ids is None else partial(funcion, ids))
+
+
+@contextmanager
+def recalculo_agrupado():
+    """Agrupa los recálculos disparados dentro del bloque en una sola pasada.
+
+    Útil para ediciones masivas (list_editable del admin, importaciones):
+    en vez de recalcular por cada fila, cada función corre una vez con
+    todos los ids acumulados al salir del bloque.
+    """
+    if getattr(_lote, 'pendientes', None) is not None:
+        yield
+        return
+
+    _lote.pendientes = {}
+    try:
+        yield
+        pendientes = _lote.pendientes
+    finally:
+        _lote.pendientes = None
+
+    for funcion, ids in pendientes.items():
+        al_confirmar(funcion, ids)
+
+
+# EXISTENCIAS Y COSTOS
+# (recalcular_existencias también invalida los menús cacheados afectados)
+@receiver(post_init, sender=Producto)
+def producto_cargado(sender, instance, **kwargs):
+    # Recordar valores originales para saber qué recalcular al guardar
+    # (__dict__ evita consultar la base si el campo viene diferido)
+    instance._restaurante_inicial = instance.__dict__.get('restaurante_id')
+    instance._precio_inicial = instance.__dict__.get('precio')
+
+
+@receiver(post_save, sender=Producto)
+def producto_guardado(sender, instance, created, **kwargs):
+    if created:
+        al_confirmar(recalcular_existencias, [instance.pk])
+    if created or instance.precio != instance._precio_inicial:
+        al_confirmar(recalcular_costos, [instance.pk])
+    instance._precio_inicial = instance.precio
+
+
+@receiver([post_save, post_delete], sender=Receta)
+def receta_modificada(sender, instance, **kwargs):
+    al_confirmar(recalcular_existencias, [instance.producto_id])
+    al_confirmar(recalcular_costos, [instance.producto_id])
+
+
+@receiver([post_save, post_delete], sender=Inventario)
+def inventario_modificado(sender, instance, **kwargs):
+    al_confirmar(recalcular_existencias_por_ingredientes, [instance.ingrediente_id])
+
+
+# LIBRO DE INVENTARIO
+# (un save() que cambia cantidad_actual deja su ajuste en el libro; los
+# cambios normales pasan por core/inventario.py registrar_movimientos)
+@receiver(post_init, sender=Inventario)
+def inventario_cargado(sender, instance, **kwargs):
+    instance._cantidad_inicial = instance.__dict__.get('cantidad_actual') if instance.pk else 0
+
+
+@receiver(post_save, sender=Inventario)
+def inventario_ajustado(sender, instance, update_fields=None, **kwargs):
+    inicial = instance._cantidad_inicial
+    if inicial is None or (update_fields is not None and 'cantidad_actual' not in update_fields):
+        # Campo diferido al cargar o no guardado: no hay diferencia conocida
+        return
+    diferencia = instance.cantidad_actual - inicial
+    if diferencia:
+        MovimientoInventario.objects.create(
+            ingrediente_id=instance.ingrediente_id, tipo='ajuste', cantidad=diferencia, referencia='edicion'
+        )
+    instance._cantidad_inicial = instance.cantidad_actual
+
+
+@receiver(post_init, sender=Ingrediente)
+def ingrediente_cargado(sender, instance, **kwargs):
+    instance._costo_inicial = instance.__dict__.get('costo_unitario')
+
+
+@receiver(post_save, sender=Ingrediente)
+def ingrediente_guardado(sender, instance, created, **kwargs):
+    if not created and instance.costo_unitario != instance._costo_inicial:
+        al_confirmar(recalcular_costos_por_ingredientes, [instance.pk])
+    instance._costo_inicial = instance.costo_unitario
+
+
+# CACHÉ DE MENÚS
+@receiver([post_save, post_delete], sender=Producto)
+def producto_modificado(sender, instance, **kwargs):
+    al_confirmar(invalidar_menus, [instance.restaurante_id, instance._restaurante_inicial])
+    al_confirmar(invalidar_precios)
+    instance._restaurante_inicial = instance.restaurante_id
+
+
+@receiver([post_save, post_delete], sender=CategoriaMenu)
+def categoria_modificada(sender, instance, **kwargs):
+    al_confirmar(invalidar_menus, [instance.restaurante_id])
+    al_confirmar(invalidar_precios)
+
+
+@receiver([post_save, post_delete], sender=RestauranteVirtual)
+def restaurante_modificado(sender, instance, **kwargs):
+    al_confirmar(invalidar_menus, [instance.pk])
+    al_confirmar(invalidar_precios)
+    al_confirmar(invalidar_catalogo)
+
+
+# ÍNDICE DE BÚSQUEDA
+@receiver(post_save, sender=Producto)
+def producto_indexado(sender, instance, **kwargs):
+    al_confirmar(indexar_productos, [instance.pk])
+
+
+@receiver(post_delete, sender=Producto)
+def producto_desindexado(sender, instance, **kwargs):
+    al_confirmar(eliminar_del_indice, [instance.pk])
+
+
+@receiver(post_save, sender=CategoriaMenu)
+def categoria_indexada(sender, instance, **kwargs):
+    al_confirmar(indexar_por_categorias, [instance.pk])
+
+
+@receiver(pre_delete, sender=CategoriaMenu)
+def categoria_por_borrar(sender, instance, **kwargs):
+    # Los productos quedan sin categoría (SET_NULL, sin señales propias)
+    producto_ids = list(instance.producto_set.values_list('id', flat=True))
+    if producto_ids:
+        al_confirmar(indexar_productos, producto_ids)
+
+
+@receiver(post_save, sender=RestauranteVirtual)
+def restaurante_indexado(sender, instance, **kwargs):
+    al_confirmar(indexar_por_restaurantes, [instance.pk])
+
+
+# CARRITO ANÓNIMO
+@receiver(user_logged_in)
+def sesion_iniciada(sender, request, user, **kwargs):
+    if request is None:
+        return
+    # El perfil resuelto antes del login era el del visitante anónimo
+    request.perfil = PerfilCliente(request, user)
+    fusionar_carrito_anonimo(request)
+
+
+# TOTALES DEL CARRITO
+# (dentro de la misma transacción: el total debe cambiar junto con el detalle)
+@receiver(post_init, sender=CarritoDetalle)
+def detalle_cargado(sender, instance, **kwargs):
+    instance._aporte_inicial = (
+        instance.__dict__.get('carrito_id'),
+        instance.__dict__.get('cantidad') or 0,
+        instance.__dict__.get('precio_unitario') or 0,
+    ) if instance.pk else (None, 0, 0)
+
+
+@receiver(post_save, sender=CarritoDetalle)
+def detalle_guardado(sender, instance, **kwargs):
+    carrito_id, cantidad, precio = instance._aporte_inicial
+    if carrito_id == instance.carrito_id:
+        sumar_a_carrito(
+            carrito_id,
+            instance.cantidad - cantidad,
+            instance.cantidad * instance.precio_unitario - cantidad * precio,
+        )
+    else:
+        sumar_a_carrito(carrito_id, -cantidad, -cantidad * precio)
+        sumar_a_carrito(instance.carrito_id, instance.cantidad, instance.cantidad * instance.precio_unitario)
+    instance._aporte_inicial = (instance.carrito_id, instance.cantidad, instance.precio_unitario)
+
+
+@receiver(post_delete, sender=CarritoDetalle)
+def detalle_eliminado(sender, instance, **kwargs):
+    sumar_a_carrito(instance.carrito_id, -instance.cantidad, -instance.cantidad * instance.precio_unitario)
+
+
+# UNIDADES DE CADA COMPRA
+# (el checkout las guarda al crear la compra; esto cubre ediciones del admin)
+@receiver(post_init, sender=ItemCompra)
+def item_compra_cargado(sender, instance, **kwargs):
+    instance._compra_inicial = instance.__dict__.get('compra_id')
+
+
+@receiver([post_save, post_delete], sender=ItemCompra)
+def item_compra_modificado(sender, instance, **kwargs):
+    al_confirmar(recontar_items, [instance.compra_id, instance._compra_inicial])
+
+
+# VENTAS DIARIAS
+# (va antes de EVENTOS DE ESTADO, que actualiza _estado_inicial al guardar)
+@receiver(post_save, sender=Compra)
+def compra_contabilizada(sender, instance, created, **kwargs):
+    cancelada = instance.estado == 'cancelada'
+    if created and not cancelada:
+        al_confirmar(sumar_compras, [instance.pk])
+    elif not created and cancelada != (instance._estado_inicial == 'cancelada'):
+        al_confirmar(restar_compras if cancelada else sumar_compras, [instance.pk])
+
+
+@receiver(post_save, sender=Pedido)
+def pedido_contabilizado(sender, instance, created, **kwargs):
+    # Solo el ticket: las unidades las suma cada DetallePedido
+    if created:
+        al_confirmar(sumar_tickets_de_pedidos, [instance.pk])
+
+
+@receiver(post_init, sender=DetallePedido)
+def linea_de_pedido_cargada(sender, instance, **kwargs):
+    instance._linea_inicial = (
+        instance.__dict__.get('pedido_id'),
+        instance.__dict__.get('producto_id'),
+        instance.__dict__.get('cantidad') or 0,
+        instance.__dict__.get('subtotal') or 0,
+    ) if instance.pk else None
+
+
+@receiver(post_save, sender=DetallePedido)
+def linea_de_pedido_guardada(sender, instance, **kwargs):
+    lineas = [(instance.pedido_id, instance.producto_id, instance.cantidad, instance.subtotal)]
+    if instance._linea_inicial is not None:
+        pedido_id, producto_id, cantidad, subtotal = instance._linea_inicial
+        lineas.append((pedido_id, producto_id, -cantidad, -subtotal))
+    transaction.on_commit(partial(sumar_lineas_de_pedidos, lineas))
+    instance._linea_inicial = lineas[0]
+
+
+@receiver(post_delete, sender=DetallePedido)
+def linea_de_pedido_eliminada(sender, instance, **kwargs):
+    transaction.on_commit(partial(
+        sumar_lineas_de_pedidos, [(instance.pedido_id, instance.producto_id, -instance.cantidad, -instance.subtotal)]
+    ))
+
+
+# EVENTOS DE ESTADO (SSE)
+# (se publican al confirmar: un cambio revertido no debe anunciarse)
+@receiver(post_init, sender=Pedido)
+@receiver(post_init, sender=Compra)
+def estado_cargado(sender, instance, **kwargs):
+    instance._estado_inicial = instance.__dict__.get('estado') if instance.pk else None
+
+
+@receiver(post_save, sender=Pedido)
+def pedido_guardado(sender, instance, created, **kwargs):
+    if created or instance.estado != instance._estado_inicial:
+        transaction.on_commit(partial(
+            publicar_cambio, 'pedido', instance.pk, instance.estado, instance._estado_inicial,
+            ['cocina', f'cliente:{instance.cliente_id}'],
+        ))
+    instance._estado_inicial = instance.estado
+
+
+@receiver(post_save, sender=Compra)
+def compra_guardada(sender, instance, created, **kwargs):
+    if created or instance.estado != instance._estado_inicial:
+        transaction.on_commit(partial(
+            publicar_cambio, 'compra', instance.pk, instance.estado, instance._estado_inicial,
+            ['cocina', f'usuario:{instance.usuario_id}'],
+        ))
+    instance._estado_inicial = instance.estado
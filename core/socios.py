@@ -0,0 +1,53 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+# ============================
+# AUTENTICACIÓN DE SOCIOS (RAPPI, KIOSCOS, ETC.)
+# ============================
+# Los socios se identifican con un token en la cabecera
+#   Authorization: Token <token>
+# definido en settings.TOKENS_SOCIOS = {'<token>': '<canal>'}. El personal
+# con sesión iniciada (is_staff) también puede usar estos endpoints.
+#
+# Los endpoints POST de socios usan csrf_salvo_token: el token no viaja en
+# una cookie, así que solo las peticiones con sesión necesitan CSRF.
+
+
+def canal_del_token(request):
+    """Devuelve el canal asociado al token de la petición, o None"""
+    cabecera = request.headers.get('Authorization', '')
+    tipo, _, token = cabecera.partition(' ')
+    if tipo.lower() != 'token' or not token:
+        return None
+    return settings.TOKENS_SOCIOS.get(token.strip())
+
+
+def token_socio_requerido(vista):
+    """Permite el acceso a socios con token válido o a usuarios staff.
+
+    Deja en `request.canal_socio` el canal del token (None para staff).
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        canal = canal_del_token(request)
+        if canal is None and not (request.user.is_authenticated and request.user.is_staff):
+            return JsonResponse({'success': False, 'error': 'Token de socio inválido o ausente'}, status=401)
+        request.canal_socio = canal
+        return vista(request, *args, **kwargs)
+    return envoltura
+
+
+def csrf_salvo_token(vista):
+    """Exige CSRF a las peticiones con sesión; las que traen token de socio quedan exentas"""
+    protegida = csrf_protect(vista)
+
+    @csrf_exempt
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if canal_del_token(request) is not None:
+            return vista(request, *args, **kwargs)
+        return protegida(request, *args, **kwargs)
+    return envoltura
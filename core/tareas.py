@@ -0,0 +1,142 @@
+import logging
+import os
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Tarea
+
+logger = logging.getLogger(__name__)
+
+# ============================
+# COLA DE TAREAS DURABLE EN LA BASE
+# ============================
+# Las funciones se registran con @tarea y se encolan con encolar(); como la
+# fila Tarea se inserta en la misma transacción que el trabajo que la
+# origina, si esa transacción se revierte la tarea tampoco existe.
+#
+# Un trabajador (manage.py procesar_tareas) reclama tareas con un UPDATE
+# condicional: solo uno gana cada fila. Al reclamarla la oculta durante
+# TAREAS_VISIBILIDAD segundos; si falla reintenta con backoff exponencial
+# hasta max_intentos. Una tarea cuyo trabajador murió en el último intento
+# no se reclama más: queda fallida al vencer su visibilidad.
+
+_registro = {}
+
+
+def tarea(funcion=None, *, nombre=None, max_intentos=5):
+    """Registra una función como tarea encolable (sus argumentos deben ser JSON)"""
+    def registrar(f):
+        f.nombre_tarea = nombre or f'{f.__module__}.{f.__name__}'
+        f.max_intentos = max_intentos
+        _registro[f.nombre_tarea] = f
+        return f
+    return registrar(funcion) if funcion is not None else registrar
+
+
+def encolar(funcion, *args, demora=0, **kwargs):
+    """Encola `funcion(*args, **kwargs)`; `funcion` es la tarea o su nombre"""
+    if isinstance(funcion, str):
+        funcion = _registro[funcion]
+    return Tarea.objects.create(
+        nombre=funcion.nombre_tarea,
+        argumentos={'args': list(args), 'kwargs': kwargs},
+        max_intentos=funcion.max_intentos,
+        disponible_desde=timezone.now() + timedelta(seconds=demora),
+    )
+
+
+def nombre_trabajador():
+    return f'{os.uname().nodename if hasattr(os, "uname") else "local"}:{os.getpid()}:{threading.get_ident()}'
+
+
+def reclamar(trabajador, limite=10):
+    """Reclama hasta `limite` tareas disponibles y las devuelve"""
+    ahora = timezone.now()
+    Tarea.objects.filter(
+        estado='en_proceso', disponible_desde__lte=ahora, intentos__gte=F('max_intentos')
+    ).update(
+        estado='fallida', fecha_fin=ahora,
+        ultimo_error="Intentos agotados: el trabajador no terminó dentro de la visibilidad",
+    )
+    candidatas = list(
+        Tarea.objects.filter(
+            estado__in=['pendiente', 'en_proceso'], disponible_desde__lte=ahora, intentos__lt=F('max_intentos')
+        )
+        .order_by('disponible_desde')
+        .values_list('id', 'intentos')[:limite]
+    )
+    # Reclamo y lectura juntos: si algo falla, ninguna tarea queda oculta sin dueño
+    with transaction.atomic():
+        reclamadas = []
+        for tarea_id, intentos in candidatas:
+            # `intentos` hace de versión: si otro trabajador la reclamó, ya cambió
+            ganada = Tarea.objects.filter(
+                id=tarea_id, intentos=intentos, intentos__lt=F('max_intentos'), disponible_desde__lte=ahora
+            ).update(
+                estado='en_proceso',
+                intentos=F('intentos') + 1,
+                disponible_desde=ahora + timedelta(seconds=settings.TAREAS_VISIBILIDAD),
+                trabajador=trabajador,
+            )
+            if ganada:
+                reclamadas.append(tarea_id)
+        return list(Tarea.objects.filter(id__in=reclamadas).order_by('disponible_desde'))
+
+
+def backoff(intentos):
+    """Segundos de espera antes del reintento número `intentos`"""
+    return min(settings.TAREAS_BACKOFF_BASE * 2 ** (intentos - 1), settings.TAREAS_BACKOFF_MAXIMO)
+
+
+def _registrar_resultado(tarea_obj, intentos_escritura=5, **cambios):
+    """Guarda el resultado de una tarea ya ejecutada.
+
+    Un bloqueo pasajero (SQLite con varios escritores) no debe dejar la tarea
+    como en_proceso: se repetiría entera al vencer la visibilidad.
+    """
+    for intento in range(1, intentos_escritura + 1):
+        try:
+            return Tarea.objects.filter(id=tarea_obj.id, intentos=tarea_obj.intentos).update(**cambios)
+        except OperationalError:
+            if intento == intentos_escritura:
+                raise
+            time.sleep(0.05 * intento)
+
+
+def ejecutar(tarea_obj):
+    """Ejecuta una tarea reclamada y registra el resultado. Devuelve True si terminó bien."""
+    funcion = _registro.get(tarea_obj.nombre)
+    try:
+        if funcion is None:
+            raise LookupError(f"Tarea no registrada: {tarea_obj.nombre}")
+        with transaction.atomic():
+            funcion(*tarea_obj.argumentos.get('args', []), **tarea_obj.argumentos.get('kwargs', {}))
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Falló la tarea %s (intento %s)\n%s", tarea_obj, tarea_obj.intentos, error)
+        if tarea_obj.intentos >= tarea_obj.max_intentos:
+            cambios = {'estado': 'fallida', 'fecha_fin': timezone.now()}
+        else:
+            cambios = {
+                'estado': 'pendiente',
+                'disponible_desde': timezone.now() + timedelta(seconds=backoff(tarea_obj.intentos)),
+            }
+        _registrar_resultado(tarea_obj, ultimo_error=error, **cambios)
+        return False
+
+    _registrar_resultado(tarea_obj, estado='completada', fecha_fin=timezone.now(), ultimo_error='')
+    return True
+
+
+def procesar_lote(trabajador=None, limite=10):
+    """Reclama y ejecuta un lote; devuelve (ejecutadas, fallidas)"""
+    tareas = reclamar(trabajador or nombre_trabajador(), limite)
+    fallidas = sum(not ejecutar(t) for t in tareas)
+    return len(tareas), fallidas
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from core.models import Producto, RestauranteVirtual
+
+
+class ApiCatalogoCondicionalTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurante = RestauranteVirtual.objects.create(nombre="KFC")
+            self.producto = Producto.objects.create(nombre="Alitas", precio=12000, restaurante=self.restaurante)
+        self.url_menu = reverse("core:api_menu_restaurante", args=[self.restaurante.id])
+
+    def test_api_restaurantes_con_etag(self):
+        """Responde con ETag, Last-Modified y Cache-Control, y los campos existentes"""
+        response = self.client.get(reverse("core:api_restaurantes"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+        self.assertIn("max-age", response["Cache-Control"])
+        self.assertEqual(response.json()["restaurantes"][0]["imagen"], "")
+
+    def test_if_none_match_sin_consultas(self):
+        """Un ETag vigente se responde con 304 sin tocar la base de datos"""
+        etag = self.client.get(self.url_menu)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url_menu, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_cambio_de_precio_cambia_el_etag(self):
+        """Editar un producto invalida el ETag del menú"""
+        etag = self.client.get(self.url_menu)["ETag"]
+        self.producto.precio = 9900
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.save()
+        response = self.client.get(self.url_menu, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["productos"][0]["precio"], 9900)
+
+
+class ApiMenuPaginadoTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.restaurante = RestauranteVirtual.objects.create(nombre="KFC")
+        self.productos = [
+            Producto.objects.create(nombre=f"Combo {i}", precio=1000 + i, restaurante=self.restaurante)
+            for i in range(5)
+        ]
+        Producto.objects.create(nombre="Retirado", precio=1, restaurante=self.restaurante, activo=False)
+        self.url = reverse("core:api_menu_restaurante", args=[self.restaurante.id])
+
+    def test_paginacion_por_cursor(self):
+        """Recorre el menú con el cursor 'siguiente' sin repetir ni saltar productos"""
+        vistos = []
+        params = {"limite": 2}
+        while True:
+            data = self.client.get(self.url, params).json()
+            vistos += [p["id"] for p in data["productos"]]
+            if data["siguiente"] is None:
+                break
+            params["cursor"] = data["siguiente"]
+        self.assertEqual(vistos, [p.id for p in self.productos])
+
+    def test_campos_y_filtros(self):
+        """fields recorta el payload y activo=false lista los inactivos"""
+        data = self.client.get(self.url, {"fields": "nombre", "activo": "false"}).json()
+        self.assertEqual(data["productos"], [{"id": data["productos"][0]["id"], "nombre": "Retirado"}])
+        response = self.client.get(self.url, {"fields": "nombre,costo"})
+        self.assertEqual(response.status_code, 400)
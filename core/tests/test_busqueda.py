@@ -0,0 +1,58 @@
+from django.test import TestCase
+from django.urls import reverse
+from core.busqueda import buscar
+from core.models import CategoriaMenu, Producto, RestauranteVirtual
+
+
+class BusquedaProductosTest(TestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kfc = RestauranteVirtual.objects.create(nombre="KFC")
+            self.burger = RestauranteVirtual.objects.create(nombre="Burger King")
+            self.pollo = CategoriaMenu.objects.create(restaurante=self.kfc, nombre="Pollo")
+            self.hamburguesas = CategoriaMenu.objects.create(restaurante=self.burger, nombre="Hamburguesas")
+            self.alitas = Producto.objects.create(
+                nombre="Alitas picantes", precio=12000, restaurante=self.kfc, categoria_menu=self.pollo
+            )
+            self.whopper = Producto.objects.create(
+                nombre="Whopper", descripcion="Hamburguesa a la parrilla con pollo crocante",
+                precio=18000, restaurante=self.burger, categoria_menu=self.hamburguesas
+            )
+
+    def test_prefijo_ranking_y_facetas(self):
+        """Busca por prefijo, prioriza el nombre y cuenta por restaurante"""
+        resultado = buscar("pol")
+        self.assertEqual(resultado['total'], 2)
+        # 'Pollo' es la categoría de las alitas y solo aparece en la descripción del whopper
+        self.assertEqual(resultado['resultados'][0], self.alitas)
+        restaurantes = {f['nombre']: f['total'] for f in resultado['facetas']['restaurantes']}
+        self.assertEqual(restaurantes, {"KFC": 1, "Burger King": 1})
+
+        filtrado = buscar("pol", restaurante_id=self.burger.id)
+        self.assertEqual(filtrado['resultados'], [self.whopper])
+
+    def test_indice_sincronizado(self):
+        """Renombrar, desactivar y borrar se reflejan en el índice"""
+        self.alitas.nombre = "Nuggets"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alitas.save()
+        self.assertEqual(buscar("alitas")['total'], 0)
+        self.assertEqual(buscar("nugg")['resultados'], [self.alitas])
+
+        self.kfc.activo = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kfc.save()
+        self.assertEqual(buscar("nugg")['total'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.whopper.delete()
+        self.assertEqual(buscar("whopper")['total'], 0)
+
+    def test_api_buscar(self):
+        """La API devuelve resultados y facetas en JSON"""
+        response = self.client.get(reverse("core:api_buscar"), {"q": "whop"})
+        data = response.json()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['resultados'][0]['nombre'], "Whopper")
+        self.assertEqual(data['facetas']['categorias'][0]['nombre'], "Hamburguesas")
@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from core.cache_catalogo import version_menu
+from core.models import CategoriaMenu, Producto, RestauranteVirtual
+
+
+class CacheMenuTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kfc = RestauranteVirtual.objects.create(nombre="KFC")
+            self.mcd = RestauranteVirtual.objects.create(nombre="McDonald's")
+            categoria = CategoriaMenu.objects.create(restaurante=self.kfc, nombre="Pollo")
+            self.producto = Producto.objects.create(
+                nombre="Alitas", precio=12000, restaurante=self.kfc, categoria_menu=categoria
+            )
+        self.url = reverse("core:menu_restaurante", args=[self.kfc.id])
+
+    def test_segunda_visita_no_consulta_el_menu(self):
+        """Con la caché caliente el menú se sirve sin consultas"""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Alitas")
+
+    def test_cambio_de_precio_invalida_solo_ese_restaurante(self):
+        """Editar un producto sube la versión de su restaurante y no la de otros"""
+        version_kfc = version_menu(self.kfc.id)
+        version_mcd = version_menu(self.mcd.id)
+        self.client.get(self.url)
+
+        self.producto.precio = 9900
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.save()
+
+        self.assertGreater(version_menu(self.kfc.id), version_kfc)
+        self.assertEqual(version_menu(self.mcd.id), version_mcd)
+        self.assertContains(self.client.get(self.url), "9900")
@@ -0,0 +1,238 @@
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.carrito import cambiar_linea, carrito_de_cliente, desactivar_duplicados, incrementar_linea
+from core.models import Carrito, CarritoDetalle, Cliente, Producto, Usuario
+
+
+class CarritoAnonimoTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.hamburguesa = Producto.objects.create(nombre="Hamburguesa", precio=15000)
+        self.gaseosa = Producto.objects.create(nombre="Gaseosa", precio=4000)
+        User.objects.create_user(username="ana", password="clave-segura-123")
+        usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        self.cliente = Cliente.objects.create(usuario=usuario, nombre="Ana")
+
+    def agregar(self, producto):
+        return self.client.post(reverse('core:agregar_al_carrito', args=[producto.id]))
+
+    @override_settings(CARRITO_ANONIMO='sesion')
+    def test_sesion_no_crea_filas(self):
+        """En modo sesión agregar y ver el carrito no escribe Carrito ni CarritoDetalle"""
+        self.agregar(self.hamburguesa)
+        self.agregar(self.hamburguesa)
+        respuesta = self.client.get(reverse('core:ver_carrito'))
+        self.assertEqual(respuesta.context['carrito'].cantidad_total, 2)
+        self.assertEqual(respuesta.context['carrito'].total, 30000)
+        self.assertFalse(Carrito.objects.exists())
+
+        self.client.post(reverse('core:actualizar_carrito', args=[self.hamburguesa.id]), {'cantidad': 5})
+        self.assertEqual(self.client.get(reverse('core:ver_carrito')).context['items'][0].cantidad, 5)
+
+    @override_settings(CARRITO_ANONIMO='cache')
+    def test_fusion_al_iniciar_sesion(self):
+        """Al iniciar sesión el carrito en caché se suma al Carrito del cliente"""
+        carrito = Carrito.objects.create(cliente=self.cliente)
+        carrito.agregar(self.hamburguesa)
+        self.agregar(self.hamburguesa)
+        self.agregar(self.gaseosa)
+        self.assertEqual(Carrito.objects.count(), 1)
+
+        self.client.login(username="ana", password="clave-segura-123")
+        cantidades = dict(CarritoDetalle.objects.filter(carrito=carrito).values_list('producto__nombre', 'cantidad'))
+        self.assertEqual(cantidades, {"Hamburguesa": 2, "Gaseosa": 1})
+
+        # El carrito anónimo quedó vacío: volver a entrar no duplica
+        self.client.logout()
+        self.client.login(username="ana", password="clave-segura-123")
+        carrito.refrescar_totales()
+        self.assertEqual((carrito.cantidad_total, carrito.total), (3, 34000))
+
+    @override_settings(CARRITO_ANONIMO='db')
+    def test_fusion_modo_db(self):
+        """En modo db el Carrito anónimo se fusiona y se elimina"""
+        self.agregar(self.gaseosa)
+        self.client.login(username="ana", password="clave-segura-123")
+        carrito = Carrito.objects.get()
+        self.assertEqual(carrito.cliente, self.cliente)
+        self.assertEqual(carrito.cantidad_total, 1)
+
+
+class TotalesCarritoTest(TestCase):
+
+    def setUp(self):
+        self.carrito = Carrito.objects.create()
+        self.hamburguesa = Producto.objects.create(nombre="Hamburguesa", precio=15000)
+        self.gaseosa = Producto.objects.create(nombre="Gaseosa", precio=4000)
+
+    def test_totales_por_delta(self):
+        """Agregar, cambiar y quitar detalles ajusta las columnas sin releer el carrito"""
+        self.carrito.agregar(self.hamburguesa)
+        self.carrito.agregar(self.hamburguesa)
+        self.carrito.agregar(self.gaseosa, 3)
+        self.assertEqual((self.carrito.cantidad_total, self.carrito.total), (5, 42000))
+
+        item = self.carrito.detalles.get(producto=self.gaseosa)
+        self.carrito.cambiar_cantidad(item.id, 1)
+        self.assertEqual((self.carrito.cantidad_total, self.carrito.total), (3, 34000))
+
+        self.carrito.quitar(item.id)
+        self.assertEqual((self.carrito.cantidad_total, self.carrito.total), (2, 30000))
+
+        self.carrito.vaciar()
+        self.assertEqual((self.carrito.cantidad_total, self.carrito.total), (0, 0))
+
+    def test_comando_de_reparacion(self):
+        """recalcular_totales_carritos corrige columnas desincronizadas"""
+        self.carrito.agregar(self.hamburguesa, 2)
+        Carrito.objects.filter(pk=self.carrito.pk).update(cantidad_total=99, total=1)
+        vacio = Carrito.objects.create()
+        Carrito.objects.filter(pk=vacio.pk).update(cantidad_total=4)
+
+        call_command('recalcular_totales_carritos', stdout=io.StringIO())
+        self.carrito.refrescar_totales()
+        vacio.refrescar_totales()
+        self.assertEqual((self.carrito.cantidad_total, self.carrito.total), (2, 30000))
+        self.assertEqual(vacio.cantidad_total, 0)
+
+
+class CambiosAtomicosCarritoTest(TestCase):
+
+    def setUp(self):
+        self.hamburguesa = Producto.objects.create(nombre="Hamburguesa", precio=15000)
+        self.gaseosa = Producto.objects.create(nombre="Gaseosa", precio=4000)
+
+    def test_incremento_sin_leer_la_linea(self):
+        """Agregar un producto existente es un UPDATE con F() y respeta el precio guardado"""
+        carrito = Carrito.objects.create()
+        carrito.agregar(self.hamburguesa)
+        Producto.objects.filter(pk=self.hamburguesa.pk).update(precio=99999)
+        with self.assertNumQueries(5):
+            # SAVEPOINT, UPDATE detalle, UPDATE carrito, RELEASE, refresco de totales
+            carrito.agregar(self.hamburguesa, 2)
+        self.assertEqual(carrito.detalles.get().cantidad, 3)
+        self.assertEqual((carrito.cantidad_total, carrito.total), (3, 45000))
+
+    def test_cambio_sobre_lectura_vieja(self):
+        """Si otra petición cambia la línea entre la lectura y la escritura, se relee y los totales cuadran"""
+        carrito = Carrito.objects.create()
+        carrito.agregar(self.hamburguesa)
+        detalles = carrito.detalles.filter(producto=self.hamburguesa)
+        vieja = detalles.values_list('pk', 'cantidad', 'precio_unitario').first()
+        incrementar_linea(carrito, self.hamburguesa, 2)  # la otra petición: 1 -> 3
+
+        lectura = mock.Mock(wraps=detalles)
+        lectura.values_list.side_effect = [
+            mock.Mock(first=lambda: vieja), detalles.values_list('pk', 'cantidad', 'precio_unitario'),
+        ]
+        self.assertTrue(cambiar_linea(carrito, lectura, 5))
+        carrito.refrescar_totales()
+        self.assertEqual(detalles.get().cantidad, 5)
+        self.assertEqual((carrito.cantidad_total, carrito.total), (5, 75000))
+
+        # Quitar dos veces la misma línea resta una sola vez
+        item_id = detalles.get().id
+        carrito.quitar(item_id)
+        carrito.quitar(item_id)
+        self.assertEqual((carrito.cantidad_total, carrito.total), (0, 0))
+
+    @override_settings(CARRITO_ANONIMO='db')
+    def test_api_en_lote(self):
+        """Varios cambios de cantidad en una petición devuelven los totales nuevos"""
+        self.client.post(reverse('core:agregar_al_carrito', args=[self.gaseosa.id]))
+        respuesta = self.client.post(
+            reverse('core:api_actualizar_carrito'),
+            json.dumps({'items': [
+                {'producto': self.hamburguesa.id, 'cantidad': 2},
+                {'producto': self.gaseosa.id, 'cantidad': 0},
+            ]}),
+            content_type='application/json',
+        )
+        datos = respuesta.json()
+        self.assertEqual((datos['cantidad_total'], datos['total']), (2, 30000))
+        self.assertEqual(datos['items'], [{'producto': self.hamburguesa.id, 'cantidad': 2, 'subtotal': 30000}])
+
+        respuesta = self.client.post(
+            reverse('core:api_actualizar_carrito'),
+            json.dumps({'items': [{'producto': 0, 'cantidad': 1}]}),
+            content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class PerfilClienteTest(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(username="ana", password="clave-segura-123")
+        usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        self.cliente = Cliente.objects.create(usuario=usuario, nombre="Ana")
+        self.client.login(username="ana", password="clave-segura-123")
+
+    def test_ids_en_sesion(self):
+        """Tras la primera petición el perfil sale de la sesión, sin buscar Usuario ni Cliente"""
+        self.client.get(reverse('core:ver_carrito'))
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('core:ver_carrito'))
+        tablas = ' '.join(c['sql'] for c in consultas.captured_queries)
+        self.assertNotIn('core_usuario', tablas)
+        self.assertNotIn('core_cliente', tablas)
+        self.assertEqual(respuesta.context['carrito'].cliente_id, self.cliente.id)
+
+    def test_un_carrito_activo_por_cliente(self):
+        """La restricción impide un segundo carrito activo y carrito_de_cliente reutiliza el existente"""
+        carrito = carrito_de_cliente(self.cliente.id)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Carrito.objects.create(cliente=self.cliente, activo=True)
+        Carrito.objects.create(cliente=self.cliente, activo=False)
+        self.assertEqual(carrito_de_cliente(self.cliente.id), carrito)
+
+
+class LimpiarCarritosTest(TestCase):
+
+    def setUp(self):
+        usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        self.cliente = Cliente.objects.create(usuario=usuario, nombre="Ana")
+        self.producto = Producto.objects.create(nombre="Gaseosa", precio=4000)
+
+    def test_purga_anonimos_vencidos_en_lotes(self):
+        """Borra anónimos viejos o sin sesión y conserva los recientes y los de clientes"""
+        viejos = [Carrito.objects.create(session_key=f"viejo{i}") for i in range(3)]
+        for carrito in viejos:
+            carrito.agregar(self.producto)
+        Carrito.objects.filter(id__in=[c.id for c in viejos]).update(
+            fecha_actualizacion=timezone.now() - timedelta(days=30)
+        )
+        sesion = SessionStore()
+        sesion.create()
+        reciente = Carrito.objects.create(session_key=sesion.session_key)
+        expirado = Carrito.objects.create(session_key="sin-sesion")
+        del_cliente = Carrito.objects.create(cliente=self.cliente)
+
+        salida = io.StringIO()
+        call_command('limpiar_carritos', dias=14, lote=2, stdout=salida)
+        self.assertEqual(set(Carrito.objects.values_list('id', flat=True)), {reciente.id, del_cliente.id})
+        self.assertFalse(CarritoDetalle.objects.exists())
+        self.assertIn("Carritos anónimos borrados: 4 (3 detalles)", salida.getvalue())
+        self.assertFalse(Carrito.objects.filter(id=expirado.id).exists())
+
+    def test_desactiva_duplicados(self):
+        """Solo queda activo el carrito anónimo más reciente de cada sesión"""
+        viejo = Carrito.objects.create(session_key="abc")
+        nuevo = Carrito.objects.create(session_key="abc")
+        self.assertEqual(desactivar_duplicados(), (2, 1))
+        self.assertFalse(Carrito.objects.get(id=viejo.id).activo)
+        self.assertTrue(Carrito.objects.get(id=nuevo.id).activo)
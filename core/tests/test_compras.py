@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.compras import CompraRechazada, demanda_de_ingredientes, realizar_compra
+from core.models import (
+    Carrito, ClaveIdempotencia, Cliente, Compra, ExistenciaProducto, Ingrediente, Inventario, ItemCompra, Producto, Receta, Usuario,
+)
+
+
+class CheckoutTest(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        self.cliente = Cliente.objects.create(usuario=self.usuario, nombre="Ana")
+        self.carrito = Carrito.objects.create(cliente=self.cliente)
+
+        self.pan = Ingrediente.objects.create(nombre="Pan", unidad_medida="unidades")
+        self.carne = Ingrediente.objects.create(nombre="Carne", unidad_medida="gramos")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inventario_pan = Inventario.objects.create(ingrediente=self.pan, cantidad_actual=5)
+            self.inventario_carne = Inventario.objects.create(ingrediente=self.carne, cantidad_actual=1000)
+            self.hamburguesa = Producto.objects.create(nombre="Hamburguesa", precio=15000)
+            Receta.objects.create(producto=self.hamburguesa, ingrediente=self.pan, cantidad_necesaria=1)
+            Receta.objects.create(producto=self.hamburguesa, ingrediente=self.carne, cantidad_necesaria=150)
+            self.doble = Producto.objects.create(nombre="Doble", precio=22000)
+            Receta.objects.create(producto=self.doble, ingrediente=self.pan, cantidad_necesaria=1)
+            Receta.objects.create(producto=self.doble, ingrediente=self.carne, cantidad_necesaria=300)
+            self.gaseosa = Producto.objects.create(nombre="Gaseosa", precio=4000)
+
+    def stock(self, inventario):
+        inventario.refresh_from_db()
+        return inventario.cantidad_actual
+
+    def test_demanda_agrupada(self):
+        """La demanda suma recetas × cantidades de todas las líneas por ingrediente"""
+        self.carrito.agregar(self.hamburguesa, 2)
+        self.carrito.agregar(self.doble)
+        self.carrito.agregar(self.gaseosa)
+        self.assertEqual(demanda_de_ingredientes(self.carrito), {self.pan.id: 3, self.carne.id: 600})
+
+    def test_compra_descuenta_inventario(self):
+        """La compra crea los items en lote, descuenta stock y vacía el carrito"""
+        self.carrito.agregar(self.hamburguesa, 2)
+        self.carrito.agregar(self.gaseosa, 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            compra = realizar_compra(self.usuario.id, self.carrito)
+
+        self.assertEqual(compra.total, 42000)
+        self.assertEqual(ItemCompra.objects.filter(compra=compra).count(), 2)
+        self.assertEqual(self.stock(self.inventario_pan), 3)
+        self.assertEqual(self.stock(self.inventario_carne), 700)
+        self.assertEqual(self.carrito.cantidad_total, 0)
+        self.assertEqual(ExistenciaProducto.objects.get(producto=self.hamburguesa).unidades, 3)
+
+    def test_sin_stock_no_compra_nada(self):
+        """Si un ingrediente no alcanza se revierte todo y no se crea la compra"""
+        self.carrito.agregar(self.doble, 4)  # 1200 g de carne, solo hay 1000
+        with self.assertRaisesMessage(CompraRechazada, "Carne"):
+            realizar_compra(self.usuario.id, self.carrito)
+        self.assertFalse(Compra.objects.exists())
+        self.assertEqual(self.stock(self.inventario_pan), 5)
+        self.assertEqual(self.stock(self.inventario_carne), 1000)
+        self.assertEqual(self.carrito.detalles.count(), 1)
+
+    def test_ultima_unidad(self):
+        """Dos compras seguidas no pueden llevarse la misma última unidad"""
+        Inventario.objects.filter(pk=self.inventario_pan.pk).update(cantidad_actual=1)
+        otro = Carrito.objects.create(session_key="otra")
+        self.carrito.agregar(self.hamburguesa)
+        otro.agregar(self.hamburguesa)
+
+        realizar_compra(self.usuario.id, self.carrito)
+        with self.assertRaises(CompraRechazada):
+            realizar_compra(self.usuario.id, otro)
+        self.assertEqual(self.stock(self.inventario_pan), 0)
+
+    def test_vista(self):
+        """comprar_ahora usa el servicio y redirige a mis compras"""
+        User.objects.create_user(username="ana", password="clave-segura-123")
+        self.client.login(username="ana", password="clave-segura-123")
+        self.carrito.agregar(self.hamburguesa)
+        respuesta = self.client.post(reverse('core:comprar_ahora'))
+        self.assertRedirects(respuesta, reverse('core:mis_compras'), fetch_redirect_response=False)
+        self.assertEqual(Compra.objects.get().total, 15000)
+
+
+class IdempotenciaCheckoutTest(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(username="ana", password="clave-segura-123")
+        usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        self.carrito = Carrito.objects.create(cliente=Cliente.objects.create(usuario=usuario, nombre="Ana"))
+        self.gaseosa = Producto.objects.create(nombre="Gaseosa", precio=4000)
+        self.client.login(username="ana", password="clave-segura-123")
+
+    def test_reenvio_no_duplica_la_compra(self):
+        """El mismo formulario enviado dos veces crea una sola Compra y repite la respuesta"""
+        self.carrito.agregar(self.gaseosa)
+        primera = self.client.post(reverse('core:comprar_ahora'), {'idempotency_key': 'abc123'})
+        self.carrito.agregar(self.gaseosa)
+        segunda = self.client.post(reverse('core:comprar_ahora'), {'idempotency_key': 'abc123'})
+
+        self.assertEqual(Compra.objects.count(), 1)
+        self.assertEqual(segunda.status_code, primera.status_code)
+        self.assertEqual(segunda['Location'], primera['Location'])
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.carrito.detalles.count(), 1)
+
+        # Otra clave es otra compra
+        self.client.post(reverse('core:comprar_ahora'), HTTP_IDEMPOTENCY_KEY='xyz789')
+        self.assertEqual(Compra.objects.count(), 2)
+
+    def test_clave_en_curso_abandonada(self):
+        """Una reserva sin respuesta da 409 un rato; después otra petición la retoma"""
+        self.carrito.agregar(self.gaseosa)
+        url = reverse('core:comprar_ahora')
+        ambito = f'usuario:{User.objects.get().pk}'
+        ClaveIdempotencia.objects.create(ambito=ambito, clave='k1', ruta=url)
+        self.assertEqual(self.client.post(url, HTTP_IDEMPOTENCY_KEY='k1').status_code, 409)
+        # Una clave en curso de otra ruta es un error del cliente, no "en curso"
+        ClaveIdempotencia.objects.create(ambito=ambito, clave='k2', ruta='/otra/')
+        self.assertEqual(self.client.post(url, HTTP_IDEMPOTENCY_KEY='k2').status_code, 422)
+
+        ClaveIdempotencia.objects.update(fecha_creacion=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.client.post(url, HTTP_IDEMPOTENCY_KEY='k1').status_code, 302)
+        self.assertEqual(Compra.objects.count(), 1)
+        self.assertIsNotNone(ClaveIdempotencia.objects.get(clave='k1').estado_http)
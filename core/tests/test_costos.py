@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from core.models import Ingrediente, MargenProducto, Producto, Receta
+from core.signals import recalculo_agrupado
+
+
+class MargenProductoTest(TestCase):
+
+    def setUp(self):
+        self.pan = Ingrediente.objects.create(nombre="Pan", unidad_medida="unidades", costo_unitario=500)
+        self.carne = Ingrediente.objects.create(nombre="Carne", unidad_medida="gramos", costo_unitario=20)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hamburguesa = Producto.objects.create(nombre="Hamburguesa", precio=15000)
+            Receta.objects.create(producto=self.hamburguesa, ingrediente=self.pan, cantidad_necesaria=1)
+            Receta.objects.create(producto=self.hamburguesa, ingrediente=self.carne, cantidad_necesaria=150)
+
+    def test_costo_y_margen_guardados(self):
+        """La tabla guarda costo y precio - costo"""
+        margen = MargenProducto.objects.get(producto=self.hamburguesa)
+        self.assertEqual(margen.costo_produccion, Decimal('3500'))
+        self.assertEqual(margen.margen, Decimal('11500'))
+        producto = Producto.objects.select_related('margen').get(pk=self.hamburguesa.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(producto.costo_produccion, Decimal('3500'))
+
+    def test_cambios_de_costo_agrupados(self):
+        """Varios ingredientes editados juntos se recalculan en una sola pasada"""
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with recalculo_agrupado():
+                self.pan.costo_unitario = 1000
+                self.pan.save()
+                self.carne.costo_unitario = 30
+                self.carne.save()
+        self.assertEqual(len(callbacks), 1)
+        margen = MargenProducto.objects.get(producto=self.hamburguesa)
+        self.assertEqual(margen.costo_produccion, Decimal('5500'))
+        self.assertEqual(margen.margen, Decimal('9500'))
+
+    def test_reporte_en_admin(self):
+        """El listado de márgenes del admin muestra el porcentaje sobre el precio"""
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        respuesta = self.client.get(reverse('admin:core_margenproducto_changelist'))
+        self.assertContains(respuesta, "76.7%")
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.despacho import despachar, resolver
+from core.models import Cliente, Pedido, Repartidor, Usuario
+
+
+@override_settings(DESPACHO_ESPERA_OTRA_ZONA=600)
+class DespachoTest(TestCase):
+
+    def setUp(self):
+        usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        self.cliente = Cliente.objects.create(usuario=usuario, nombre="Ana")
+
+    def pedido(self, zona, minutos=0, estado='pendiente'):
+        pedido = Pedido.objects.create(cliente=self.cliente, canal='Web', total=1000, zona=zona, estado=estado)
+        Pedido.objects.filter(id=pedido.id).update(fecha_hora=timezone.now() - timedelta(minutes=minutos))
+        return pedido
+
+    def test_resolver_prioriza_zona_y_antiguedad(self):
+        """El más antiguo elige primero; otra zona solo tras la espera máxima"""
+        ahora = timezone.now()
+        pedidos = [
+            (1, 'norte', ahora - timedelta(minutes=20)),
+            (2, 'sur', ahora - timedelta(minutes=5)),
+            (3, 'sur', ahora - timedelta(minutes=1)),
+        ]
+        repartidores = [(10, 'sur'), (11, 'norte'), (12, 'centro')]
+        self.assertEqual(resolver(pedidos, repartidores, ahora, 600), [(1, 11), (2, 10)])
+
+        # Sin repartidor del norte, el pedido de 20 minutos acepta otra zona
+        self.assertEqual(resolver(pedidos[:1], [(12, 'centro')], ahora, 600), [(1, 12)])
+
+    def test_despachar_aplica_en_una_transaccion(self):
+        """El ciclo asigna, ocupa al repartidor y libera a quien ya entregó"""
+        viejo = self.pedido('norte', minutos=10)
+        enviado = self.pedido('norte', estado='enviado')
+        self.pedido('norte', estado='entregado')
+        libre = Repartidor.objects.create(nombre="Luis", zona='norte')
+        entrego = Repartidor.objects.create(nombre="Eva", zona='sur', estado='ocupado', ocupado_por_despacho=True)
+        # Ocupado a mano desde el admin: el despacho no lo libera
+        a_mano = Repartidor.objects.create(nombre="Leo", zona='norte', estado='ocupado')
+        Pedido.objects.filter(estado='entregado').update(repartidor=entrego)
+
+        cifras = despachar()
+        self.assertEqual((cifras['liberados'], cifras['pedidos'], cifras['asignados']), (1, 1, 1))
+        viejo.refresh_from_db()
+        self.assertEqual(viejo.repartidor, libre)
+        self.assertIsNotNone(viejo.fecha_asignacion)
+        self.assertEqual(Repartidor.objects.get(id=libre.id).estado, 'ocupado')
+        enviado.refresh_from_db()
+        self.assertIsNone(enviado.repartidor)
+        self.assertEqual(Repartidor.objects.get(id=a_mano.id).estado, 'ocupado')
+        self.assertEqual(Repartidor.objects.get(id=entrego.id).estado, 'disponible')
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from core.models import Ingrediente, Inventario, Producto, Receta, RestauranteVirtual
+from core.disponibilidad import (
+    anotar_disponibilidad, disponibles_de_restaurante, ids_disponibles, recalcular_existencias,
+)
+
+
+class DisponibilidadTest(TestCase):
+
+    def setUp(self):
+        self.restaurante = RestauranteVirtual.objects.create(nombre="KFC")
+        self.pan = Ingrediente.objects.create(nombre="Pan", unidad_medida="unidades")
+        self.carne = Ingrediente.objects.create(nombre="Carne", unidad_medida="gramos")
+        self.queso = Ingrediente.objects.create(nombre="Queso", unidad_medida="gramos")
+        Inventario.objects.create(ingrediente=self.pan, cantidad_actual=10)
+        Inventario.objects.create(ingrediente=self.carne, cantidad_actual=50)
+        # El queso no tiene inventario: cuenta como stock 0
+
+        self.hamburguesa = Producto.objects.create(nombre="Hamburguesa", precio=15000, restaurante=self.restaurante)
+        Receta.objects.create(producto=self.hamburguesa, ingrediente=self.pan, cantidad_necesaria=1)
+        Receta.objects.create(producto=self.hamburguesa, ingrediente=self.carne, cantidad_necesaria=150)
+
+        self.sandwich = Producto.objects.create(nombre="Sándwich", precio=9000, restaurante=self.restaurante)
+        Receta.objects.create(producto=self.sandwich, ingrediente=self.pan, cantidad_necesaria=2)
+
+        self.gaseosa = Producto.objects.create(nombre="Gaseosa", precio=4000, restaurante=self.restaurante)
+
+        self.quesadilla = Producto.objects.create(nombre="Quesadilla", precio=8000, restaurante=self.restaurante)
+        Receta.objects.create(producto=self.quesadilla, ingrediente=self.queso, cantidad_necesaria=1)
+
+    def test_coincide_con_la_propiedad(self):
+        """El cálculo agregado da lo mismo que Producto.disponible"""
+        esperados = {p.id for p in Producto.objects.all() if p.disponible}
+        self.assertEqual(ids_disponibles(Producto.objects.all()), esperados)
+        self.assertEqual(esperados, {self.sandwich.id, self.gaseosa.id})
+
+    def test_menu_en_una_consulta(self):
+        """La disponibilidad de todo el restaurante cuesta una consulta"""
+        with self.assertNumQueries(1):
+            ids = disponibles_de_restaurante(self.restaurante)
+        self.assertEqual(ids, {self.sandwich.id, self.gaseosa.id})
+
+    def test_propiedad_usa_la_anotacion(self):
+        """Con la anotación cargada, la propiedad no consulta la base de datos"""
+        productos = list(anotar_disponibilidad(Producto.objects.all()))
+        with self.assertNumQueries(0):
+            resultado = {p.id: p.disponible for p in productos}
+        self.assertFalse(resultado[self.hamburguesa.id])
+        self.assertTrue(resultado[self.gaseosa.id])
+
+    def test_filtro_de_la_api(self):
+        """disponible=true|false en el menú de la API separa por las existencias"""
+        cache.clear()
+        recalcular_existencias()
+        url = reverse("core:api_menu_restaurante", args=[self.restaurante.id])
+        ids = lambda valor: {p["id"] for p in self.client.get(url, {"disponible": valor}).json()["productos"]}
+        self.assertEqual(ids("true"), {self.sandwich.id, self.gaseosa.id})
+        self.assertEqual(ids("false"), {self.hamburguesa.id, self.quesadilla.id})
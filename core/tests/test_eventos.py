@@ -0,0 +1,117 @@
+import asyncio
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.eventos import BrokerBase, broker, hub, publicar_cambio
+from core.models import Compra, EventoEstado, Usuario
+
+
+class HubEventosTest(TestCase):
+
+    async def test_reparte_solo_a_sus_canales(self):
+        """Cada suscripción recibe los eventos de sus canales"""
+        ana = hub.suscribir(['usuario:1'])
+        cocina = hub.suscribir(['cocina'])
+        try:
+            publicar_cambio('compra', 7, 'cancelada', 'completada', ['cocina', 'usuario:2'])
+            evento = await asyncio.wait_for(cocina.cola.get(), 1)
+            self.assertEqual((evento['objeto_id'], evento['estado']), (7, 'cancelada'))
+            self.assertTrue(ana.cola.empty())
+        finally:
+            hub.cancelar(ana)
+            hub.cancelar(cocina)
+        self.assertEqual(hub.suscripciones, 0)
+
+    @override_settings(EVENTOS_BROKER='base', EVENTOS_INTERVALO=0.01)
+    async def test_broker_en_base(self):
+        """Con el broker 'base' los eventos viajan por EventoEstado"""
+        suscripcion = hub.suscribir(['usuario:3'])
+        try:
+            broker().iniciar()
+            await asyncio.sleep(0.05)
+            await sync_to_async(publicar_cambio)('compra', 9, 'completada', None, ['usuario:3'])
+            evento = await asyncio.wait_for(suscripcion.cola.get(), 1)
+            self.assertEqual(evento['objeto_id'], 9)
+            self.assertEqual(await EventoEstado.objects.acount(), 1)
+        finally:
+            hub.cancelar(suscripcion)
+        # Sin suscriptores la lectura termina y el broker la olvida
+        await asyncio.sleep(0.05)
+        self.assertNotIn(asyncio.get_running_loop(), broker()._tareas)
+
+    async def test_rearranca_si_se_suscriben_al_salir(self):
+        """Una suscripción que llega mientras la lectura sale no se queda sin eventos"""
+        broker_base = BrokerBase()
+        seguir = asyncio.Event()
+        lecturas = []
+
+        async def leer():
+            # La primera lectura sale como si no hubiera visto suscriptores
+            lecturas.append(1)
+            if len(lecturas) > 1:
+                await seguir.wait()
+
+        suscripcion = hub.suscribir(['cocina'])
+        try:
+            with mock.patch.object(broker_base, '_leer', leer):
+                broker_base.iniciar()
+                await asyncio.sleep(0.01)
+                self.assertEqual(len(lecturas), 2)
+                self.assertFalse(broker_base._tareas[asyncio.get_running_loop()].done())
+                # Ya sin suscriptores, la lectura que termina no se rearranca
+                hub.cancelar(suscripcion)
+                seguir.set()
+                await asyncio.sleep(0.01)
+        finally:
+            hub.cancelar(suscripcion)
+        self.assertEqual((len(lecturas), broker_base._tareas), (2, {}))
+
+    @override_settings(EVENTOS_BROKER='base', EVENTOS_RETENCION=60, EVENTOS_PURGAR_CADA=1)
+    def test_purga_al_publicar(self):
+        """Sin suscriptores, publicar igual borra los eventos vencidos"""
+        publicar_cambio('compra', 1, 'pendiente', None, ['cocina'])
+        EventoEstado.objects.update(fecha=timezone.now() - timedelta(minutes=5))
+        publicar_cambio('compra', 1, 'completada', 'pendiente', ['cocina'])
+        self.assertEqual(list(EventoEstado.objects.values_list('datos__estado', flat=True)), ['completada'])
+
+    def test_senal_publica_al_confirmar(self):
+        """Un cambio de estado de Compra se publica al confirmar, con el estado anterior"""
+        usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        compra = Compra.objects.create(usuario=usuario, total=1000)
+        with mock.patch('core.signals.publicar_cambio') as publicar:
+            with self.captureOnCommitCallbacks(execute=True):
+                compra.estado = 'cancelada'
+                compra.save()
+                compra.save()
+        publicar.assert_called_once_with(
+            'compra', compra.pk, 'cancelada', 'completada', ['cocina', f'usuario:{usuario.pk}']
+        )
+
+
+class VistaEventosTest(TestCase):
+
+    def setUp(self):
+        User.objects.create_user("cocina", password="clave", is_staff=True)
+
+    def test_requiere_asgi(self):
+        """Bajo WSGI el stream no se abre"""
+        self.client.login(username="cocina", password="clave")
+        self.assertEqual(self.client.get(reverse('core:eventos_estado')).status_code, 501)
+
+    async def test_stream_sse(self):
+        """Bajo ASGI devuelve text/event-stream y empieza con la pausa de reconexión"""
+        await self.async_client.alogin(username="cocina", password="clave")
+        respuesta = await self.async_client.get(reverse('core:eventos_estado'))
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        contenido = aiter(respuesta.streaming_content)
+        self.assertTrue((await anext(contenido)).startswith(b'retry:'))
+
+        publicar_cambio('pedido', 4, 'enviado', 'preparacion', ['cocina'])
+        self.assertIn(b'"estado": "enviado"', await anext(contenido))
+        await contenido.aclose()
@@ -0,0 +1,44 @@
+from django.test import TestCase
+from core.models import ExistenciaProducto, Ingrediente, Inventario, Producto, Receta
+
+
+class ExistenciaProductoTest(TestCase):
+
+    def setUp(self):
+        self.pan = Ingrediente.objects.create(nombre="Pan", unidad_medida="unidades")
+        self.carne = Ingrediente.objects.create(nombre="Carne", unidad_medida="gramos")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inventario_pan = Inventario.objects.create(ingrediente=self.pan, cantidad_actual=10)
+            Inventario.objects.create(ingrediente=self.carne, cantidad_actual=500)
+            self.hamburguesa = Producto.objects.create(nombre="Hamburguesa", precio=15000)
+            Receta.objects.create(producto=self.hamburguesa, ingrediente=self.pan, cantidad_necesaria=1)
+            Receta.objects.create(producto=self.hamburguesa, ingrediente=self.carne, cantidad_necesaria=150)
+            self.gaseosa = Producto.objects.create(nombre="Gaseosa", precio=4000)
+
+    def unidades(self, producto):
+        return ExistenciaProducto.objects.get(producto=producto).unidades
+
+    def test_minimo_sobre_la_receta(self):
+        """Las unidades son el mínimo de stock / cantidad necesaria"""
+        self.assertEqual(self.unidades(self.hamburguesa), 3)
+        self.assertIsNone(self.unidades(self.gaseosa))
+
+    def test_cambio_de_inventario_actualiza_la_tabla(self):
+        """Editar un inventario recalcula los productos que lo usan"""
+        self.inventario_pan.cantidad_actual = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inventario_pan.save()
+        self.assertEqual(self.unidades(self.hamburguesa), 2)
+
+        self.inventario_pan.cantidad_actual = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inventario_pan.save()
+        producto = Producto.objects.select_related('existencia').get(pk=self.hamburguesa.pk)
+        self.assertTrue(producto.agotado)
+        self.assertFalse(producto.disponible)
+
+    def test_borrar_producto_no_falla(self):
+        """El borrado en cascada de recetas no vuelve a crear la existencia"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hamburguesa.delete()
+        self.assertFalse(ExistenciaProducto.objects.filter(producto_id=self.hamburguesa.pk).exists())
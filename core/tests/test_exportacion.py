@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import CategoriaMenu, Ingrediente, Inventario, Producto, Receta, RestauranteVirtual
+
+
+@override_settings(TOKENS_SOCIOS={'secreto': 'rappi'})
+class ExportacionCatalogoTest(TestCase):
+
+    def setUp(self):
+        self.restaurante = RestauranteVirtual.objects.create(nombre="Burger House")
+        self.categoria = CategoriaMenu.objects.create(restaurante=self.restaurante, nombre="Hamburguesas")
+        pan = Ingrediente.objects.create(nombre="Pan", unidad_medida="unidades")
+        with self.captureOnCommitCallbacks(execute=True):
+            Inventario.objects.create(ingrediente=pan, cantidad_actual=0)
+            self.hamburguesa = Producto.objects.create(
+                nombre="Hamburguesa", precio=15000, restaurante=self.restaurante, categoria_menu=self.categoria
+            )
+            Receta.objects.create(producto=self.hamburguesa, ingrediente=pan, cantidad_necesaria=1)
+            Producto.objects.create(nombre="Gaseosa", precio=4000, restaurante=self.restaurante)
+        self.url = reverse('core:exportar_catalogo')
+
+    def test_requiere_token(self):
+        """Sin token válido la exportación responde 401"""
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        respuesta = self.client.get(self.url, HTTP_AUTHORIZATION='Token otro')
+        self.assertEqual(respuesta.status_code, 401)
+
+    def test_ndjson_en_streaming(self):
+        """Una línea JSON por producto con restaurante, categoría y disponibilidad"""
+        respuesta = self.client.get(self.url, HTTP_AUTHORIZATION='Token secreto')
+        self.assertTrue(respuesta.streaming)
+        filas = [json.loads(linea) for linea in b''.join(respuesta.streaming_content).decode().splitlines()]
+        self.assertEqual([f['producto'] for f in filas], ["Hamburguesa", "Gaseosa"])
+        self.assertEqual(filas[0]['categoria'], "Hamburguesas")
+        self.assertEqual(filas[0]['restaurante'], "Burger House")
+        self.assertFalse(filas[0]['disponible'])
+        self.assertTrue(filas[1]['disponible'])
+        self.assertIsNone(filas[1]['unidades_disponibles'])
+
+    def test_comando_csv(self):
+        """El comando escribe CSV con encabezado e informa filas por segundo"""
+        salida, errores = io.StringIO(), io.StringIO()
+        call_command('exportar_catalogo', formato='csv', chunk_size=1, stdout=salida, stderr=errores)
+        filas = list(csv.DictReader(io.StringIO(salida.getvalue())))
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[0]['precio'], '15000.00')
+        self.assertIn('filas/s', errores.getvalue())
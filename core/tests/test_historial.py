@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.historial import pagina_de_compras
+from core.models import Compra, ItemCompra, Producto, Usuario
+
+
+class HistorialComprasTest(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        self.gaseosa = Producto.objects.create(nombre="Gaseosa", precio=4000)
+        # Cinco compras en el mismo instante (desempata el id) y dos más viejas
+        ahora = timezone.now()
+        fechas = [ahora] * 5 + [ahora - timedelta(days=1), ahora - timedelta(days=2)]
+        self.compras = []
+        for fecha in fechas:
+            compra = Compra.objects.create(usuario=self.usuario, total=8000)
+            Compra.objects.filter(id=compra.id).update(fecha_compra=fecha)
+            with self.captureOnCommitCallbacks(execute=True):
+                ItemCompra.objects.create(compra=compra, producto=self.gaseosa, cantidad=2, precio_unitario=4000)
+            self.compras.append(compra)
+
+    def test_recorre_todas_sin_repetir(self):
+        """Las páginas siguen (fecha_compra, id) descendente sin saltos ni repetidos"""
+        vistas, cursor = [], None
+        while True:
+            pagina, cursor = pagina_de_compras(self.usuario.id, cursor, limite=3)
+            vistas += [compra.id for compra in pagina]
+            if cursor is None:
+                break
+        esperado = [c.id for c in reversed(self.compras[:5])] + [self.compras[5].id, self.compras[6].id]
+        self.assertEqual(vistas, esperado)
+
+    def test_consultas_constantes(self):
+        """Con ítems: compras, ítems y productos en tres consultas, sin importar el tamaño"""
+        with CaptureQueriesContext(connection) as consultas:
+            pagina, _ = pagina_de_compras(self.usuario.id, limite=5)
+            [item.producto.nombre for compra in pagina for item in compra.items.all()]
+        self.assertEqual(len(consultas), 3)
+
+        with CaptureQueriesContext(connection) as consultas:
+            pagina, _ = pagina_de_compras(self.usuario.id, limite=5, con_items=False)
+            [compra.cantidad_items for compra in pagina]
+        self.assertEqual(len(consultas), 1)
+
+    def test_cantidad_items_se_mantiene(self):
+        """Editar ítems (p. ej. desde el admin) recuenta las unidades al confirmar"""
+        compra = self.compras[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            ItemCompra.objects.create(compra=compra, producto=self.gaseosa, cantidad=3, precio_unitario=4000)
+        compra.refresh_from_db()
+        self.assertEqual(compra.cantidad_items, 5)
+
+    def test_vista_resumen_y_cursor(self):
+        """La vista pagina por cursor y el modo resumen no lee ítems"""
+        User.objects.create_user(username="ana", password="clave-segura-123")
+        self.client.login(username="ana", password="clave-segura-123")
+        with self.settings(COMPRAS_POR_PAGINA=4):
+            respuesta = self.client.get(reverse('core:mis_compras'), {'modo': 'resumen'})
+            self.assertEqual(len(respuesta.context['compras']), 4)
+            siguiente = respuesta.context['siguiente']
+            respuesta = self.client.get(reverse('core:mis_compras'), {'modo': 'resumen', 'cursor': siguiente})
+        self.assertEqual(len(respuesta.context['compras']), 3)
+        self.assertIsNone(respuesta.context['siguiente'])
+        self.assertContains(respuesta, "2 productos")
+        self.assertNotContains(respuesta, 'class="items-list"')
+
+        for cursor in ('basura', '99999999999999999999_1', '0_99999999999999999999'):
+            respuesta = self.client.get(reverse('core:mis_compras'), {'cursor': cursor})
+            self.assertRedirects(respuesta, reverse('core:mis_compras'))
@@ -0,0 +1,76 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import CategoriaMenu, ExistenciaProducto, MargenProducto, Producto, Receta, RestauranteVirtual
+
+CATALOGO = {
+    'restaurantes': [{'nombre': "Burger House", 'color_principal': "#FFAA00"}],
+    'categorias': [{'restaurante': "Burger House", 'nombre': "Hamburguesas", 'orden': 1}],
+    'ingredientes': [
+        {'nombre': "Pan", 'unidad_medida': "unidades", 'costo_unitario': 500},
+        {'nombre': "Carne", 'unidad_medida': "gramos", 'costo_unitario': 20},
+    ],
+    'inventario': [
+        {'ingrediente': "Pan", 'cantidad_actual': 10},
+        {'ingrediente': "Carne", 'cantidad_actual': 450},
+    ],
+    'productos': [
+        {'restaurante': "Burger House", 'categoria': "Hamburguesas", 'nombre': "Clásica", 'precio': "15000"},
+        {'restaurante': "Burger House", 'nombre': "Gaseosa", 'precio': 4000},
+    ],
+    'recetas': [
+        {'restaurante': "Burger House", 'producto': "Clásica", 'ingrediente': "Pan", 'cantidad_necesaria': 1},
+        {'restaurante': "Burger House", 'producto': "Clásica", 'ingrediente': "Carne", 'cantidad_necesaria': 150},
+    ],
+}
+
+
+class ImportarCatalogoTest(TestCase):
+
+    def importar(self, datos, **opciones):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'catalogo.json')
+            with open(ruta, 'w', encoding='utf-8') as archivo:
+                json.dump(datos, archivo)
+            salida = io.StringIO()
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('importar_catalogo', ruta, stdout=salida, **opciones)
+        return salida.getvalue()
+
+    def test_importa_y_recalcula(self):
+        """Crea todo el catálogo y programa existencias y costos como las señales"""
+        self.importar(CATALOGO)
+        clasica = Producto.objects.get(nombre="Clásica")
+        self.assertEqual(clasica.categoria_menu, CategoriaMenu.objects.get(nombre="Hamburguesas"))
+        self.assertEqual(Receta.objects.filter(producto=clasica).count(), 2)
+        self.assertEqual(ExistenciaProducto.objects.get(producto=clasica).unidades, 3)
+        self.assertEqual(MargenProducto.objects.get(producto=clasica).costo_produccion, 3500)
+
+    def test_dry_run_muestra_diferencias_sin_guardar(self):
+        """--dry-run lista los cambios y revierte la transacción"""
+        self.importar(CATALOGO)
+        cambiado = json.loads(json.dumps(CATALOGO))
+        cambiado['productos'][1]['precio'] = 4500
+        salida = self.importar(cambiado, dry_run=True)
+        self.assertIn("~ productos: Burger House / Gaseosa (precio: 4000.00 -> 4500)", salida)
+        self.assertEqual(Producto.objects.get(nombre="Gaseosa").precio, 4000)
+
+        self.importar(cambiado)
+        self.assertEqual(Producto.objects.get(nombre="Gaseosa").precio, 4500)
+        self.assertEqual(RestauranteVirtual.objects.count(), 1)
+        self.assertEqual(Producto.objects.count(), 2)
+
+    def test_referencia_desconocida(self):
+        """Un ingrediente inexistente aborta la importación completa"""
+        datos = dict(CATALOGO, recetas=[
+            {'restaurante': "Burger House", 'producto': "Clásica", 'ingrediente': "Queso", 'cantidad_necesaria': 1},
+        ])
+        with self.assertRaisesMessage(CommandError, "ingrediente desconocido 'Queso'"):
+            self.importar(datos)
+        self.assertFalse(Producto.objects.exists())
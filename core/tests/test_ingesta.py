@@ -0,0 +1,99 @@
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.cache_catalogo import version_precios
+from core.disponibilidad import recalcular_existencias
+from core.models import Cliente, DetallePedido, Pedido, Producto, RestauranteVirtual, Usuario
+
+
+@override_settings(TOKENS_SOCIOS={'secreto': 'rappi', 'kiosco': 'kiosco'})
+class IngestaPedidosTest(TestCase):
+
+    def setUp(self):
+        restaurante = RestauranteVirtual.objects.create(nombre="Burger House")
+        cerrado = RestauranteVirtual.objects.create(nombre="Cerrado", activo=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hamburguesa = Producto.objects.create(nombre="Hamburguesa", precio=15000, restaurante=restaurante)
+            self.gaseosa = Producto.objects.create(nombre="Gaseosa", precio=4000, restaurante=restaurante)
+            self.oculto = Producto.objects.create(nombre="Oculto", precio=1000, restaurante=cerrado)
+        usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        self.cliente = Cliente.objects.create(usuario=usuario, nombre="Ana")
+        self.url = reverse('core:api_ingesta_pedidos')
+
+    def enviar(self, pedidos, token='secreto', **extra):
+        return self.client.post(
+            self.url, json.dumps({'pedidos': pedidos}), content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {token}', **extra
+        )
+
+    def pedido(self, **cambios):
+        return {
+            'referencia': 'R-1',
+            'cliente_id': self.cliente.id,
+            'items': [{'producto_id': self.hamburguesa.id, 'cantidad': 2},
+                      {'producto_id': self.gaseosa.id, 'cantidad': 1, 'precio_unitario': '4000.00'}],
+            **cambios,
+        }
+
+    def test_requiere_token(self):
+        """Sin token de socio la ingesta responde 401; un canal ajeno a Pedido, 403"""
+        respuesta = self.client.post(self.url, '{}', content_type='application/json')
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertEqual(self.enviar([], token='kiosco').status_code, 403)
+
+    def test_crea_lote_con_resultado_por_pedido(self):
+        """Los pedidos válidos se crean con el canal del token; los inválidos se informan"""
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.enviar([
+                self.pedido(),
+                self.pedido(referencia='R-2', zona='Norte'),
+                self.pedido(referencia='R-3', items=[{'producto_id': self.oculto.id}]),
+                self.pedido(referencia='R-4', cliente_id=999),
+            ])
+        datos = respuesta.json()
+        self.assertEqual((datos['creados'], datos['rechazados'], datos['success']), (2, 2, False))
+        self.assertEqual([r['ok'] for r in datos['resultados']], [True, True, False, False])
+        self.assertIn("no existe o no está disponible", datos['resultados'][2]['error'])
+
+        pedido = Pedido.objects.get(id=datos['resultados'][1]['pedido_id'])
+        self.assertEqual((pedido.canal, pedido.zona, pedido.total), ('Rappi', 'Norte', 34000))
+        self.assertEqual(DetallePedido.objects.filter(pedido__in=Pedido.objects.all()).count(), 4)
+
+    def test_precio_desactualizado(self):
+        """Un precio distinto del vigente rechaza el pedido; la foto se renueva al cambiar el producto"""
+        item = {'producto_id': self.gaseosa.id, 'precio_unitario': 4500}
+        respuesta = self.enviar([self.pedido(items=[item])])
+        self.assertIn("cambió (vigente: 4000", respuesta.json()['resultados'][0]['error'])
+
+        self.gaseosa.precio = 4500
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gaseosa.save()
+        self.assertTrue(self.enviar([self.pedido(items=[item], total='4500')]).json()['success'])
+
+    def test_foto_sobrevive_a_las_ventas(self):
+        """Recalcular existencias (cada venta) invalida menús pero no la foto de precios"""
+        version = version_precios()
+        recalcular_existencias()
+        self.assertEqual(version_precios(), version)
+
+    def test_personal_indica_canal(self):
+        """El personal usa su sesión y elige el canal de cada pedido"""
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+        respuesta = self.client.post(
+            self.url, json.dumps({'pedidos': [self.pedido(canal='telefono'), self.pedido()]}),
+            content_type='application/json'
+        )
+        resultados = respuesta.json()['resultados']
+        self.assertEqual(Pedido.objects.get(id=resultados[0]['pedido_id']).canal, 'Telefono')
+        self.assertIn("Canal inválido", resultados[1]['error'])
+
+    def test_repeticion_idempotente(self):
+        """Reenviar el lote con la misma clave no duplica pedidos"""
+        primera = self.enviar([self.pedido()], HTTP_IDEMPOTENCY_KEY='lote-1')
+        segunda = self.enviar([self.pedido()], HTTP_IDEMPOTENCY_KEY='lote-1')
+        self.assertEqual(primera.content, segunda.content)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(Pedido.objects.count(), 1)
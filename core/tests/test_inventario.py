@@ -0,0 +1,95 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.compras import realizar_compra
+from core.inventario import compactar_libro, conciliar_inventario, registrar_movimientos, stock_segun_libro
+from core.models import (
+    Carrito, Cliente, Ingrediente, Inventario, MovimientoInventario, Producto, Receta, SaldoInventario, Usuario,
+)
+
+
+class LibroInventarioTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.pan = Ingrediente.objects.create(nombre="Pan", unidad_medida="unidades")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inventario = Inventario.objects.create(ingrediente=self.pan, cantidad_actual=10)
+
+    def stock(self):
+        self.inventario.refresh_from_db()
+        return self.inventario.cantidad_actual
+
+    def test_creacion_y_edicion_quedan_en_el_libro(self):
+        """Crear o guardar un Inventario con otra cantidad deja un ajuste"""
+        self.inventario.cantidad_actual = 7
+        self.inventario.save()
+        self.assertEqual(
+            list(MovimientoInventario.objects.order_by('id').values_list('tipo', 'cantidad')),
+            [('ajuste', Decimal('10')), ('ajuste', Decimal('-3'))],
+        )
+        self.assertEqual(stock_segun_libro([self.pan.id]), {self.pan.id: Decimal('7')})
+
+    def test_movimientos_se_suman_sin_pisarse(self):
+        """Cada movimiento suma su diferencia al stock actual"""
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_movimientos({self.pan.id: Decimal('5')}, 'compra', 'factura 12')
+            registrar_movimientos({self.pan.id: Decimal('-2')}, 'merma')
+        self.assertEqual(self.stock(), 13)
+        self.assertEqual(stock_segun_libro()[self.pan.id], 13)
+
+    def test_compra_registra_ventas(self):
+        """El checkout anota una salida por ingrediente con la compra como referencia"""
+        producto = Producto.objects.create(nombre="Sándwich", precio=8000)
+        Receta.objects.create(producto=producto, ingrediente=self.pan, cantidad_necesaria=2)
+        usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        carrito = Carrito.objects.create(cliente=Cliente.objects.create(usuario=usuario, nombre="Ana"))
+        carrito.agregar(producto, 3)
+
+        compra = realizar_compra(usuario.id, carrito)
+        venta = MovimientoInventario.objects.get(tipo='venta')
+        self.assertEqual((venta.cantidad, venta.referencia), (Decimal('-6'), f'compra:{compra.id}'))
+        self.assertEqual(stock_segun_libro()[self.pan.id], self.stock())
+
+    def test_compactacion(self):
+        """Compactar mueve los movimientos viejos al saldo sin cambiar el stock"""
+        registrar_movimientos({self.pan.id: Decimal('5')}, 'compra')
+        MovimientoInventario.objects.update(fecha=timezone.now() - timedelta(days=30))
+        registrar_movimientos({self.pan.id: Decimal('-1')}, 'venta')
+
+        self.assertEqual(compactar_libro(timezone.now() - timedelta(days=7), purgar=True), (1, 2))
+        saldo = SaldoInventario.objects.get(ingrediente=self.pan)
+        self.assertEqual(saldo.cantidad, 15)
+        self.assertEqual(MovimientoInventario.objects.count(), 1)
+        self.assertEqual(stock_segun_libro()[self.pan.id], 14)
+
+    def test_conciliar(self):
+        """Si cantidad_actual se desvía del libro, conciliar lo corrige"""
+        Inventario.objects.update(cantidad_actual=99)
+        self.assertEqual(conciliar_inventario(), [self.pan.id])
+        self.assertEqual(self.stock(), 10)
+
+    def test_admin_aplica_diferencia(self):
+        """Editar la cantidad en el admin aplica la diferencia, no el valor leído"""
+        User.objects.create_superuser("admin", "admin@example.com", "clave")
+        self.client.login(username="admin", password="clave")
+        url = reverse('admin:core_inventario_change', args=[self.inventario.pk])
+        self.assertContains(self.client.get(url), 'name="initial-cantidad_actual" value="10.00"')
+        # Mientras el formulario está abierto se venden 4 unidades
+        registrar_movimientos({self.pan.id: Decimal('-4')}, 'venta')
+
+        datos = {
+            'ingrediente': self.pan.pk, 'cantidad_actual': '12', 'initial-cantidad_actual': '10', 'stock_minimo': '0',
+            'proveedor': '', 'fecha_caducidad': '',
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(url, datos)
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(self.stock(), 8)
+        self.assertEqual(MovimientoInventario.objects.filter(tipo='ajuste', referencia='admin:admin').get().cantidad, 2)
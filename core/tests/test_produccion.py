@@ -0,0 +1,64 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import (
+    Cliente, Compra, DetallePedido, Ingrediente, Inventario, ItemCompra, Pedido, Producto, Receta, Usuario,
+)
+from core.produccion import plan_de_produccion
+
+
+class PlanProduccionTest(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        self.cliente = Cliente.objects.create(usuario=self.usuario, nombre="Ana")
+        self.pan = Ingrediente.objects.create(nombre="Pan", unidad_medida="unidades")
+        self.carne = Ingrediente.objects.create(nombre="Carne", unidad_medida="gramos")
+        Inventario.objects.create(ingrediente=self.pan, cantidad_actual=4)
+        Inventario.objects.create(ingrediente=self.carne, cantidad_actual=10000)
+        self.hamburguesa = Producto.objects.create(nombre="Hamburguesa", precio=15000)
+        Receta.objects.create(producto=self.hamburguesa, ingrediente=self.pan, cantidad_necesaria=1)
+        Receta.objects.create(producto=self.hamburguesa, ingrediente=self.carne, cantidad_necesaria=150)
+
+        self.ahora = timezone.localtime().replace(minute=30, second=0, microsecond=0)
+        self.pedido(3, self.ahora - timedelta(hours=1))
+        self.pedido(2, self.ahora)
+        self.pedido(5, self.ahora, estado='entregado')
+        compra = Compra.objects.create(usuario=self.usuario, total=15000)
+        ItemCompra.objects.create(compra=compra, producto=self.hamburguesa, cantidad=1, precio_unitario=15000)
+
+    def pedido(self, cantidad, fecha, estado='pendiente'):
+        pedido = Pedido.objects.create(cliente=self.cliente, canal='Web', total=0, estado=estado)
+        Pedido.objects.filter(id=pedido.id).update(fecha_hora=fecha)
+        DetallePedido.objects.create(
+            pedido=pedido, producto=self.hamburguesa, cantidad=cantidad, precio_unitario=15000, subtotal=0
+        )
+
+    def test_matriz_por_franja_y_faltantes(self):
+        """Pedidos abiertos y compras recientes se agrupan por hora; solo los pedidos cuentan contra el stock"""
+        plan = plan_de_produccion(horas_compras=3)
+        hora = self.ahora.replace(minute=0)
+        self.assertEqual(plan['franjas'], [hora - timedelta(hours=1), hora])
+        self.assertEqual(plan['preparacion'][0]['por_franja'], [3, 3])
+
+        pan, carne = plan['ingredientes']
+        self.assertEqual(pan['nombre'], "Pan")
+        self.assertEqual(pan['por_franja'], [Decimal('3'), Decimal('3')])
+        self.assertEqual(pan['faltante'], Decimal('1'))
+        self.assertEqual(pan['se_agota_en'], hora)
+        self.assertEqual(carne['total'], Decimal('900'))
+        self.assertEqual(carne['faltante'], 0)
+
+    def test_api_solo_staff(self):
+        """El endpoint de cocina exige staff y devuelve JSON"""
+        url = reverse('core:api_plan_produccion')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        User.objects.create_user("cocina", password="clave", is_staff=True)
+        self.client.login(username="cocina", password="clave")
+        datos = self.client.get(url).json()
+        self.assertEqual(datos['ingredientes'][0]['faltante'], 1.0)
@@ -0,0 +1,105 @@
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.compras import CompraRechazada, realizar_compra
+from core.disponibilidad import calcular_unidades, ids_disponibles
+from core.models import Carrito, CarritoDetalle, Cliente, Ingrediente, Inventario, Producto, Receta, Reserva, Usuario
+from core.reservas import ReservaRechazada, liberar_reservas_vencidas, renovar_reservas
+
+
+@override_settings(RESERVAS_TTL=900)
+class ReservasTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.pan = Ingrediente.objects.create(nombre="Pan", unidad_medida="unidades")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.inventario = Inventario.objects.create(ingrediente=self.pan, cantidad_actual=3)
+            self.sandwich = Producto.objects.create(nombre="Sándwich", precio=8000)
+            Receta.objects.create(producto=self.sandwich, ingrediente=self.pan, cantidad_necesaria=1)
+        self.ana, self.carrito_ana = self.crear_cliente("ana")
+        self.beto, self.carrito_beto = self.crear_cliente("beto")
+
+    def crear_cliente(self, nombre):
+        usuario = Usuario.objects.create(nombre_usuario=nombre, email=f"{nombre}@example.com", password_hash="x")
+        cliente = Cliente.objects.create(usuario=usuario, nombre=nombre)
+        return usuario, Carrito.objects.create(cliente=cliente)
+
+    def agregar(self, carrito, cantidad):
+        carrito.agregar(self.sandwich, cantidad)
+        with self.captureOnCommitCallbacks(execute=True):
+            renovar_reservas(carrito)
+
+    def test_reserva_sigue_la_demanda_del_carrito(self):
+        """La reserva iguala la demanda de ingredientes y se borra al vaciar el carrito"""
+        self.agregar(self.carrito_ana, 2)
+        self.assertEqual(Reserva.objects.get(carrito=self.carrito_ana).cantidad, 2)
+        self.carrito_ana.vaciar()
+        renovar_reservas(self.carrito_ana)
+        self.assertFalse(Reserva.objects.exists())
+
+    def test_disponibilidad_descuenta_reservas_ajenas(self):
+        """Lo reservado por otro carrito no está disponible, lo propio sí"""
+        self.agregar(self.carrito_ana, 3)
+        self.assertEqual(ids_disponibles([self.sandwich.id], self.carrito_beto), set())
+        self.assertEqual(ids_disponibles([self.sandwich.id], self.carrito_ana), {self.sandwich.id})
+        self.assertEqual(calcular_unidades([self.sandwich.id]), {self.sandwich.id: 0})
+
+    def test_no_reserva_mas_que_el_stock_libre(self):
+        """Un carrito no puede apartar más de lo que otros dejaron libre; el cambio se revierte"""
+        self.agregar(self.carrito_ana, 2)
+        with self.assertRaises(ReservaRechazada):
+            self.agregar(self.carrito_beto, 2)
+        # Bajar la propia reserva siempre se puede, aunque el stock haya caído
+        Inventario.objects.update(cantidad_actual=0)
+        self.carrito_ana.cambiar_cantidad(self.carrito_ana.detalles.get().id, 1)
+        renovar_reservas(self.carrito_ana)
+        self.assertEqual(Reserva.objects.get().cantidad, 1)
+
+    def test_api_rechaza_sobrerreserva(self):
+        """Pedir 100000 unidades por la API no aparta todo el ingrediente"""
+        self.agregar(self.carrito_ana, 1)
+        url = reverse('core:api_actualizar_carrito')
+        cuerpo = lambda cantidad: json.dumps({'items': [{'producto': self.sandwich.id, 'cantidad': cantidad}]})
+        respuesta = self.client.post(url, cuerpo(100000), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn("Pan", respuesta.json()['error'])
+        self.assertEqual(Reserva.objects.count(), 1)
+        self.assertEqual(CarritoDetalle.objects.exclude(carrito=self.carrito_ana).count(), 0)
+
+        self.assertEqual(self.client.post(url, cuerpo(2), content_type='application/json').json()['cantidad_total'], 2)
+
+    def test_compra_respeta_y_consume_reservas(self):
+        """Una compra no toma lo reservado por otros y consume sus propias reservas"""
+        self.agregar(self.carrito_ana, 2)
+        self.carrito_beto.agregar(self.sandwich, 2)
+        with self.assertRaises(CompraRechazada):
+            realizar_compra(self.beto.id, self.carrito_beto)
+
+        realizar_compra(self.ana.id, self.carrito_ana)
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad_actual, 1)
+        self.assertFalse(Reserva.objects.exists())
+
+    def test_reservas_vencidas_no_cuentan_y_se_liberan(self):
+        """Al vencer, la reserva deja de descontarse y el barrido la borra"""
+        self.agregar(self.carrito_ana, 3)
+        Reserva.objects.update(vence=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(ids_disponibles([self.sandwich.id], self.carrito_beto), {self.sandwich.id})
+
+        self.assertEqual(liberar_reservas_vencidas(lote=1), 1)
+        self.assertFalse(Reserva.objects.exists())
+        self.sandwich.existencia.refresh_from_db()
+        self.assertEqual(self.sandwich.existencia.unidades, 3)
+
+    @override_settings(RESERVAS_TTL=0)
+    def test_desactivadas(self):
+        """Con RESERVAS_TTL = 0 no se crean reservas"""
+        self.agregar(self.carrito_ana, 3)
+        self.assertFalse(Reserva.objects.exists())
+        self.assertEqual(ids_disponibles([self.sandwich.id], self.carrito_beto), {self.sandwich.id})
@@ -0,0 +1,100 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.compras import realizar_compra
+from core.models import Carrito, Cliente, Producto, Tarea, Usuario
+from core.tareas import ejecutar, encolar, procesar_lote, reclamar, tarea
+
+llamadas = []
+
+
+@tarea(nombre='pruebas.anotar', max_intentos=2)
+def anotar(valor, falla=False):
+    if falla:
+        raise RuntimeError("falla de prueba")
+    llamadas.append(valor)
+
+
+@override_settings(TAREAS_BACKOFF_BASE=10, TAREAS_BACKOFF_MAXIMO=60, TAREAS_VISIBILIDAD=300)
+class ColaDeTareasTest(TestCase):
+
+    def setUp(self):
+        llamadas.clear()
+
+    def test_ejecuta_y_completa(self):
+        """Una tarea encolada se reclama, se ejecuta y queda completada"""
+        encolar(anotar, 'hola')
+        self.assertEqual(procesar_lote('prueba'), (1, 0))
+        self.assertEqual(llamadas, ['hola'])
+        self.assertEqual(Tarea.objects.get().estado, 'completada')
+
+    def test_reclamo_exclusivo(self):
+        """Una tarea reclamada queda oculta para otros trabajadores hasta vencer su visibilidad"""
+        encolar(anotar, 1)
+        self.assertEqual(len(reclamar('a')), 1)
+        self.assertEqual(reclamar('b'), [])
+
+        # Si el trabajador murió, tras el tiempo de visibilidad vuelve a estar disponible
+        Tarea.objects.update(disponible_desde=timezone.now() - timedelta(seconds=1))
+        reclamada, = reclamar('b')
+        self.assertEqual((reclamada.trabajador, reclamada.intentos), ('b', 2))
+
+        # Murió también en el último intento: no se reclama más y queda fallida
+        Tarea.objects.update(disponible_desde=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(reclamar('c'), [])
+        self.assertEqual(Tarea.objects.get().estado, 'fallida')
+
+    def test_reintentos_con_backoff(self):
+        """Un fallo reprograma la tarea con backoff hasta agotar los intentos"""
+        encolar(anotar, 1, falla=True)
+        tarea_obj, = reclamar('a')
+        antes = timezone.now()
+        self.assertFalse(ejecutar(tarea_obj))
+        tarea_obj.refresh_from_db()
+        self.assertEqual(tarea_obj.estado, 'pendiente')
+        self.assertGreaterEqual(tarea_obj.disponible_desde, antes + timedelta(seconds=10))
+        self.assertIn("falla de prueba", tarea_obj.ultimo_error)
+
+        Tarea.objects.update(disponible_desde=timezone.now())
+        tarea_obj, = reclamar('a')
+        self.assertFalse(ejecutar(tarea_obj))
+        tarea_obj.refresh_from_db()
+        self.assertEqual(tarea_obj.estado, 'fallida')
+
+
+
+class ComandoProcesarTareasTest(TransactionTestCase):
+    """Los hilos del trabajador usan su propia conexión: necesitan datos confirmados"""
+
+    def test_comando_una_vez(self):
+        """procesar_tareas --una-vez vacía la cola entre varios hilos y termina"""
+        llamadas.clear()
+        for valor in range(6):
+            encolar(anotar, valor)
+        call_command('procesar_tareas', '--una-vez', '--trabajadores=3', '--lote=2', stdout=StringIO())
+        self.assertEqual(sorted(llamadas), list(range(6)))
+        self.assertFalse(Tarea.objects.exclude(estado='completada').exists())
+
+
+class ComprobanteCompraTest(TestCase):
+
+    def test_compra_encola_comprobante(self):
+        """La compra encola el correo en vez de enviarlo durante la petición"""
+        usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        carrito = Carrito.objects.create(cliente=Cliente.objects.create(usuario=usuario, nombre="Ana"))
+        carrito.agregar(Producto.objects.create(nombre="Gaseosa", precio=4000), 2)
+
+        compra = realizar_compra(usuario.id, carrito)
+        self.assertEqual(len(mail.outbox), 0)
+        tarea_obj = Tarea.objects.get()
+        self.assertEqual(tarea_obj.argumentos, {'args': [compra.id], 'kwargs': {}})
+
+        procesar_lote('prueba')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["ana@example.com"])
+        self.assertIn("2 x Gaseosa", mail.outbox[0].body)
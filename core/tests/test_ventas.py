@@ -0,0 +1,111 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.compras import realizar_compra
+from core.ingesta import ingerir_pedidos
+from core.models import (
+    Carrito, Cliente, Compra, DetallePedido, Pedido, Producto, RestauranteVirtual, Usuario, VentaDiaria, VentaDiariaProducto,
+)
+
+
+class VentasDiariasTest(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(nombre_usuario="ana", email="ana@example.com", password_hash="x")
+        self.cliente = Cliente.objects.create(usuario=self.usuario, nombre="Ana")
+        self.restaurante = RestauranteVirtual.objects.create(nombre="Burger House")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hamburguesa = Producto.objects.create(nombre="Hamburguesa", precio=15000, restaurante=self.restaurante)
+            self.gaseosa = Producto.objects.create(nombre="Gaseosa", precio=4000)
+
+    def comprar(self, *lineas):
+        carrito, _ = Carrito.objects.get_or_create(cliente=self.cliente)
+        for producto, cantidad in lineas:
+            carrito.agregar(producto, cantidad)
+        with self.captureOnCommitCallbacks(execute=True):
+            return realizar_compra(self.usuario.id, carrito)
+
+    def fila(self, producto):
+        return VentaDiariaProducto.objects.values_list('restaurante_id', 'unidades', 'ingresos').get(producto=producto)
+
+    def test_compras_y_pedidos_suman_al_confirmar(self):
+        """Cada compra o pedido confirmado acumula en las tablas del día"""
+        self.comprar((self.hamburguesa, 2), (self.gaseosa, 1))
+        self.comprar((self.gaseosa, 3))
+        with self.captureOnCommitCallbacks(execute=True):
+            ingerir_pedidos([{'cliente_id': self.cliente.id, 'items': [{'producto_id': self.hamburguesa.id}]}], 'Rappi')
+
+        self.assertEqual(self.fila(self.hamburguesa), (self.restaurante.id, 3, 45000))
+        self.assertEqual(self.fila(self.gaseosa), (None, 4, 16000))
+        dia = VentaDiaria.objects.get(fecha=timezone.localdate())
+        self.assertEqual((dia.compras, dia.pedidos, dia.unidades, dia.ingresos), (2, 1, 7, 61000))
+        self.assertEqual(dia.ticket_promedio, Decimal('20333.33'))
+
+    def test_cancelar_resta(self):
+        """Cancelar una compra la descuenta; reactivarla la vuelve a sumar"""
+        compra = self.comprar((self.gaseosa, 2))
+        compra.estado = 'cancelada'
+        with self.captureOnCommitCallbacks(execute=True):
+            compra.save()
+        self.assertEqual(self.fila(self.gaseosa)[1:], (0, 0))
+        self.assertEqual(VentaDiaria.objects.get().compras, 0)
+
+        compra.estado = 'completada'
+        with self.captureOnCommitCallbacks(execute=True):
+            compra.save()
+        self.assertEqual(self.fila(self.gaseosa)[1:], (2, 8000))
+
+    def test_lineas_de_pedido_despues_del_ticket(self):
+        """Un pedido creado sin ítems cuenta las líneas que recibe, editadas o borradas, después"""
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido = Pedido.objects.create(cliente=self.cliente, canal='Web', total=19000)
+        with self.captureOnCommitCallbacks(execute=True):
+            linea = DetallePedido.objects.create(
+                pedido=pedido, producto=self.hamburguesa, cantidad=1, precio_unitario=15000, subtotal=15000
+            )
+            DetallePedido.objects.create(
+                pedido=pedido, producto=self.gaseosa, cantidad=1, precio_unitario=4000, subtotal=4000
+            )
+        linea.cantidad, linea.subtotal = 2, 30000
+        with self.captureOnCommitCallbacks(execute=True):
+            linea.save()
+        self.assertEqual(self.fila(self.hamburguesa), (self.restaurante.id, 2, 30000))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DetallePedido.objects.get(producto=self.gaseosa).delete()
+        self.assertEqual(self.fila(self.gaseosa)[1:], (0, 0))
+        dia = VentaDiaria.objects.get()
+        self.assertEqual((dia.pedidos, dia.unidades, dia.ingresos), (1, 2, 19000))
+
+    def test_reconstruir_por_lotes(self):
+        """El comando recalcula desde el origen, por día local y en lotes"""
+        compra = self.comprar((self.hamburguesa, 1))
+        ayer = timezone.now() - timedelta(days=1)
+        Compra.objects.filter(id=compra.id).update(fecha_compra=ayer)
+        with self.captureOnCommitCallbacks(execute=True):
+            Pedido.objects.create(cliente=self.cliente, canal='Web', total=0)
+        VentaDiariaProducto.objects.update(unidades=99)
+
+        call_command('reconstruir_ventas', '--dias-por-lote=1', stdout=StringIO())
+        self.assertEqual(
+            list(VentaDiaria.objects.order_by('fecha').values_list('fecha', 'compras', 'pedidos', 'ingresos')),
+            [(timezone.localdate(ayer), 1, 0, 15000), (timezone.localdate(), 0, 1, 0)],
+        )
+        self.assertEqual(self.fila(self.hamburguesa), (self.restaurante.id, 1, 15000))
+
+    def test_reporte_lee_resumenes(self):
+        """El reporte del personal agrega por restaurante y producto"""
+        self.comprar((self.hamburguesa, 2), (self.gaseosa, 1))
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+        datos = self.client.get(reverse('core:api_reporte_ventas')).json()
+        self.assertEqual(datos['dias'][0]['ingresos'], 34000)
+        self.assertEqual([r['nombre'] for r in datos['restaurantes']], ["Burger House", "Sin asignar"])
+        self.assertEqual(datos['productos'][0]['nombre'], "Hamburguesa")
+        self.assertEqual(self.client.get(reverse('core:api_reporte_ventas'), {'desde': 'ayer'}).status_code, 400)
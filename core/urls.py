@@ -8,6 +8,7 @@ urlpatterns = [
     path("", views.index, name="index"),
     path("restaurante/<int:restaurante_id>/", views.menu_restaurante, name="menu_restaurante"),
     path("producto/<int:producto_id>/", views.detalle_producto, name="detalle_producto"),
+    path("buscar/", views.buscar_productos, name="buscar_productos"),
     
     # Carrito
     path("carrito/", views.ver_carrito, name="ver_carrito"),
@@ -15,6 +16,7 @@ urlpatterns = [
     path("carrito/actualizar/<int:item_id>/", views.actualizar_carrito, name="actualizar_carrito"),
     path("carrito/eliminar/<int:item_id>/", views.eliminar_del_carrito, name="eliminar_del_carrito"),
     path("carrito/limpiar/", views.limpiar_carrito, name="limpiar_carrito"),
+    path("carrito/api/actualizar/", views.api_actualizar_carrito, name="api_actualizar_carrito"),
     
     # Compras
     path("comprar/", views.comprar_ahora, name="comprar_ahora"),
@@ -34,4 +36,10 @@ urlpatterns = [
     # ✅ NUEVAS APIs JSON
     path('api/restaurantes/', views.api_restaurantes, name='api_restaurantes'),
     path('api/restaurante/<int:restaurante_id>/', views.api_menu_restaurante, name='api_menu_restaurante'),
+    path('api/buscar/', views.api_buscar, name='api_buscar'),
+    path('api/catalogo/exportar/', views.exportar_catalogo, name='exportar_catalogo'),
+    path('api/socios/pedidos/', views.api_ingesta_pedidos, name='api_ingesta_pedidos'),
+    path('api/cocina/plan/', views.api_plan_produccion, name='api_plan_produccion'),
+    path('api/reportes/ventas/', views.api_reporte_ventas, name='api_reporte_ventas'),
+    path('api/eventos/', views.eventos_estado, name='eventos_estado'),
 ]
\ No newline at end of file
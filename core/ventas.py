@@ -0,0 +1,170 @@
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Compra, DetallePedido, ItemCompra, Pedido, Producto, VentaDiaria, VentaDiariaProducto
+
+# ============================
+# VENTAS DIARIAS (TABLAS RESUMEN)
+# ============================
+# VentaDiariaProducto (día × producto, con su restaurante) y VentaDiaria
+# (totales del día) responden los reportes sin recorrer ItemCompra ni
+# DetallePedido. Cada compra confirmada suma sus ítems con un INSERT ...
+# ON CONFLICT DO UPDATE que acumula (ver core/signals.py); una compra
+# cancelada resta lo mismo. Un pedido suma su ticket al crearse y cada
+# DetallePedido suma (o resta, al editarlo o borrarlo) su línea por su
+# cuenta, así un pedido que recibe los ítems después de creado también
+# cuenta sus unidades. El día es la fecha local (TIME_ZONE).
+#
+# No se siguen los borrados de compras y pedidos, las ediciones de ítems
+# de compras ni los cambios del total de un pedido ya creado:
+# reconstruir_ventas() (manage.py reconstruir_ventas) recalcula un rango
+# de fechas desde las tablas de origen, por lotes de días. Conviene
+# correrlo con poco tráfico: una venta confirmada durante el lote podría
+# contarse dos veces.
+
+SQL_SUMAR_PRODUCTO = '''
+    INSERT INTO {tabla} (fecha, producto_id, restaurante_id, unidades, ingresos)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (fecha, producto_id) DO UPDATE SET
+        restaurante_id = excluded.restaurante_id,
+        unidades = {tabla}.unidades + excluded.unidades,
+        ingresos = {tabla}.ingresos + excluded.ingresos
+'''
+
+SQL_SUMAR_DIA = '''
+    INSERT INTO {tabla} (fecha, compras, pedidos, unidades, ingresos)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (fecha) DO UPDATE SET
+        compras = {tabla}.compras + excluded.compras,
+        pedidos = {tabla}.pedidos + excluded.pedidos,
+        unidades = {tabla}.unidades + excluded.unidades,
+        ingresos = {tabla}.ingresos + excluded.ingresos
+'''
+
+
+def _dia(por_dia, fecha_hora):
+    return por_dia.setdefault(
+        timezone.localdate(fecha_hora), {'compras': 0, 'pedidos': 0, 'unidades': 0, 'ingresos': 0}
+    )
+
+
+def _acumular(por_producto, por_dia, lineas, tickets, origen):
+    """Agrupa por fecha local las líneas (fecha_hora, producto, restaurante,
+    cantidad, importe) y los tickets (fecha_hora, total) de un origen"""
+    for fecha_hora, producto_id, restaurante_id, cantidad, importe in lineas:
+        fila = por_producto.setdefault((timezone.localdate(fecha_hora), producto_id), [restaurante_id, 0, 0])
+        fila[1] += cantidad
+        fila[2] += importe
+        _dia(por_dia, fecha_hora)['unidades'] += cantidad
+    for fecha_hora, total in tickets:
+        dia = _dia(por_dia, fecha_hora)
+        dia[origen] += 1
+        dia['ingresos'] += total
+
+
+def sumar_ventas(compras=None, pedidos=None, signo=1, lineas_de_pedidos=True):
+    """Suma (o resta, con signo=-1) a las tablas resumen las compras y
+    pedidos de los querysets dados. Devuelve cuántas filas tocó.
+
+    Con lineas_de_pedidos=False de los pedidos solo se suma el ticket.
+    """
+    por_producto, por_dia = {}, {}
+    if compras is not None:
+        lineas = ItemCompra.objects.filter(compra__in=compras).values_list(
+            'compra__fecha_compra', 'producto_id', 'producto__restaurante_id', 'cantidad', 'precio_unitario'
+        )
+        _acumular(
+            por_producto, por_dia,
+            ((fecha, producto, restaurante, cantidad, cantidad * precio)
+             for fecha, producto, restaurante, cantidad, precio in lineas),
+            compras.values_list('fecha_compra', 'total'), 'compras',
+        )
+    if pedidos is not None:
+        lineas = DetallePedido.objects.filter(pedido__in=pedidos).values_list(
+            'pedido__fecha_hora', 'producto_id', 'producto__restaurante_id', 'cantidad', 'subtotal'
+        ) if lineas_de_pedidos else ()
+        _acumular(por_producto, por_dia, lineas, pedidos.values_list('fecha_hora', 'total'), 'pedidos')
+    return _escribir(por_producto, por_dia, signo)
+
+
+def _escribir(por_producto, por_dia, signo=1):
+    """Acumula en las tablas resumen lo agrupado por _acumular()"""
+    if not por_dia:
+        return 0
+
+    fecha_sql = connection.ops.adapt_datefield_value
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(SQL_SUMAR_PRODUCTO.format(tabla=VentaDiariaProducto._meta.db_table), [
+            (fecha_sql(fecha), producto_id, restaurante_id, signo * unidades, signo * ingresos)
+            for (fecha, producto_id), (restaurante_id, unidades, ingresos) in por_producto.items()
+        ])
+        cursor.executemany(SQL_SUMAR_DIA.format(tabla=VentaDiaria._meta.db_table), [
+            (fecha_sql(fecha), *(signo * d[campo] for campo in ('compras', 'pedidos', 'unidades', 'ingresos')))
+            for fecha, d in por_dia.items()
+        ])
+    return len(por_producto) + len(por_dia)
+
+
+# Para al_confirmar (core/signals.py): reciben ids
+def sumar_compras(compra_ids):
+    sumar_ventas(compras=Compra.objects.filter(id__in=compra_ids))
+
+
+def restar_compras(compra_ids):
+    sumar_ventas(compras=Compra.objects.filter(id__in=compra_ids), signo=-1)
+
+
+def sumar_pedidos(pedido_ids):
+    sumar_ventas(pedidos=Pedido.objects.filter(id__in=pedido_ids))
+
+
+def sumar_tickets_de_pedidos(pedido_ids):
+    sumar_ventas(pedidos=Pedido.objects.filter(id__in=pedido_ids), lineas_de_pedidos=False)
+
+
+def sumar_lineas_de_pedidos(lineas):
+    """Suma líneas (pedido_id, producto_id, cantidad, subtotal) sin sus
+    tickets; con cantidad y subtotal negativos, resta. Se ignoran las de
+    pedidos o productos ya borrados (esos borrados no se siguen)."""
+    fechas = dict(Pedido.objects.filter(id__in={linea[0] for linea in lineas}).values_list('id', 'fecha_hora'))
+    restaurantes = dict(
+        Producto.objects.filter(id__in={linea[1] for linea in lineas}).values_list('id', 'restaurante_id')
+    )
+    por_producto, por_dia = {}, {}
+    _acumular(por_producto, por_dia, (
+        (fechas[pedido_id], producto_id, restaurantes[producto_id], cantidad, subtotal)
+        for pedido_id, producto_id, cantidad, subtotal in lineas
+        if pedido_id in fechas and producto_id in restaurantes
+    ), (), 'pedidos')
+    return _escribir(por_producto, por_dia)
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def reconstruir_ventas(desde, hasta, dias_por_lote=7):
+    """Recalcula las tablas resumen de `desde` a `hasta` (fechas, inclusive).
+
+    Cada lote de días es una transacción: borra sus filas y vuelve a sumar
+    compras (no canceladas) y pedidos desde el origen. Devuelve los días
+    recorridos.
+    """
+    dias = 0
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(inicio + timedelta(days=dias_por_lote - 1), hasta)
+        rango = (_inicio_del_dia(inicio), _inicio_del_dia(fin + timedelta(days=1)))
+        with transaction.atomic():
+            VentaDiariaProducto.objects.filter(fecha__range=(inicio, fin)).delete()
+            VentaDiaria.objects.filter(fecha__range=(inicio, fin)).delete()
+            sumar_ventas(
+                compras=Compra.objects.filter(fecha_compra__gte=rango[0], fecha_compra__lt=rango[1])
+                .exclude(estado='cancelada'),
+                pedidos=Pedido.objects.filter(fecha_hora__gte=rango[0], fecha_hora__lt=rango[1]),
+            )
+        dias += (fin - inicio).days + 1
+        inicio = fin + timedelta(days=1)
+    return dias
@@ -1,54 +1,98 @@
+from asgiref.sync import sync_to_async
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.models import User
-from .models import Producto, RestauranteVirtual, CategoriaMenu, Carrito, CarritoDetalle, Cliente, Usuario, Compra, ItemCompra
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from .models import Producto, RestauranteVirtual, CategoriaMenu, Cliente, Usuario, Compra, VentaDiaria, VentaDiariaProducto
+from .disponibilidad import con_existencias, ids_disponibles, producto_disponible
+from .cache_catalogo import fecha_version, obtener_cacheado, version_catalogo, version_menu
+from .busqueda import buscar
+from .carrito import aplicar_cantidades
+from .compras import CompraRechazada, realizar_compra
+from .historial import pagina_de_compras
+from .reservas import ReservaRechazada, renovar_reservas
+from .idempotencia import idempotente
+from .eventos import stream_de_eventos
+from .exportacion import FORMATOS, exportar
+from .produccion import plan_de_produccion
+from .middleware import PerfilCliente
+from .socios import csrf_salvo_token, token_socio_requerido
+from .ingesta import PedidoRechazado, canal_de, ingerir_pedidos
 import json
+import uuid
 
 # ============================
 # VISTAS PRINCIPALES
 # ============================
 
 def index(request):
-    restaurantes = RestauranteVirtual.objects.filter(activo=True).order_by('orden')
+    restaurantes = obtener_cacheado(
+        'catalogo:restaurantes',
+        version_catalogo(),
+        lambda: list(RestauranteVirtual.objects.filter(activo=True).order_by('orden'))
+    )
     context = {
         'restaurantes': restaurantes,
     }
     return render(request, "index.html", context)
 
-def menu_restaurante(request, restaurante_id):
+def construir_contexto_menu(restaurante_id):
+    """Arma los datos del menú de un restaurante (lo que se guarda en caché)"""
     restaurante = get_object_or_404(RestauranteVirtual, id=restaurante_id, activo=True)
-    categorias = CategoriaMenu.objects.filter(restaurante=restaurante).order_by('orden')
+    categorias = list(CategoriaMenu.objects.filter(restaurante=restaurante).order_by('orden'))
     
-    # CORREGIDO: Ya no usamos stock_actual, usamos la propiedad 'disponible'
-    productos = Producto.objects.filter(
-        restaurante=restaurante,
-        activo=True
+    # Disponibilidad leída de la tabla materializada de existencias
+    productos = con_existencias(
+        Producto.objects.filter(restaurante=restaurante, activo=True)
+        .select_related('categoria_menu', 'existencia')
     )
     
     # Filtrar productos destacados que estén disponibles
-    productos_destacados = [p for p in productos if p.destacado and p.disponible][:6]
+    productos_destacados = [p for p in productos if p.destacado][:6]
+    
+    # Agrupar en memoria para no repetir la consulta por cada categoría
+    productos_por_id_categoria = {}
+    for producto in productos:
+        productos_por_id_categoria.setdefault(producto.categoria_menu_id, []).append(producto)
     
     productos_por_categoria = {}
     for categoria in categorias:
-        productos_categoria = productos.filter(categoria_menu=categoria)
-        # Filtrar solo los disponibles
-        productos_disponibles = [p for p in productos_categoria if p.disponible]
+        productos_disponibles = productos_por_id_categoria.get(categoria.id)
         if productos_disponibles:
             productos_por_categoria[categoria] = productos_disponibles
     
-    context = {
+    return {
         'restaurante': restaurante,
         'categorias': categorias,
         'productos_destacados': productos_destacados,
         'productos_por_categoria': productos_por_categoria,
     }
+
+def menu_restaurante(request, restaurante_id):
+    context = obtener_cacheado(
+        f'menu:contexto:{restaurante_id}',
+        version_menu(restaurante_id),
+        lambda: construir_contexto_menu(restaurante_id)
+    )
     return render(request, "menu_restaurante.html", context)
 
 def detalle_producto(request, producto_id):
-    producto = get_object_or_404(Producto, id=producto_id)
+    producto = get_object_or_404(
+        Producto.objects.select_related('restaurante', 'categoria_menu', 'existencia'),
+        id=producto_id
+    )
     
     # CORREGIDO: Filtrar productos relacionados que estén disponibles
     productos_relacionados = Producto.objects.filter(
@@ -56,8 +100,8 @@ def detalle_producto(request, producto_id):
         activo=True
     ).exclude(id=producto.id)
     
-    # Filtrar solo los disponibles
-    productos_relacionados_disponibles = [p for p in productos_relacionados if p.disponible][:4]
+    # Filtrar solo los disponibles (en la misma consulta)
+    productos_relacionados_disponibles = con_existencias(productos_relacionados)[:4]
     
     context = {
         'producto': producto,
@@ -66,49 +110,62 @@ def detalle_producto(request, producto_id):
     return render(request, "detalle_producto.html", context)
 
 # ============================
-# VISTAS DEL CARRITO (ACTUALIZADAS)
+# BÚSQUEDA DE PRODUCTOS
 # ============================
 
-def obtener_o_crear_carrito(request):
-    """Obtiene o crea un carrito para el usuario o sesión"""
+def _entero_o_none(valor):
     try:
-        # Para usuarios autenticados
-        if request.user.is_authenticated:
-            try:
-                usuario = Usuario.objects.get(nombre_usuario=request.user.username)
-                cliente, created = Cliente.objects.get_or_create(
-                    usuario=usuario,
-                    defaults={'nombre': usuario.nombre_usuario}
-                )
-                
-                # Buscar carrito activo existente
-                carrito = Carrito.objects.filter(cliente=cliente, activo=True).first()
-                if carrito:
-                    return carrito
-                else:
-                    return Carrito.objects.create(cliente=cliente, activo=True)
-                    
-            except (Usuario.DoesNotExist, Cliente.DoesNotExist):
-                pass
-        
-        # Para usuarios no autenticados - USAR SESIÓN
-        if not request.session.session_key:
-            request.session.create()
-        
-        session_key = request.session.session_key
-        carrito = Carrito.objects.filter(session_key=session_key, activo=True).first()
-        
-        if carrito:
-            return carrito
-        else:
-            return Carrito.objects.create(session_key=session_key, activo=True)
-            
-    except Exception as e:
-        print(f"Error en obtener_o_crear_carrito: {e}")
-        # Crear carrito de emergencia
-        if not request.session.session_key:
-            request.session.create()
-        return Carrito.objects.create(session_key=request.session.session_key, activo=True)
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+def _parametros_busqueda(request):
+    limite = _entero_o_none(request.GET.get('limite')) or 20
+    return {
+        'texto': request.GET.get('q', '').strip(),
+        'restaurante_id': _entero_o_none(request.GET.get('restaurante')),
+        'categoria_id': _entero_o_none(request.GET.get('categoria')),
+        'limite': min(max(limite, 1), 100),
+        'desplazamiento': max(_entero_o_none(request.GET.get('desde')) or 0, 0),
+    }
+
+def buscar_productos(request):
+    """Página de resultados de búsqueda en todos los restaurantes"""
+    parametros = _parametros_busqueda(request)
+    context = {
+        'q': parametros['texto'],
+        'restaurante_id': parametros['restaurante_id'],
+        'categoria_id': parametros['categoria_id'],
+        'busqueda': buscar(**parametros),
+    }
+    return render(request, "buscar.html", context)
+
+def api_buscar(request):
+    """Búsqueda JSON: ?q=texto&restaurante=id&categoria=id&limite=n&desde=n"""
+    parametros = _parametros_busqueda(request)
+    busqueda = buscar(**parametros)
+    return JsonResponse({
+        'q': parametros['texto'],
+        'total': busqueda['total'],
+        'resultados': [
+            {
+                'id': p.id,
+                'nombre': p.nombre,
+                'precio': float(p.precio),
+                'descripcion': p.descripcion,
+                'restaurante': p.restaurante.nombre if p.restaurante else None,
+                'restaurante_id': p.restaurante_id,
+                'categoria': p.categoria_menu.nombre if p.categoria_menu else None,
+                'categoria_id': p.categoria_menu_id,
+            }
+            for p in busqueda['resultados']
+        ],
+        'facetas': busqueda['facetas'],
+    })
+
+# ============================
+# VISTAS DEL CARRITO (ACTUALIZADAS)
+# ============================
 
 def agregar_al_carrito(request, producto_id):
     """Agrega un producto al carrito real - VERSIÓN ACTUALIZADA"""
@@ -119,8 +176,10 @@ def agregar_al_carrito(request, producto_id):
             producto = get_object_or_404(Producto, id=producto_id)
             print(f"📦 Producto encontrado: {producto.nombre}")
             
-            # CORREGIDO: Usar propiedad 'disponible' en lugar de stock_actual
-            if not producto.disponible:
+            carrito = request.perfil.carrito
+            
+            # Lo reservado por otros carritos no cuenta como disponible
+            if not producto_disponible(producto, carrito):
                 print("❌ Producto no disponible")
                 if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                     return JsonResponse({
@@ -130,31 +189,16 @@ def agregar_al_carrito(request, producto_id):
                 messages.error(request, f'❌ {producto.nombre} no está disponible')
                 return redirect('core:detalle_producto', producto_id=producto_id)
             
-            carrito = obtener_o_crear_carrito(request)
-            print(f"🛒 Carrito obtenido: ID={carrito.id}, Cliente={carrito.cliente}, Session={carrito.session_key}")
-            
-            # Usar get_or_create para evitar duplicados
-            item, created = CarritoDetalle.objects.get_or_create(
-                carrito=carrito,
-                producto=producto,
-                defaults={
-                    'precio_unitario': producto.precio, 
-                    'cantidad': 1
-                }
-            )
-            
-            if not created:
-                item.cantidad += 1
-                # CORREGIDO: No podemos verificar stock exacto sin lógica más compleja
-                # Por ahora permitimos agregar, pero en la compra se verificará
-                item.save()
-                print(f"📈 Producto actualizado: {producto.nombre} x {item.cantidad}")
-            else:
-                print(f"✅ Producto creado: {producto.nombre} x 1")
-            
-            # VERIFICAR que se guardó
-            items_count = carrito.detalles.count()
-            print(f"📊 Carrito ahora tiene: {items_count} items")
+            # El stock exacto se verifica en la compra; la reserva, aquí
+            try:
+                with transaction.atomic():
+                    carrito.agregar(producto)
+                    renovar_reservas(carrito)
+            except ReservaRechazada as e:
+                if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                    return JsonResponse({'success': False, 'error': str(e)})
+                messages.error(request, str(e))
+                return redirect('core:detalle_producto', producto_id=producto_id)
             
             mensaje = f'✅ {producto.nombre} agregado al carrito'
             
@@ -179,12 +223,14 @@ def agregar_al_carrito(request, producto_id):
 
 def ver_carrito(request):
     """Muestra el contenido del carrito"""
-    carrito = obtener_o_crear_carrito(request)
-    items = carrito.detalles.select_related('producto').all()
+    carrito = request.perfil.carrito
+    items = carrito.items()
     
     context = {
         'carrito': carrito,
         'items': items,
+        # Un reenvío del mismo formulario de pago no repite la compra
+        'clave_idempotencia': uuid.uuid4().hex,
     }
     return render(request, 'carrito.html', context)
 
@@ -192,23 +238,30 @@ def actualizar_carrito(request, item_id):
     """Actualiza la cantidad de un item en el carrito"""
     if request.method == 'POST':
         try:
-            carrito = obtener_o_crear_carrito(request)
-            item = get_object_or_404(CarritoDetalle, id=item_id, carrito=carrito)
+            carrito = request.perfil.carrito
+            item = carrito.item(item_id)
+            if item is None:
+                raise Http404("Item no encontrado")
             nueva_cantidad = int(request.POST.get('cantidad', 1))
             
             if nueva_cantidad > 0:
                 # CORREGIDO: Verificar disponibilidad en lugar de stock
                 # Nota: Esta verificación es básica, podrías hacerla más precisa
-                if item.producto.disponible:
-                    item.cantidad = nueva_cantidad
-                    item.save()
+                if producto_disponible(item.producto, carrito):
+                    # Si la reserva no alcanza se revierte también el cambio de cantidad
+                    with transaction.atomic():
+                        carrito.cambiar_cantidad(item_id, nueva_cantidad)
+                        renovar_reservas(carrito)
                     messages.success(request, 'Carrito actualizado')
                 else:
                     messages.error(request, f'{item.producto.nombre} ya no está disponible')
             else:
-                item.delete()
+                carrito.quitar(item_id)
+                renovar_reservas(carrito)
                 messages.success(request, 'Producto eliminado del carrito')
                 
+        except ReservaRechazada as e:
+            messages.error(request, str(e))
         except Exception as e:
             messages.error(request, 'Error al actualizar el carrito')
     
@@ -218,10 +271,13 @@ def eliminar_del_carrito(request, item_id):
     """Elimina un item del carrito"""
     if request.method == 'POST':
         try:
-            carrito = obtener_o_crear_carrito(request)
-            item = get_object_or_404(CarritoDetalle, id=item_id, carrito=carrito)
+            carrito = request.perfil.carrito
+            item = carrito.item(item_id)
+            if item is None:
+                raise Http404("Item no encontrado")
             producto_nombre = item.producto.nombre
-            item.delete()
+            carrito.quitar(item_id)
+            renovar_reservas(carrito)
             messages.success(request, f'❌ {producto_nombre} eliminado del carrito')
         except Exception as e:
             messages.error(request, 'Error al eliminar el producto')
@@ -232,119 +288,118 @@ def limpiar_carrito(request):
     """Limpia todo el carrito"""
     if request.method == 'POST':
         try:
-            carrito = obtener_o_crear_carrito(request)
-            carrito.detalles.all().delete()
+            carrito = request.perfil.carrito
+            carrito.vaciar()
+            renovar_reservas(carrito)
             messages.success(request, '🛒 Carrito vaciado')
         except Exception as e:
             messages.error(request, 'Error al limpiar el carrito')
     
     return redirect('core:ver_carrito')
 
+@require_POST
+def api_actualizar_carrito(request):
+    """Aplica varios cambios de cantidad en una transacción y devuelve los totales.
+
+    Cuerpo JSON: {"items": [{"producto": id, "cantidad": n}, ...]}; cantidad 0 quita.
+    """
+    try:
+        cambios = json.loads(request.body)['items']
+        cantidades = {int(c['producto']): int(c['cantidad']) for c in cambios}
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Formato inválido'}, status=400)
+    if any(cantidad < 0 for cantidad in cantidades.values()):
+        return JsonResponse({'success': False, 'error': 'Las cantidades no pueden ser negativas'}, status=400)
+    
+    productos = Producto.objects.in_bulk(list(cantidades))
+    faltantes = [producto_id for producto_id in cantidades if producto_id not in productos]
+    if faltantes:
+        return JsonResponse({'success': False, 'error': f'Productos inexistentes: {faltantes}'}, status=400)
+    carrito = request.perfil.carrito
+    a_agregar = [producto_id for producto_id, cantidad in cantidades.items() if cantidad > 0]
+    no_disponibles = set(a_agregar) - ids_disponibles(a_agregar, carrito)
+    if no_disponibles:
+        nombres = ', '.join(productos[producto_id].nombre for producto_id in no_disponibles)
+        return JsonResponse({'success': False, 'error': f'No disponibles: {nombres}'}, status=400)
+    
+    try:
+        with transaction.atomic():
+            aplicar_cantidades(
+                carrito, {productos[producto_id]: cantidad for producto_id, cantidad in cantidades.items()}
+            )
+            renovar_reservas(carrito)
+    except ReservaRechazada as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({
+        'success': True,
+        'cantidad_total': carrito.cantidad_total,
+        'total': float(carrito.total),
+        'items': [
+            {'producto': item.producto.id, 'cantidad': item.cantidad, 'subtotal': float(item.subtotal)}
+            for item in carrito.items()
+        ],
+    })
+
 # ============================
 # VISTAS DE COMPRAS (ACTUALIZADAS)
 # ============================
 
 @login_required
+@idempotente
 def comprar_ahora(request):
-    """Procesa la compra desde el carrito real - VERSIÓN ACTUALIZADA"""
+    """Procesa la compra del carrito en una transacción (ver core/compras.py)"""
     if request.method == 'POST':
+        if request.perfil.usuario_id is None:
+            messages.error(request, "Usuario no encontrado")
+            return redirect('core:ver_carrito')
+        
         try:
-            carrito = obtener_o_crear_carrito(request)
-            items_carrito = carrito.detalles.select_related('producto').all()
-            
-            print(f"🛒 Carrito antes de comprar: {items_carrito.count()} items")
-            
-            if not items_carrito.exists():
-                messages.error(request, "Tu carrito está vacío")
-                return redirect('core:ver_carrito')
-            
-            # Obtener el usuario actual
-            try:
-                usuario = Usuario.objects.get(nombre_usuario=request.user.username)
-            except Usuario.DoesNotExist:
-                messages.error(request, "Usuario no encontrado")
-                return redirect('core:ver_carrito')
-            
-            # Crear la compra agrupada
-            compra = Compra.objects.create(
-                usuario=usuario,
-                total=0  # Se calculará después
-            )
-            
-            total_compra = 0
-            productos_comprados = []
-            
-            # Transferir items del carrito a la compra
-            for item_carrito in items_carrito:
-                # CORREGIDO: Verificar disponibilidad en lugar de stock
-                if not item_carrito.producto.disponible:
-                    messages.warning(request, f"Producto no disponible: {item_carrito.producto.nombre}")
-                    continue
-                
-                # Crear item de compra
-                item_compra = ItemCompra.objects.create(
-                    compra=compra,
-                    producto=item_carrito.producto,
-                    cantidad=item_carrito.cantidad,
-                    precio_unitario=item_carrito.precio_unitario
-                )
-                
-                # CORREGIDO: Ya no actualizamos stock del producto directamente
-                # La lógica de inventario se maneja a nivel de ingredientes
-                
-                total_compra += item_compra.subtotal
-                productos_comprados.append(item_carrito.producto.nombre)
-                
-                print(f"✅ Producto comprado: {item_carrito.producto.nombre} x {item_carrito.cantidad}")
-            
-            # Actualizar total de la compra
-            compra.total = total_compra
-            compra.save()
-            
-            # Limpiar el carrito
-            carrito.detalles.all().delete()
-            
-            if productos_comprados:
-                messages.success(request, f"¡Compra realizada exitosamente! Productos: {', '.join(productos_comprados)} - Total: ${total_compra}")
-                print(f"🎉 Compra completada: ${total_compra}")
-                return redirect('core:mis_compras')
-            else:
-                compra.delete()
-                messages.error(request, "No se pudo procesar la compra - productos no disponibles")
-                return redirect('core:ver_carrito')
-                
-        except Exception as e:
-            print(f"🔥 Error en comprar_ahora: {str(e)}")
-            messages.error(request, f"Error al procesar la compra: {str(e)}")
+            compra = realizar_compra(request.perfil.usuario_id, request.perfil.carrito)
+        except CompraRechazada as e:
+            messages.error(request, str(e))
             return redirect('core:ver_carrito')
+        
+        messages.success(request, f"¡Compra realizada exitosamente! Total: ${compra.total}")
+        return redirect('core:mis_compras')
     
     # Si no es POST, redirigir al carrito
     return redirect('core:ver_carrito')
 
 @login_required
 def mis_compras(request):
-    """Muestra todas las compras agrupadas del usuario"""
-    try:
-        usuario = Usuario.objects.get(nombre_usuario=request.user.username)
-        compras = Compra.objects.filter(usuario=usuario).order_by('-fecha_compra')
-    except Usuario.DoesNotExist:
-        compras = Compra.objects.none()
+    """Historial de compras del usuario, paginado por cursor.
+
+    ?cursor=... continúa desde la última compra vista; ?modo=resumen lista
+    solo totales y unidades, sin cargar los ítems.
+    """
+    resumen = request.GET.get('modo') == 'resumen'
+    compras, siguiente = [], None
+    if request.perfil.usuario_id is not None:
+        try:
+            compras, siguiente = pagina_de_compras(
+                request.perfil.usuario_id, request.GET.get('cursor'),
+                settings.COMPRAS_POR_PAGINA, con_items=not resumen,
+            )
+        except ValueError:
+            return redirect('core:mis_compras')
+    else:
         messages.error(request, "Usuario no encontrado")
     
     context = {
         'compras': compras,
+        'siguiente': siguiente,
+        'resumen': resumen,
+        'es_primera_pagina': 'cursor' not in request.GET,
     }
     return render(request, 'mis_compras.html', context)
 
 @login_required
 def detalle_compra(request, compra_id):
     """Muestra el detalle de una compra específica"""
-    try:
-        usuario = Usuario.objects.get(nombre_usuario=request.user.username)
-        compra = get_object_or_404(Compra, id=compra_id, usuario=usuario)
-    except Usuario.DoesNotExist:
+    if request.perfil.usuario_id is None:
         messages.error(request, "Usuario no encontrado")
         return redirect('core:mis_compras')
+    compra = get_object_or_404(Compra, id=compra_id, usuario_id=request.perfil.usuario_id)
     
     context = {
         'compra': compra,
@@ -468,11 +523,27 @@ def menu_negocio_view(request, negocio):
         "negocio": negocio,
         "productos": productos
     })
-    # En tu views.py - agregar estas vistas
-from django.http import JsonResponse
-from django.core import serializers
-from .models import RestauranteVirtual, Producto
 
+# ============================
+# APIs JSON DEL CATÁLOGO (GET CONDICIONAL)
+# ============================
+# El ETag y Last-Modified salen de la versión del catálogo en caché, así que
+# un If-None-Match vigente se responde con 304 sin consultar la base.
+
+def _etag_catalogo(request):
+    return str(version_catalogo())
+
+def _modificado_catalogo(request):
+    return fecha_version(version_catalogo())
+
+def _etag_menu(request, restaurante_id):
+    return str(version_menu(restaurante_id))
+
+def _modificado_menu(request, restaurante_id):
+    return fecha_version(version_menu(restaurante_id))
+
+@cache_control(public=True, max_age=settings.API_CATALOGO_MAX_AGE)
+@condition(etag_func=_etag_catalogo, last_modified_func=_modificado_catalogo)
 def api_restaurantes(request):
     restaurantes = RestauranteVirtual.objects.all()
     data = {
@@ -481,26 +552,283 @@ def api_restaurantes(request):
                 'id': r.id,
                 'nombre': r.nombre,
                 'descripcion': r.descripcion,
-                'costo_envio': float(r.costo_envio),
-                'imagen': r.imagen.url if r.imagen else ''
+                'color_principal': r.color_principal,
+                'activo': r.activo,
+                'imagen': r.logo.url if r.logo else ''
             }
             for r in restaurantes
         ]
     }
     return JsonResponse(data)
 
+@cache_control(public=True, max_age=settings.API_CATALOGO_MAX_AGE)
+@condition(etag_func=_etag_menu, last_modified_func=_modificado_menu)
 def api_menu_restaurante(request, restaurante_id):
-    productos = Producto.objects.filter(restaurante_id=restaurante_id)
+    """Menú paginado por cursor: ?cursor=<último id>&limite=n&fields=a,b
+    &activo=true|false|todos&categoria_menu=id&disponible=true|false"""
+    try:
+        consulta = parametros_menu_api(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    productos = Producto.objects.filter(restaurante_id=restaurante_id, id__gt=consulta['cursor'])
+    if consulta['activo'] is not None:
+        productos = productos.filter(activo=consulta['activo'])
+    if consulta['categoria_menu'] is not None:
+        productos = productos.filter(categoria_menu_id=consulta['categoria_menu'])
+    if consulta['disponible'] is not None:
+        # Por el JOIN con existencia de la propia página (sin subconsulta sobre todo el catálogo)
+        if consulta['disponible']:
+            productos = con_existencias(productos)
+        else:
+            productos = productos.filter(existencia__unidades__lt=1)
+    
+    campos = consulta['fields']
+    columnas = {CAMPOS_MENU_API[campo] for campo in campos}
+    productos = productos.only(*columnas).order_by('id')
+    if 'unidades_disponibles' in campos:
+        productos = productos.select_related('existencia')
+    
+    # Se pide uno de más para saber si hay otra página sin contar el total
+    pagina = list(productos[:consulta['limite'] + 1])
+    hay_mas = len(pagina) > consulta['limite']
+    pagina = pagina[:consulta['limite']]
+    
     data = {
-        'productos': [
+        'productos': [serializar_producto_api(p, campos) for p in pagina],
+        'siguiente': pagina[-1].id if hay_mas else None,
+        'limite': consulta['limite'],
+    }
+    return JsonResponse(data)
+
+# Campo público de la API -> columna que hay que cargar
+CAMPOS_MENU_API = {
+    'id': 'id',
+    'nombre': 'nombre',
+    'precio': 'precio',
+    'descripcion': 'descripcion',
+    'imagen': 'imagen',
+    'categoria_menu': 'categoria_menu',
+    'destacado': 'destacado',
+    'activo': 'activo',
+    'unidades_disponibles': 'existencia__unidades',
+}
+CAMPOS_MENU_API_POR_DEFECTO = ['id', 'nombre', 'precio', 'descripcion', 'imagen', 'unidades_disponibles']
+LIMITE_MENU_API = 50
+LIMITE_MENU_API_MAXIMO = 200
+
+def _booleano_api(valor, nombre):
+    if valor is None:
+        return None
+    valor = valor.lower()
+    if valor in ('1', 'true', 'si', 'sí'):
+        return True
+    if valor in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"'{nombre}' debe ser true o false")
+
+def parametros_menu_api(params):
+    """Valida los parámetros de api_menu_restaurante (ValueError si son inválidos)"""
+    try:
+        cursor = int(params.get('cursor', 0))
+        limite = int(params.get('limite', LIMITE_MENU_API))
+        categoria_menu = params.get('categoria_menu')
+        categoria_menu = int(categoria_menu) if categoria_menu else None
+    except ValueError:
+        raise ValueError("'cursor', 'limite' y 'categoria_menu' deben ser números enteros")
+    
+    fields = params.get('fields')
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else CAMPOS_MENU_API_POR_DEFECTO
+    desconocidos = [f for f in fields if f not in CAMPOS_MENU_API]
+    if desconocidos:
+        raise ValueError(f"Campos desconocidos: {', '.join(desconocidos)}")
+    
+    activo = params.get('activo', 'true')
+    return {
+        'cursor': max(cursor, 0),
+        'limite': min(max(limite, 1), LIMITE_MENU_API_MAXIMO),
+        'fields': ['id'] + [f for f in fields if f != 'id'],
+        'activo': None if activo == 'todos' else _booleano_api(activo, 'activo'),
+        'categoria_menu': categoria_menu,
+        'disponible': _booleano_api(params.get('disponible'), 'disponible'),
+    }
+
+def serializar_producto_api(producto, campos):
+    data = {}
+    for campo in campos:
+        if campo == 'precio':
+            data[campo] = float(producto.precio)
+        elif campo == 'imagen':
+            data[campo] = producto.imagen.url if producto.imagen else ''
+        elif campo == 'categoria_menu':
+            data[campo] = producto.categoria_menu_id
+        else:
+            data[campo] = getattr(producto, campo)
+    return data
+
+# ============================
+# EXPORTACIÓN DEL CATÁLOGO PARA SOCIOS
+# ============================
+
+@token_socio_requerido
+def exportar_catalogo(request):
+    """Catálogo completo en streaming: ?formato=ndjson (por defecto) o csv"""
+    formato = request.GET.get('formato', 'ndjson')
+    if formato not in FORMATOS:
+        return JsonResponse({'error': f"Formato no soportado: {formato}"}, status=400)
+    
+    response = StreamingHttpResponse(exportar(formato), content_type=f'{FORMATOS[formato]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="catalogo.{formato}"'
+    return response
+
+
+# ============================
+# INGESTA DE PEDIDOS DE SOCIOS
+# ============================
+
+@csrf_salvo_token
+@require_POST
+@token_socio_requerido
+@idempotente
+def api_ingesta_pedidos(request):
+    """Crea un lote de pedidos: {"pedidos": [{"cliente_id", "items": [...]}, ...]}
+
+    Responde un resultado por pedido; los inválidos no impiden crear el resto.
+    """
+    canal = None
+    if request.canal_socio is not None:
+        canal = canal_de(request.canal_socio)
+        if canal is None:
+            return JsonResponse({'success': False, 'error': 'El canal del token no admite pedidos'}, status=403)
+    try:
+        pedidos = json.loads(request.body)['pedidos']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': "Se esperaba JSON con la lista 'pedidos'"}, status=400)
+    if not isinstance(pedidos, list):
+        return JsonResponse({'success': False, 'error': "'pedidos' debe ser una lista"}, status=400)
+
+    try:
+        resultados = ingerir_pedidos(pedidos, canal)
+    except PedidoRechazado as error:
+        return JsonResponse({'success': False, 'error': str(error)}, status=400)
+    creados = sum(resultado['ok'] for resultado in resultados)
+    return JsonResponse({
+        'success': creados == len(resultados),
+        'creados': creados,
+        'rechazados': len(resultados) - creados,
+        'resultados': resultados,
+    })
+
+
+# ============================
+# PLAN DE PRODUCCIÓN (PANTALLA DE COCINA)
+# ============================
+
+@staff_member_required
+def api_plan_produccion(request):
+    """Lista de preparación y faltantes por ingrediente y franja horaria (JSON)"""
+    try:
+        horas = float(request.GET['horas']) if 'horas' in request.GET else None
+    except ValueError:
+        return JsonResponse({'error': "Parámetro 'horas' inválido"}, status=400)
+    plan = plan_de_produccion(horas)
+    return JsonResponse({
+        'franjas': [franja.isoformat() for franja in plan['franjas']],
+        'preparacion': plan['preparacion'],
+        'ingredientes': [
             {
-                'id': p.id,
-                'nombre': p.nombre,
-                'precio': float(p.precio),
-                'descripcion': p.descripcion,
-                'imagen': p.imagen.url if p.imagen else ''
+                **fila,
+                'stock': float(fila['stock']),
+                'total': float(fila['total']),
+                'faltante': float(fila['faltante']),
+                'por_franja': [float(cantidad) for cantidad in fila['por_franja']],
+                'se_agota_en': fila['se_agota_en'] and fila['se_agota_en'].isoformat(),
             }
-            for p in productos
-        ]
-    }
-    return JsonResponse(data)
\ No newline at end of file
+            for fila in plan['ingredientes']
+        ],
+    })
+
+
+# ============================
+# REPORTE DE VENTAS (TABLAS RESUMEN)
+# ============================
+
+@staff_member_required
+def api_reporte_ventas(request):
+    """Ventas por día, restaurante y producto entre ?desde y ?hasta (AAAA-MM-DD).
+
+    Lee solo VentaDiaria y VentaDiariaProducto (ver core/ventas.py).
+    """
+    hoy = timezone.localdate()
+    try:
+        hasta = date.fromisoformat(request.GET['hasta']) if 'hasta' in request.GET else hoy
+        desde = date.fromisoformat(request.GET['desde']) if 'desde' in request.GET else hasta - timedelta(days=29)
+    except ValueError:
+        return JsonResponse({'error': "'desde' y 'hasta' deben tener formato AAAA-MM-DD"}, status=400)
+
+    dias = VentaDiaria.objects.filter(fecha__range=(desde, hasta)).order_by('fecha')
+    productos = VentaDiariaProducto.objects.filter(fecha__range=(desde, hasta))
+    por_restaurante = (
+        productos.values('restaurante_id', 'restaurante__nombre')
+        .annotate(unidades=Sum('unidades'), ingresos=Sum('ingresos')).order_by('-ingresos')
+    )
+    mas_vendidos = (
+        productos.values('producto_id', 'producto__nombre')
+        .annotate(unidades=Sum('unidades'), ingresos=Sum('ingresos')).order_by('-unidades')[:20]
+    )
+    return JsonResponse({
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'dias': [
+            {
+                'fecha': dia.fecha.isoformat(),
+                'compras': dia.compras,
+                'pedidos': dia.pedidos,
+                'unidades': dia.unidades,
+                'ingresos': float(dia.ingresos),
+                'ticket_promedio': dia.ticket_promedio and float(dia.ticket_promedio),
+            }
+            for dia in dias
+        ],
+        'restaurantes': [
+            {'id': fila['restaurante_id'], 'nombre': fila['restaurante__nombre'] or 'Sin asignar',
+             'unidades': fila['unidades'], 'ingresos': float(fila['ingresos'])}
+            for fila in por_restaurante
+        ],
+        'productos': [
+            {'id': fila['producto_id'], 'nombre': fila['producto__nombre'],
+             'unidades': fila['unidades'], 'ingresos': float(fila['ingresos'])}
+            for fila in mas_vendidos
+        ],
+    })
+
+
+# ============================
+# EVENTOS DE ESTADO EN VIVO (SSE)
+# ============================
+
+def canales_de_eventos(request, user):
+    """Canales a los que puede suscribirse el usuario (ver core/eventos.py)"""
+    canales = ['cocina'] if user.is_staff else []
+    perfil = PerfilCliente(request, user)
+    if perfil.usuario_id is not None:
+        canales += [f'usuario:{perfil.usuario_id}', f'cliente:{perfil.cliente_id}']
+    return canales
+
+
+async def eventos_estado(request):
+    """Stream text/event-stream con los cambios de estado de pedidos y compras"""
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI cada conexión abierta retendría un hilo del servidor
+        return JsonResponse({'error': 'Los eventos en vivo requieren servir con ASGI (flashnacks.asgi)'}, status=501)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Autenticación requerida'}, status=401)
+    canales = await sync_to_async(canales_de_eventos)(request, user)
+    if not canales:
+        return JsonResponse({'error': 'Sin eventos disponibles para este usuario'}, status=403)
+    
+    response = StreamingHttpResponse(stream_de_eventos(canales), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
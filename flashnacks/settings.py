@@ -45,6 +45,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.PerfilClienteMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -81,9 +82,99 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL: las lecturas no esperan a las escrituras (ingesta de pedidos,
+            # trabajadores de la cola). Con WAL, synchronous=NORMAL solo arriesga
+            # los últimos commits ante un corte de energía, no si la app se cierra
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'timeout': 20,
+        },
     }
 }
 
+# -----------------------------
+# Caché (sin servidor externo)
+# -----------------------------
+# Memoria local por proceso. Con varios procesos, usar la caché en disco:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#   'LOCATION': BASE_DIR / 'cache',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'flashnacks',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
+}
+
+# Segundos que vive una página de menú cacheada (la versión la invalida antes)
+CATALOGO_CACHE_TIMEOUT = 60 * 15
+
+# max-age de las APIs JSON del catálogo; al vencer, los clientes revalidan
+# con If-None-Match y reciben 304 si nada cambió
+API_CATALOGO_MAX_AGE = 30
+
+# Tokens de socios para las APIs de integración (exportación del catálogo,
+# ingesta de pedidos):
+# cabecera "Authorization: Token <token>" -> canal, p. ej. {'<token>': 'rappi'}
+TOKENS_SOCIOS = {}
+
+# Dónde se guarda el carrito de los visitantes anónimos (ver core/carrito.py):
+#   'db'      filas Carrito/CarritoDetalle por sesión
+#   'sesion'  dentro de la sesión; con SESSION_ENGINE =
+#             'django.contrib.sessions.backends.signed_cookies' no toca la base
+#   'cache'   en CACHES['default'] (usar FileBasedCache si hay varios procesos)
+# Al iniciar sesión se fusiona con el Carrito del cliente.
+CARRITO_ANONIMO = 'db'
+CARRITO_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Días sin actividad tras los que manage.py limpiar_carritos borra un
+# carrito anónimo de la base (también borra los de sesiones expiradas)
+CARRITOS_ANONIMOS_DIAS = 14
+
+# Segundos que un carrito retiene los ingredientes de lo que agregó
+# (core/reservas.py); 0 desactiva las reservas. Ej.: 60 * 15
+RESERVAS_TTL = 0
+
+# Segundos que se recuerda la respuesta de un POST con Idempotency-Key
+# (manage.py purgar_idempotencia borra las vencidas)
+IDEMPOTENCIA_TTL = 60 * 60 * 24
+# Segundos que una petición en curso retiene su clave; pasado ese plazo sin
+# respuesta guardada (proceso caído) otra petición con la clave la retoma
+IDEMPOTENCIA_EN_CURSO = 60
+
+# Despacho de repartidores (core/despacho.py, manage.py despachar_pedidos):
+# segundos que un pedido espera antes de aceptar un repartidor de otra zona
+DESPACHO_ESPERA_OTRA_ZONA = 60 * 10
+
+# Plan de producción de cocina (core/produccion.py): horas hacia atrás
+# de compras web que todavía cuentan como por preparar
+PRODUCCION_HORAS_COMPRAS = 3
+
+# Stream SSE de cambios de estado (core/eventos.py); requiere servir con
+# ASGI (flashnacks.asgi), p. ej. uvicorn. Broker 'local' (un proceso) o
+# 'base' (varios procesos, vía la tabla EventoEstado)
+EVENTOS_BROKER = 'local'
+EVENTOS_INTERVALO = 1.0          # segundos entre lecturas del broker 'base'
+EVENTOS_RETENCION = 60 * 5       # segundos que se guardan los eventos en la base
+EVENTOS_PURGAR_CADA = 100        # publicaciones entre purgas de eventos vencidos
+EVENTOS_LATIDO = 15              # segundos entre comentarios de keep-alive
+EVENTOS_REINTENTO_MS = 5000      # reconexión sugerida al navegador
+
+# Compras por página en "Mis compras" (paginación por cursor, core/historial.py)
+COMPRAS_POR_PAGINA = 20
+
+# Pedidos por llamada en la ingesta de socios (POST api/socios/pedidos/)
+INGESTA_MAX_PEDIDOS = 500
+
+# Cola de tareas en segundo plano (core/tareas.py, manage.py procesar_tareas)
+TAREAS_VISIBILIDAD = 60 * 5      # segundos que una tarea reclamada queda oculta
+TAREAS_BACKOFF_BASE = 10         # primer reintento; luego se duplica
+TAREAS_BACKOFF_MAXIMO = 60 * 60
+
+# Correo (comprobantes de compra); en producción configurar SMTP
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'FlashSnacks <no-responder@flashsnacks.local>'
+
 # -----------------------------
 # Validación de contraseñas
 # -----------------------------